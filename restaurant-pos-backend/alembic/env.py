@@ -13,7 +13,11 @@ from app.db import Base
 from app.users.models import User
 from app.products.models import Category, Product
 from app.tables.models import Table
-from app.orders.models import Order, OrderItem
+from app.orders.models import Order, OrderItem, OrderSequence
+from app.auth.models import DeviceSession
+from app.sync.models import DeletedRecord
+from app.idempotency.models import IdempotencyKey
+from app.reports.models import HourlySales, ProductSales, WaiterSales, TableSales
 
 # Obtener la URL de la base de datos de .env
 config = context.config
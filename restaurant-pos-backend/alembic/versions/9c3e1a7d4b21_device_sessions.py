@@ -0,0 +1,39 @@
+"""Device sessions for refresh tokens
+
+Revision ID: 9c3e1a7d4b21
+Revises: 5217f12712d2
+Create Date: 2026-10-18 10:12:45.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3e1a7d4b21'
+down_revision = '5217f12712d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('device_sessions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('device_id', sa.String(), nullable=True),
+    sa.Column('token_id', sa.String(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('revoked_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('last_used_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_device_sessions_id'), 'device_sessions', ['id'], unique=False)
+    op.create_index(op.f('ix_device_sessions_user_id'), 'device_sessions', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_device_sessions_user_id'), table_name='device_sessions')
+    op.drop_index(op.f('ix_device_sessions_id'), table_name='device_sessions')
+    op.drop_table('device_sessions')
@@ -0,0 +1,24 @@
+"""Composite index for keyset pagination of orders
+
+Revision ID: b41f0d2c8e57
+Revises: 9c3e1a7d4b21
+Create Date: 2026-10-18 11:02:37.540912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b41f0d2c8e57'
+down_revision = '9c3e1a7d4b21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_orders_created_at_id', 'orders', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_orders_created_at_id', table_name='orders')
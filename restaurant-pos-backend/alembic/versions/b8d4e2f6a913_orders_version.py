@@ -0,0 +1,24 @@
+"""Version column on orders for optimistic concurrency
+
+Revision ID: b8d4e2f6a913
+Revises: a6e3b9d1c274
+Create Date: 2026-10-18 15:52:10.381547
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d4e2f6a913'
+down_revision = 'a6e3b9d1c274'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('orders', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('orders', 'version')
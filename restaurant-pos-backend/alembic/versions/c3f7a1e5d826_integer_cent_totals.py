@@ -0,0 +1,56 @@
+"""Store order amounts as integer cents
+
+Revision ID: c3f7a1e5d826
+Revises: b8d4e2f6a913
+Create Date: 2026-10-18 16:37:55.902184
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f7a1e5d826'
+down_revision = 'b8d4e2f6a913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('order_items', sa.Column('price_cents', sa.Integer(), nullable=True))
+    op.add_column('orders', sa.Column('subtotal_cents', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('orders', sa.Column('tax_cents', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('orders', sa.Column('total_cents', sa.Integer(), server_default='0', nullable=False))
+
+    op.execute("UPDATE order_items SET price_cents = ROUND(COALESCE(price, 0) * 100)")
+    # El subtotal se recalcula desde los items; el impuesto ya cobrado se conserva
+    op.execute(
+        "UPDATE orders SET "
+        "subtotal_cents = COALESCE((SELECT SUM(order_items.price_cents * order_items.quantity) "
+        "FROM order_items WHERE order_items.order_id = orders.id), 0), "
+        "tax_cents = ROUND(COALESCE(tax, 0) * 100)"
+    )
+    op.execute("UPDATE orders SET total_cents = subtotal_cents + tax_cents")
+
+    with op.batch_alter_table('order_items') as batch_op:
+        batch_op.alter_column('price_cents', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_column('price')
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_column('total')
+        batch_op.drop_column('tax')
+        batch_op.drop_column('subtotal')
+
+
+def downgrade() -> None:
+    op.add_column('orders', sa.Column('subtotal', sa.Float(), nullable=True))
+    op.add_column('orders', sa.Column('tax', sa.Float(), nullable=True))
+    op.add_column('orders', sa.Column('total', sa.Float(), nullable=True))
+    op.add_column('order_items', sa.Column('price', sa.Float(), nullable=True))
+    op.execute("UPDATE orders SET subtotal = subtotal_cents / 100.0, tax = tax_cents / 100.0, total = total_cents / 100.0")
+    op.execute("UPDATE order_items SET price = price_cents / 100.0")
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_column('total_cents')
+        batch_op.drop_column('tax_cents')
+        batch_op.drop_column('subtotal_cents')
+    with op.batch_alter_table('order_items') as batch_op:
+        batch_op.drop_column('price_cents')
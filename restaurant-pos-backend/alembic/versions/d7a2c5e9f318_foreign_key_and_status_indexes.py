@@ -0,0 +1,34 @@
+"""Indexes on foreign keys and (status, created_at) for orders
+
+Revision ID: d7a2c5e9f318
+Revises: b41f0d2c8e57
+Create Date: 2026-10-18 12:14:05.218364
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a2c5e9f318'
+down_revision = 'b41f0d2c8e57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_order_items_order_id'), 'order_items', ['order_id'], unique=False)
+    op.create_index(op.f('ix_order_items_product_id'), 'order_items', ['product_id'], unique=False)
+    op.create_index(op.f('ix_orders_table_id'), 'orders', ['table_id'], unique=False)
+    op.create_index(op.f('ix_orders_created_by'), 'orders', ['created_by'], unique=False)
+    op.create_index('ix_orders_status_created_at', 'orders', ['status', 'created_at'], unique=False)
+    op.create_index(op.f('ix_products_category_id'), 'products', ['category_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_products_category_id'), table_name='products')
+    op.drop_index('ix_orders_status_created_at', table_name='orders')
+    op.drop_index(op.f('ix_orders_created_by'), table_name='orders')
+    op.drop_index(op.f('ix_orders_table_id'), table_name='orders')
+    op.drop_index(op.f('ix_order_items_product_id'), table_name='order_items')
+    op.drop_index(op.f('ix_order_items_order_id'), table_name='order_items')
@@ -0,0 +1,66 @@
+"""Sales report aggregate tables and orders.paid_at
+
+Revision ID: d9a4c2e7f153
+Revises: c3f7a1e5d826
+Create Date: 2026-10-18 18:12:04.517392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9a4c2e7f153'
+down_revision = 'c3f7a1e5d826'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('orders', sa.Column('paid_at', sa.DateTime(), nullable=True))
+    # Aproximación para las órdenes ya pagadas: su última modificación.
+    # Los agregados se llenan después con POST /api/reports/rebuild
+    op.execute("UPDATE orders SET paid_at = COALESCE(updated_at, created_at) WHERE status = 'PAID'")
+
+    op.create_table('sales_hourly',
+    sa.Column('hour', sa.DateTime(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('item_count', sa.Integer(), nullable=False),
+    sa.Column('subtotal_cents', sa.Integer(), nullable=False),
+    sa.Column('tax_cents', sa.Integer(), nullable=False),
+    sa.Column('total_cents', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('hour')
+    )
+    op.create_table('sales_by_product',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('revenue_cents', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'product_id')
+    )
+    op.create_index(op.f('ix_sales_by_product_category_id'), 'sales_by_product', ['category_id'], unique=False)
+    op.create_table('sales_by_waiter',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('total_cents', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'user_id')
+    )
+    op.create_table('sales_by_table',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('table_id', sa.Integer(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('total_cents', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'table_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('sales_by_table')
+    op.drop_table('sales_by_waiter')
+    op.drop_index(op.f('ix_sales_by_product_category_id'), table_name='sales_by_product')
+    op.drop_table('sales_by_product')
+    op.drop_table('sales_hourly')
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_column('paid_at')
@@ -0,0 +1,36 @@
+"""Tombstones for delta sync and index on orders.updated_at
+
+Revision ID: e5b8f1a3c642
+Revises: d7a2c5e9f318
+Create Date: 2026-10-18 13:41:22.907115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b8f1a3c642'
+down_revision = 'd7a2c5e9f318'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('deleted_records',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_deleted_records_id'), 'deleted_records', ['id'], unique=False)
+    op.create_index('ix_deleted_records_entity_deleted_at', 'deleted_records', ['entity', 'deleted_at'], unique=False)
+    op.create_index(op.f('ix_orders_updated_at'), 'orders', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_orders_updated_at'), table_name='orders')
+    op.drop_index('ix_deleted_records_entity_deleted_at', table_name='deleted_records')
+    op.drop_index(op.f('ix_deleted_records_id'), table_name='deleted_records')
+    op.drop_table('deleted_records')
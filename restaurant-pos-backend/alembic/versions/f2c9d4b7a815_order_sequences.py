@@ -0,0 +1,29 @@
+"""Per-day order number sequences
+
+Revision ID: f2c9d4b7a815
+Revises: e5b8f1a3c642
+Create Date: 2026-10-18 14:26:48.113920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c9d4b7a815'
+down_revision = 'e5b8f1a3c642'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('order_sequences',
+    sa.Column('day', sa.String(length=8), nullable=False),
+    sa.Column('location', sa.String(), nullable=False),
+    sa.Column('last_value', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'location')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('order_sequences')
@@ -0,0 +1,168 @@
+import logging
+import select
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..metrics import AUTH_CACHE_HITS, AUTH_CACHE_MISSES
+from ..users.schemas import UserResponse
+
+logger = logging.getLogger(__name__)
+
+# Canal de PostgreSQL usado para invalidar la caché en los demás workers. El
+# payload es el ID del usuario, o "sid:<id>" para una sesión revocada
+INVALIDATION_CHANNEL = "auth_user_invalidate"
+SESSION_PAYLOAD_PREFIX = "sid:"
+
+class UserCache:
+    """Caché LRU con expiración de los usuarios autenticados.
+
+    Guarda una copia de solo lectura (sin contraseña) de la identidad, el rol y
+    el estado del usuario, de modo que verify_token no consulte la base de
+    datos en cada petición.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                AUTH_CACHE_MISSES.inc()
+                return None
+            user, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                self.misses += 1
+                AUTH_CACHE_MISSES.inc()
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            AUTH_CACHE_HITS.inc()
+            return user
+
+    def set(self, db_user):
+        user = UserResponse.model_validate(db_user, from_attributes=True)
+        if self.max_size <= 0:
+            return user
+        with self._lock:
+            self._entries[user.id] = (user, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+user_cache = UserCache(settings.auth_cache_max_size, settings.auth_cache_ttl_seconds)
+
+class RevokedSessions:
+    """Conjunto en memoria de sesiones revocadas.
+
+    verify_token lo consulta para rechazar access tokens de sesiones cerradas
+    sin tocar la base de datos. Se carga desde device_sessions al iniciar y
+    los demás workers avisan de sus revocaciones por NOTIFY; sin NOTIFY,
+    verify_token revisa la sesión en la base al no encontrar al usuario en caché.
+    """
+
+    def __init__(self):
+        self._session_ids = set()
+        self._lock = threading.Lock()
+
+    def __contains__(self, session_id):
+        return session_id in self._session_ids
+
+    def add(self, session_id: int):
+        with self._lock:
+            self._session_ids.add(session_id)
+
+    def replace(self, session_ids):
+        with self._lock:
+            self._session_ids = set(session_ids)
+
+revoked_sessions = RevokedSessions()
+
+def broadcast_enabled(db: Session):
+    return settings.auth_cache_broadcast and db.bind.dialect.name == "postgresql"
+
+def notify(db: Session, payload: str):
+    db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": INVALIDATION_CHANNEL, "payload": payload}
+    )
+
+def invalidate_user(db: Session, user_id: int):
+    # Se llama después de confirmar el cambio del usuario. Invalida la entrada
+    # local y, si está habilitado, avisa al resto de workers con NOTIFY.
+    user_cache.invalidate(user_id)
+    if broadcast_enabled(db):
+        notify(db, str(user_id))
+        db.commit()
+
+def publish_revoked_sessions(db: Session, session_ids):
+    # Se llama dentro de la transacción que revoca: PostgreSQL entrega el
+    # NOTIFY a los demás workers solo si esa transacción se confirma
+    if broadcast_enabled(db):
+        for session_id in session_ids:
+            notify(db, f"{SESSION_PAYLOAD_PREFIX}{session_id}")
+
+def handle_notification(payload: str):
+    if payload.startswith(SESSION_PAYLOAD_PREFIX):
+        revoked_sessions.add(int(payload[len(SESSION_PAYLOAD_PREFIX):]))
+    else:
+        user_cache.invalidate(int(payload))
+
+def listen_for_invalidations(stop_event: threading.Event, on_connect=None, poll_seconds: float = 5.0):
+    import psycopg2
+    import psycopg2.extensions
+
+    while not stop_event.is_set():
+        try:
+            conn = psycopg2.connect(settings.database_url)
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {INVALIDATION_CHANNEL}")
+            # Lo publicado mientras no escuchábamos se pierde: se vacía la caché
+            # y se recargan las sesiones revocadas
+            user_cache.clear()
+            if on_connect is not None:
+                on_connect()
+            while not stop_event.is_set():
+                if select.select([conn], [], [], poll_seconds) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    handle_notification(conn.notifies.pop(0).payload)
+            conn.close()
+        except Exception:
+            logger.exception("Error escuchando invalidaciones de la caché de usuarios")
+            user_cache.clear()
+            stop_event.wait(poll_seconds)
+
+def start_invalidation_listener(on_connect=None):
+    stop_event = threading.Event()
+    thread = threading.Thread(
+        target=listen_for_invalidations,
+        args=(stop_event, on_connect),
+        name="auth-cache-invalidation",
+        daemon=True
+    )
+    thread.start()
+    return stop_event
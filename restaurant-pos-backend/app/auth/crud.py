@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from fastapi import HTTPException, status
+from ..config import settings
+from ..users.models import User
+from .models import DeviceSession
+from .cache import publish_revoked_sessions, revoked_sessions
+from .jwt import create_access_token, create_refresh_token, decode_refresh_token, new_token_id
+
+def get_session(db: Session, session_id: int):
+    return db.query(DeviceSession).filter(DeviceSession.id == session_id).first()
+
+def get_user_sessions(db: Session, user_id: int):
+    return db.query(DeviceSession).filter(
+        DeviceSession.user_id == user_id,
+        DeviceSession.revoked_at.is_(None)
+    ).order_by(DeviceSession.created_at.desc()).all()
+
+def issue_tokens(db_session: DeviceSession):
+    access_token = create_access_token(
+        data={"sub": str(db_session.user_id), "sid": db_session.id},
+        expires_delta=timedelta(minutes=settings.access_token_expire_minutes)
+    )
+    refresh_token = create_refresh_token(
+        user_id=db_session.user_id,
+        session_id=db_session.id,
+        token_id=db_session.token_id,
+        expires_at=db_session.expires_at
+    )
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+def create_session(db: Session, user_id: int, device_id: str = None):
+    # Un terminal que vuelve a iniciar sesión reutiliza su sesión en lugar de acumular filas
+    db_session = None
+    if device_id:
+        db_session = db.query(DeviceSession).filter(
+            DeviceSession.user_id == user_id,
+            DeviceSession.device_id == device_id,
+            DeviceSession.revoked_at.is_(None)
+        ).first()
+    if db_session is None:
+        db_session = DeviceSession(user_id=user_id, device_id=device_id)
+        db.add(db_session)
+
+    now = datetime.utcnow()
+    db_session.token_id = new_token_id()
+    db_session.expires_at = now + timedelta(days=settings.refresh_token_expire_days)
+    db_session.last_used_at = now
+    db.commit()
+    return issue_tokens(db_session)
+
+def revoke_session(db: Session, db_session: DeviceSession):
+    db_session.revoked_at = datetime.utcnow()
+    publish_revoked_sessions(db, [db_session.id])
+    db.commit()
+    revoked_sessions.add(db_session.id)
+    return {"ok": True}
+
+def revoke_user_sessions(db: Session, user_id: int):
+    session_ids = [
+        session_id for (session_id,) in db.query(DeviceSession.id).filter(
+            DeviceSession.user_id == user_id,
+            DeviceSession.revoked_at.is_(None)
+        )
+    ]
+    if session_ids:
+        db.query(DeviceSession).filter(DeviceSession.id.in_(session_ids)).update(
+            {DeviceSession.revoked_at: datetime.utcnow()},
+            synchronize_session=False
+        )
+        publish_revoked_sessions(db, session_ids)
+    for session_id in session_ids:
+        revoked_sessions.add(session_id)
+    return session_ids
+
+def refresh_session(db: Session, refresh_token: str):
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Refresh token inválido o expirado",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    payload = decode_refresh_token(refresh_token)
+    db_session = get_session(db, payload["sid"])
+    if db_session is None or db_session.revoked_at is not None:
+        raise credentials_exception
+
+    user = db.query(User).filter(User.id == db_session.user_id).first()
+    if user is None or not user.is_active:
+        revoke_session(db, db_session)
+        raise credentials_exception
+
+    # Rotación: solo el refresh token vigente puede usarse, y una sola vez.
+    # El UPDATE condicional evita que dos renovaciones simultáneas ganen ambas.
+    now = datetime.utcnow()
+    new_id = new_token_id()
+    updated = db.query(DeviceSession).filter(
+        DeviceSession.id == db_session.id,
+        DeviceSession.token_id == payload["jti"],
+        DeviceSession.revoked_at.is_(None)
+    ).update({
+        DeviceSession.token_id: new_id,
+        DeviceSession.expires_at: now + timedelta(days=settings.refresh_token_expire_days),
+        DeviceSession.last_used_at: now,
+    }, synchronize_session=False)
+
+    if not updated:
+        # Un refresh token ya rotado se está reutilizando: se revoca la sesión completa
+        db.rollback()
+        revoke_session(db, db_session)
+        raise credentials_exception
+
+    db.commit()
+    db.refresh(db_session)
+    return issue_tokens(db_session)
+
+def load_revoked_sessions(db: Session):
+    # Solo importan las sesiones cuyos tokens aún podrían estar vigentes
+    session_ids = [
+        session_id for (session_id,) in db.query(DeviceSession.id).filter(
+            DeviceSession.revoked_at.isnot(None),
+            DeviceSession.expires_at > datetime.utcnow()
+        )
+    ]
+    revoked_sessions.replace(session_ids)
+    return session_ids
+
+def delete_expired_sessions(db: Session):
+    deleted = db.query(DeviceSession).filter(
+        DeviceSession.expires_at < datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def delete_user_sessions(db: Session, user_id: int):
+    # Se usa al eliminar un usuario; el commit lo hace quien llama
+    revoke_user_sessions(db, user_id)
+    db.query(DeviceSession).filter(DeviceSession.user_id == user_id).delete(synchronize_session=False)
@@ -1,11 +1,14 @@
 from fastapi import Depends, HTTPException, status
-from ..users.models import User, UserRole
+from ..users.models import UserRole
+from ..users.schemas import UserResponse
 from .jwt import verify_token
 
-def get_current_user(user: User = Depends(verify_token)):
+# El usuario actual es la copia en caché (UserResponse), no el modelo ORM:
+# no tiene contraseña ni relaciones y no está asociado a ninguna sesión
+def get_current_user(user: UserResponse = Depends(verify_token)) -> UserResponse:
     return user
 
-def get_current_active_user(user: User = Depends(get_current_user)):
+def get_current_active_user(user: UserResponse = Depends(get_current_user)) -> UserResponse:
     if not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -13,7 +16,7 @@ def get_current_active_user(user: User = Depends(get_current_user)):
         )
     return user
 
-def get_waiter_user(user: User = Depends(get_current_active_user)):
+def get_waiter_user(user: UserResponse = Depends(get_current_active_user)) -> UserResponse:
     if user.role != UserRole.WAITER and user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -21,7 +24,7 @@ def get_waiter_user(user: User = Depends(get_current_active_user)):
         )
     return user
 
-def get_kitchen_user(user: User = Depends(get_current_active_user)):
+def get_kitchen_user(user: UserResponse = Depends(get_current_active_user)) -> UserResponse:
     if user.role != UserRole.KITCHEN and user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -29,7 +32,7 @@ def get_kitchen_user(user: User = Depends(get_current_active_user)):
         )
     return user
 
-def get_cashier_user(user: User = Depends(get_current_active_user)):
+def get_cashier_user(user: UserResponse = Depends(get_current_active_user)) -> UserResponse:
     if user.role != UserRole.CASHIER and user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -37,7 +40,7 @@ def get_cashier_user(user: User = Depends(get_current_active_user)):
         )
     return user
 
-def get_admin_user(user: User = Depends(get_current_active_user)):
+def get_admin_user(user: UserResponse = Depends(get_current_active_user)) -> UserResponse:
     if user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
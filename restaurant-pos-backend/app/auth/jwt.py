@@ -1,3 +1,4 @@
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -7,8 +8,10 @@ from sqlalchemy.orm import Session
 from pydantic import ValidationError
 from ..config import settings
 from ..users.models import User
-from ..users.schemas import UserPayload
+from ..users.schemas import UserPayload, UserResponse
 from ..db import get_db
+from .cache import user_cache, revoked_sessions
+from .models import DeviceSession
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/users/login")
 
@@ -22,7 +25,34 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
-def verify_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def create_refresh_token(user_id: int, session_id: int, token_id: str, expires_at: datetime):
+    to_encode = {
+        "sub": str(user_id),
+        "sid": session_id,
+        "jti": token_id,
+        "type": "refresh",
+        "exp": expires_at,
+    }
+    return jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
+
+def new_token_id():
+    return uuid.uuid4().hex
+
+def decode_refresh_token(token: str):
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Refresh token inválido o expirado",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    except JWTError:
+        raise credentials_exception
+    if payload.get("type") != "refresh" or payload.get("sid") is None or payload.get("jti") is None:
+        raise credentials_exception
+    return payload
+
+def verify_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> UserResponse:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudieron validar las credenciales",
@@ -34,10 +64,30 @@ def verify_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_
         if user_id is None:
             raise credentials_exception
         token_data = UserPayload(id=user_id)
-    except (JWTError, ValidationError):
+        user_id = int(token_data.id)
+    except (JWTError, ValidationError, ValueError):
+        raise credentials_exception
+    
+    # Un refresh token no sirve como access token, y las sesiones revocadas
+    # se rechazan sin consultar la base de datos
+    if payload.get("type") == "refresh" or payload.get("sid") in revoked_sessions:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == token_data.id).first()
-    if user is None:
+    # La mayoría de las peticiones se resuelven desde la caché sin consultar la base de datos
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    
+    # Sin caché se consulta también la sesión: otro worker pudo revocarla sin
+    # que este se enterara (sin NOTIFY). Así el desfase queda acotado al TTL
+    session_id = payload.get("sid")
+    if session_id is not None:
+        db_session = db.query(DeviceSession.revoked_at).filter(DeviceSession.id == session_id).first()
+        if db_session is None or db_session.revoked_at is not None:
+            revoked_sessions.add(session_id)
+            raise credentials_exception
+    
+    db_user = db.query(User).filter(User.id == user_id).first()
+    if db_user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    return user_cache.set(db_user)
\ No newline at end of file
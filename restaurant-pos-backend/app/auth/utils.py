@@ -1,9 +1,72 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
+from ..config import settings
+from ..metrics import PASSWORD_HASH_IN_FLIGHT, PASSWORD_HASH_SECONDS, PASSWORD_HASH_WAIT_SECONDS
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Cambiar BCRYPT_ROUNDS hace que los hashes existentes se regeneren al iniciar sesión
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
 
+class PasswordHasher:
+    """Ejecuta bcrypt en un pool dedicado y de tamaño fijo.
+
+    Así los picos de inicio de sesión (cambio de turno) no ocupan el threadpool
+    que atiende los pedidos. Si la cola se llena se responde 503 en lugar de
+    acumular trabajo.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def _run(self, submitted_at: float, fn, *args):
+        started_at = time.perf_counter()
+        PASSWORD_HASH_WAIT_SECONDS.observe(started_at - submitted_at)
+        try:
+            return fn(*args)
+        finally:
+            PASSWORD_HASH_SECONDS.observe(time.perf_counter() - started_at)
+
+    def _release(self, future):
+        with self._lock:
+            self.in_flight -= 1
+        PASSWORD_HASH_IN_FLIGHT.dec()
+        self._slots.release()
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servidor ocupado, intente nuevamente",
+                headers={"Retry-After": "1"},
+            )
+        with self._lock:
+            self.in_flight += 1
+        PASSWORD_HASH_IN_FLIGHT.inc()
+        future = self._executor.submit(self._run, time.perf_counter(), fn, *args)
+        future.add_done_callback(self._release)
+        return future
+
+password_hasher = PasswordHasher(settings.password_hash_workers, settings.password_hash_queue_size)
+
+# Versiones síncronas: bloquean el hilo que llama durante toda la espera en la
+# cola de bcrypt. Solo para scripts (init_db, datos sintéticos, benchmarks); en
+# las peticiones se usan las versiones async, que no ocupan el threadpool
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.submit(pwd_context.verify, plain_password, hashed_password).result()
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
\ No newline at end of file
+    return password_hasher.submit(pwd_context.hash, password).result()
+
+async def get_password_hash_async(password):
+    return await asyncio.wrap_future(password_hasher.submit(pwd_context.hash, password))
+
+async def verify_and_update_password(plain_password, hashed_password):
+    # Devuelve (válido, nuevo_hash); nuevo_hash no es None si los parámetros cambiaron
+    future = password_hasher.submit(pwd_context.verify_and_update, plain_password, hashed_password)
+    return await asyncio.wrap_future(future)
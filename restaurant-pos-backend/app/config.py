@@ -9,9 +9,54 @@ class Settings(BaseSettings):
     debug: bool = os.getenv("DEBUG", "True").lower() == "true"
     environment: str = os.getenv("ENVIRONMENT", "development")
     database_url: str = os.getenv("DATABASE_URL", "sqlite:///./test.db")
+    use_async_db: bool = os.getenv("USE_ASYNC_DB", "False").lower() == "true"
+    async_database_url: str = os.getenv("ASYNC_DATABASE_URL", "")
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    db_pool_timeout: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    db_pool_pre_ping: bool = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+    db_statement_timeout_ms: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+    sqlite_journal_mode: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    sqlite_synchronous: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    sqlite_cache_size: int = int(os.getenv("SQLITE_CACHE_SIZE", "-64000"))
+    sqlite_busy_timeout_ms: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
     secret_key: str = os.getenv("SECRET_KEY", "yoursupersecretkey")
     algorithm: str = os.getenv("ALGORITHM", "HS256")
     access_token_expire_minutes: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    refresh_token_expire_days: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+    auth_cache_max_size: int = int(os.getenv("AUTH_CACHE_MAX_SIZE", "1024"))
+    auth_cache_ttl_seconds: int = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+    auth_cache_broadcast: bool = os.getenv("AUTH_CACHE_BROADCAST", "False").lower() == "true"
+    menu_cache_max_entries: int = int(os.getenv("MENU_CACHE_MAX_ENTRIES", "64"))
+    menu_cache_ttl_seconds: int = int(os.getenv("MENU_CACHE_TTL_SECONDS", "30"))
+    # Impuesto por tipo de orden; TAX_RATE es el valor por defecto de ambos
+    tax_rate_table: float = float(os.getenv("TAX_RATE_TABLE", os.getenv("TAX_RATE", "0.10")))
+    tax_rate_delivery: float = float(os.getenv("TAX_RATE_DELIVERY", os.getenv("TAX_RATE", "0.10")))
+    location_code: str = os.getenv("LOCATION_CODE", "01")
+    order_number_block_size: int = int(os.getenv("ORDER_NUMBER_BLOCK_SIZE", "20"))
+    idempotency_ttl_hours: int = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+    # Vigencia de una reserva sin respuesta: si el worker muere a mitad de la
+    # petición, la clave vuelve a estar disponible pasado este tiempo
+    idempotency_lease_seconds: int = int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "60"))
+    idempotency_cache_max_size: int = int(os.getenv("IDEMPOTENCY_CACHE_MAX_SIZE", "1024"))
+    sync_lag_seconds: int = int(os.getenv("SYNC_LAG_SECONDS", "5"))
+    sync_tombstone_retention_days: int = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "7"))
+    export_batch_size: int = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+    request_stats_enabled: bool = os.getenv("REQUEST_STATS_ENABLED", "True").lower() == "true"
+    slow_request_ms: int = int(os.getenv("SLOW_REQUEST_MS", "500"))
+    slow_request_max_statements: int = int(os.getenv("SLOW_REQUEST_MAX_STATEMENTS", "50"))
+    # Perfilado bajo demanda (cabecera X-Profile de un administrador)
+    profiling_enabled: bool = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+    profiling_dir: str = os.getenv("PROFILING_DIR", "./profiles")
+    profiling_routes: str = os.getenv("PROFILING_ROUTES", "*")
+    profiling_mode: str = os.getenv("PROFILING_MODE", "cprofile")
+    profiling_sample_rate: float = float(os.getenv("PROFILING_SAMPLE_RATE", "1.0"))
+    profiling_max_per_minute: int = int(os.getenv("PROFILING_MAX_PER_MINUTE", "6"))
+    profiling_stack_interval_ms: int = int(os.getenv("PROFILING_STACK_INTERVAL_MS", "5"))
+    bcrypt_rounds: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    password_hash_queue_size: int = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "32"))
 
     class Config:
         env_file = ".env"
@@ -1,21 +1,132 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from fastapi import Depends
+from fastapi.concurrency import run_in_threadpool
 from .config import settings
+from .profiling import profile_call
 
 SQLALCHEMY_DATABASE_URL = settings.database_url
 
+def is_sqlite_memory(url):
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+def engine_options(database_url: str):
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        # SQLite: las conexiones se comparten entre los hilos del threadpool
+        return {"connect_args": {"check_same_thread": False}}
+
+    options = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    if settings.db_statement_timeout_ms and url.get_backend_name() == "postgresql":
+        options["connect_args"] = {"options": f"-c statement_timeout={settings.db_statement_timeout_ms}"}
+    return options
+
+def configure_sqlite(engine):
+    memory = is_sqlite_memory(engine.url)
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL permite lecturas concurrentes mientras se escribe; no aplica en memoria
+        if not memory:
+            cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.sqlite_cache_size)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        # SQLite no valida las claves foráneas por defecto; PostgreSQL sí
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL
+    SQLALCHEMY_DATABASE_URL,
+    **engine_options(SQLALCHEMY_DATABASE_URL)
 )
+if engine.dialect.name == "sqlite":
+    configure_sqlite(engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+def pool_status(engine=engine):
+    # Estado del pool para dimensionar workers frente a conexiones disponibles
+    pool = engine.pool
+    status = {"pool_class": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            status[name] = method()
+    # QueuePool informa el desborde como negativo mientras no se usa
+    if "overflow" in status:
+        status["overflow"] = max(status["overflow"], 0)
+    max_overflow = getattr(pool, "_max_overflow", None)
+    if max_overflow is not None:
+        status["max_overflow"] = max_overflow
+    return status
+
 # Función de dependencia para obtener una sesión de la base de datos
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Drivers asíncronos equivalentes a los síncronos configurados
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(database_url: str):
+    if settings.async_database_url:
+        return settings.async_database_url
+    url = make_url(database_url)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()]).render_as_string(hide_password=False)
+
+_async_sessionmaker = None
+
+def get_async_sessionmaker():
+    # El motor asíncrono se crea solo si se usa, así asyncpg/aiosqlite son opcionales
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        url = async_database_url(SQLALCHEMY_DATABASE_URL)
+        async_engine = create_async_engine(url, **engine_options(url))
+        if async_engine.dialect.name == "sqlite":
+            configure_sqlite(async_engine.sync_engine)
+        # Sin expirar en commit: los objetos se serializan fuera del contexto async
+        _async_sessionmaker = async_sessionmaker(
+            bind=async_engine, autoflush=False, expire_on_commit=False
+        )
+    return _async_sessionmaker
+
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+async def get_session(db: Session = Depends(get_db)):
+    # Sesión para handlers async: AsyncSession si USE_ASYNC_DB está activo,
+    # o la sesión síncrona de siempre (usada desde el threadpool) si no
+    if not settings.use_async_db:
+        yield db
+        return
+    async with get_async_sessionmaker()() as async_db:
+        yield async_db
+
+async def run_crud(db, fn, *args, **kwargs):
+    # Ejecuta una función CRUD síncrona desde un handler async sin bloquear el loop
+    if isinstance(db, Session):
+        if settings.profiling_enabled:
+            return await run_in_threadpool(profile_call, fn, db, *args, **kwargs)
+        return await run_in_threadpool(fn, db, *args, **kwargs)
+    return await db.run_sync(lambda sync_db: fn(sync_db, *args, **kwargs))
@@ -0,0 +1,54 @@
+import threading
+import time
+from collections import OrderedDict
+from ..config import settings
+
+class StoredResponse:
+    def __init__(self, request_hash: str, status_code: int, body: str):
+        self.request_hash = request_hash
+        self.status_code = status_code
+        self.body = body
+
+class IdempotencyCache:
+    """Caché LRU en memoria de las respuestas ya completadas.
+
+    Los reintentos suelen llegar segundos después de la petición original, al
+    mismo worker; este atajo evita consultar idempotency_keys en ese caso. La
+    tabla sigue siendo la fuente de verdad entre workers y reinicios.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, key: str):
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is None:
+                return None
+            response, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[(user_id, key)]
+                return None
+            self._entries.move_to_end((user_id, key))
+            return response
+
+    def set(self, user_id: int, key: str, response: StoredResponse):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[(user_id, key)] = (response, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end((user_id, key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+idempotency_cache = IdempotencyCache(
+    settings.idempotency_cache_max_size,
+    settings.idempotency_ttl_hours * 3600
+)
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..config import settings
+from .models import IdempotencyKey
+
+def get_key(db: Session, user_id: int, key: str):
+    return db.query(IdempotencyKey).filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key == key
+    ).first()
+
+def reserve_key(db: Session, user_id: int, key: str, request_hash: str):
+    # Devuelve (registro, True) si esta petición reservó la clave, o
+    # (registro existente, False) si otra petición ya la había usado.
+    # La clave primaria garantiza que solo una de dos peticiones simultáneas gane.
+    now = datetime.utcnow()
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key == key,
+        IdempotencyKey.expires_at < now
+    ).delete(synchronize_session=False)
+    db_key = IdempotencyKey(
+        user_id=user_id,
+        key=key,
+        request_hash=request_hash,
+        expires_at=now + timedelta(seconds=settings.idempotency_lease_seconds)
+    )
+    db.add(db_key)
+    try:
+        db.commit()
+        return db_key, True
+    except IntegrityError:
+        db.rollback()
+        return get_key(db, user_id, key), False
+
+def store_response(db: Session, user_id: int, key: str, status_code: int, response_body: str):
+    # Sin commit: se llama dentro de la transacción de la mutación, de modo que
+    # la respuesta queda guardada si y solo si la mutación se confirmó
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key == key
+    ).update({
+        IdempotencyKey.status_code: status_code,
+        IdempotencyKey.response_body: response_body,
+        IdempotencyKey.expires_at: datetime.utcnow() + timedelta(hours=settings.idempotency_ttl_hours),
+    }, synchronize_session=False)
+
+def release_key(db: Session, user_id: int, key: str):
+    # Si la petición falló se libera la clave para que el cliente pueda reintentar.
+    # Una clave con respuesta guardada no se toca: su mutación ya se confirmó.
+    # La sesión puede haber quedado en una transacción fallida (error de la BD
+    # en el handler): se descarta antes de borrar la reserva
+    db.rollback()
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key == key,
+        IdempotencyKey.status_code.is_(None)
+    ).delete(synchronize_session=False)
+    db.commit()
+
+def delete_expired_keys(db: Session):
+    deleted = db.query(IdempotencyKey).filter(
+        IdempotencyKey.expires_at < datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy.sql import func
+from ..db import Base
+
+class IdempotencyKey(Base):
+    """Respuesta guardada de una mutación enviada con la cabecera Idempotency-Key."""
+    __tablename__ = "idempotency_keys"
+
+    # Las claves son por usuario: dos tablets pueden generar la misma por casualidad
+    user_id = Column(Integer, primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # Hash de método, ruta y cuerpo para detectar una clave reutilizada con otra petición
+    request_hash = Column(String(64), nullable=False)
+    # NULL mientras la petición original sigue en curso
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), index=True)
@@ -0,0 +1,90 @@
+import hashlib
+import json
+from fastapi import HTTPException, Request, Response, status
+from ..db import run_crud
+from . import crud
+from .cache import StoredResponse, idempotency_cache
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+# Se agrega a las respuestas reenviadas desde el almacenamiento
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+def request_fingerprint(method: str, path: str, body: bytes):
+    digest = hashlib.sha256(f"{method} {path}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+def check_fingerprint(stored_hash: str, request_hash: str):
+    if stored_hash != request_hash:
+        # 422 literal: el nombre de la constante cambió entre versiones de Starlette
+        raise HTTPException(
+            status_code=422,
+            detail="La Idempotency-Key ya se usó con una petición distinta"
+        )
+
+def replay(stored: StoredResponse, request_hash: str):
+    check_fingerprint(stored.request_hash, request_hash)
+    return Response(
+        content=stored.body,
+        status_code=stored.status_code,
+        media_type="application/json",
+        headers={REPLAYED_HEADER: "true"}
+    )
+
+async def run_idempotent(request: Request, db, user_id: int, status_code: int, execute, serialize):
+    """Ejecuta ``execute`` una sola vez por Idempotency-Key.
+
+    Sin cabecera la petición se procesa normalmente. Con cabecera se reserva
+    la clave y ``execute`` recibe un callback ``before_commit(db, resultado)``
+    que el CRUD llama justo antes de su commit: la respuesta serializada se
+    guarda en la misma transacción que la mutación. Un reintento con la misma
+    clave recibe esa respuesta sin volver a ejecutar la operación.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        return await execute(None)
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"La Idempotency-Key no puede superar {MAX_KEY_LENGTH} caracteres"
+        )
+    request_hash = request_fingerprint(request.method, request.url.path, await request.body())
+
+    stored = idempotency_cache.get(user_id, key)
+    if stored is not None:
+        return replay(stored, request_hash)
+
+    db_key, reserved = await run_crud(db, crud.reserve_key, user_id, key, request_hash)
+    if not reserved:
+        if db_key is None or db_key.status_code is None:
+            if db_key is not None:
+                check_fingerprint(db_key.request_hash, request_hash)
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Ya hay una petición en curso con esta Idempotency-Key",
+                headers={"Retry-After": "1"}
+            )
+        stored = StoredResponse(db_key.request_hash, db_key.status_code, db_key.response_body)
+        idempotency_cache.set(user_id, key, stored)
+        return replay(stored, request_hash)
+
+    stored_body = []
+
+    def store(session, result):
+        # Se serializa antes del commit: después los atributos quedan expirados
+        body = json.dumps(serialize(result), separators=(",", ":"))
+        crud.store_response(session, user_id, key, status_code, body)
+        stored_body.append(body)
+
+    try:
+        await execute(store)
+    except Exception:
+        # release_key no borra una clave con respuesta: si el error ocurrió
+        # después del commit, el reintento recibe la orden ya creada
+        await run_crud(db, crud.release_key, user_id, key)
+        raise
+
+    body = stored_body[-1]
+    idempotency_cache.set(user_id, key, StoredResponse(request_hash, status_code, body))
+    return Response(content=body, status_code=status_code, media_type="application/json")
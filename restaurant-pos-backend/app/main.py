@@ -1,10 +1,27 @@
-from fastapi import FastAPI
+import logging
+import time
+from fastapi import FastAPI, status
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
+from .db import SessionLocal, engine, pool_status
+from .request_stats import RequestStatsMiddleware, install_query_hooks
+from .profiling import ProfilingMiddleware
+from .metrics import MetricsMiddleware, install_pool_metrics, mark_process_dead, render_metrics
+from .auth.cache import start_invalidation_listener
+from .auth.crud import load_revoked_sessions, delete_expired_sessions
 from .users.router import router as users_router
 from .products.router import router as products_router
 from .orders.router import router as orders_router
 from .tables.router import router as tables_router
+from .sync.router import router as sync_router
+from .reports.router import router as reports_router
+from .sync.crud import delete_expired_tombstones
+from .idempotency.crud import delete_expired_keys
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title=settings.app_name,
@@ -21,14 +38,113 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Idempotent-Replayed", "Server-Timing", "X-Profile-File"],
 )
 
+# Perfilado de peticiones seleccionadas (solo administradores, con X-Profile).
+# Desactivado no se instala: las peticiones no pasan por este middleware
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware, session_factory=SessionLocal)
+
+# Consultas y tiempos por petición (cabecera Server-Timing y log de peticiones lentas)
+install_query_hooks()
+app.add_middleware(RequestStatsMiddleware)
+
+# Métricas de Prometheus (latencia por ruta, pool, cachés y negocio) en /metrics
+install_pool_metrics(engine)
+app.add_middleware(MetricsMiddleware)
+
+def reload_revoked_sessions():
+    db = SessionLocal()
+    try:
+        load_revoked_sessions(db)
+    except SQLAlchemyError:
+        logger.warning("No se pudieron cargar las sesiones revocadas", exc_info=True)
+    finally:
+        db.close()
+
+# Invalidación de la caché de usuarios y sesiones revocadas entre workers
+# (PostgreSQL LISTEN/NOTIFY); al reconectar se recargan las revocadas
+@app.on_event("startup")
+def start_auth_cache_listener():
+    if settings.auth_cache_broadcast and settings.database_url.startswith("postgresql"):
+        app.state.auth_cache_listener = start_invalidation_listener(on_connect=reload_revoked_sessions)
+
+# Sesiones de dispositivo: se purgan las expiradas y se cargan las revocadas en memoria
+@app.on_event("startup")
+def load_device_sessions():
+    db = SessionLocal()
+    try:
+        delete_expired_sessions(db)
+    except SQLAlchemyError:
+        logger.warning("No se pudieron purgar las sesiones expiradas", exc_info=True)
+    finally:
+        db.close()
+    reload_revoked_sessions()
+
+# Tombstones de la sincronización incremental fuera del período de retención
+@app.on_event("startup")
+def purge_sync_tombstones():
+    db = SessionLocal()
+    try:
+        delete_expired_tombstones(db)
+    except SQLAlchemyError:
+        logger.warning("No se pudieron purgar los tombstones de sincronización", exc_info=True)
+    finally:
+        db.close()
+
+# Claves de idempotencia vencidas
+@app.on_event("startup")
+def purge_idempotency_keys():
+    db = SessionLocal()
+    try:
+        delete_expired_keys(db)
+    except SQLAlchemyError:
+        logger.warning("No se pudieron purgar las claves de idempotencia", exc_info=True)
+    finally:
+        db.close()
+
+@app.on_event("shutdown")
+def stop_auth_cache_listener():
+    listener = getattr(app.state, "auth_cache_listener", None)
+    if listener is not None:
+        listener.set()
+
+@app.on_event("shutdown")
+def remove_worker_metrics():
+    mark_process_dead()
+
 # Inclusión de routers
 app.include_router(users_router, prefix="/api/users", tags=["Users"])
 app.include_router(products_router, prefix="/api/products", tags=["Products"])
 app.include_router(orders_router, prefix="/api/orders", tags=["Orders"])
 app.include_router(tables_router, prefix="/api/tables", tags=["Tables"])
+app.include_router(sync_router, prefix="/api/sync", tags=["Sync"])
+app.include_router(reports_router, prefix="/api/reports", tags=["Reports"])
 
 @app.get("/", tags=["Root"])
 async def read_root():
-    return {"message": "Bienvenido a la API del Restaurant POS"}
\ No newline at end of file
+    return {"message": "Bienvenido a la API del Restaurant POS"}
+
+@app.get("/health/db", tags=["Health"])
+def health_db():
+    # Conectividad y uso del pool de conexiones
+    started_at = time.perf_counter()
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except SQLAlchemyError:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "error", "pool": pool_status()}
+        )
+    return {
+        "status": "ok",
+        "latency_ms": round((time.perf_counter() - started_at) * 1000, 2),
+        "pool": pool_status()
+    }
+
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,149 @@
+import os
+import time
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+
+# Con varios workers de uvicorn/gunicorn se define PROMETHEUS_MULTIPROC_DIR
+# (un directorio vacío al arrancar): cada proceso escribe sus valores en
+# archivos mmap y /metrics los combina al responder
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+REQUEST_LATENCY = Histogram(
+    "pos_http_request_duration_seconds",
+    "Tiempo hasta enviar las cabeceras de la respuesta, por ruta",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "pos_http_requests_in_progress", "Peticiones HTTP en curso", multiprocess_mode="livesum"
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "pos_db_pool_checked_out", "Conexiones del pool en uso", multiprocess_mode="livesum"
+)
+DB_POOL_SIZE = Gauge(
+    "pos_db_pool_size", "Tamaño del pool de conexiones (sin desborde)", multiprocess_mode="livesum"
+)
+DB_POOL_MAX_OVERFLOW = Gauge(
+    "pos_db_pool_max_overflow", "Conexiones adicionales permitidas sobre el pool", multiprocess_mode="livesum"
+)
+
+# La tasa de aciertos se calcula en la consulta: hit / (hit + miss)
+AUTH_CACHE_REQUESTS = Counter(
+    "pos_auth_cache_requests", "Búsquedas en la caché de usuarios", ["result"]
+)
+AUTH_CACHE_HITS = AUTH_CACHE_REQUESTS.labels(result="hit")
+AUTH_CACHE_MISSES = AUTH_CACHE_REQUESTS.labels(result="miss")
+
+PASSWORD_HASH_IN_FLIGHT = Gauge(
+    "pos_password_hash_in_flight", "Hashes bcrypt en ejecución o en cola", multiprocess_mode="livesum"
+)
+PASSWORD_HASH_SECONDS = Histogram(
+    "pos_password_hash_seconds", "Duración de cada hash bcrypt",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+PASSWORD_HASH_WAIT_SECONDS = Histogram(
+    "pos_password_hash_wait_seconds", "Espera en cola antes de calcular el hash",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+ORDERS_CREATED = Counter("pos_orders_created", "Órdenes creadas", ["order_type"])
+ORDER_ITEMS = Histogram(
+    "pos_order_items", "Items por orden al crearla", buckets=(1, 2, 3, 4, 5, 8, 13, 21, 34)
+)
+STATUS_TRANSITIONS = Counter(
+    "pos_order_status_transitions", "Cambios de estado de órdenes", ["from_status", "to_status"]
+)
+
+def label_value(value):
+    return getattr(value, "value", value)
+
+def record_order_created(db_order):
+    ORDERS_CREATED.labels(order_type=label_value(db_order.order_type)).inc()
+    ORDER_ITEMS.observe(len(db_order.items))
+
+def record_status_change(previous_status, new_status, count: int = 1):
+    STATUS_TRANSITIONS.labels(
+        from_status=label_value(previous_status), to_status=label_value(new_status)
+    ).inc(count)
+
+def install_pool_metrics(engine):
+    # Eventos del pool en lugar de consultar su estado en cada scrape: con
+    # varios workers el proceso que responde /metrics no ve los pools ajenos
+    pool = engine.pool
+    size = getattr(pool, "size", None)
+    if callable(size):
+        DB_POOL_SIZE.set(size())
+    DB_POOL_MAX_OVERFLOW.set(max(getattr(pool, "_max_overflow", 0), 0))
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKED_OUT.inc()
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.dec()
+
+def route_template(scope):
+    """Plantilla de la ruta (/api/orders/{order_id}) para no crear una serie por ID.
+
+    Se reconstruye desde la ruta pedida y sus path_params: la ruta que deja
+    el router puede ser relativa al router incluido según la versión de FastAPI.
+    """
+    if scope.get("route") is None:
+        # 404 y similares: una sola serie sin importar la URL
+        return "unmatched"
+    segments = scope["path"].split("/")
+    start = 0
+    for name, value in (scope.get("path_params") or {}).items():
+        for index in range(start, len(segments)):
+            if segments[index] == str(value):
+                segments[index] = "{" + name + "}"
+                start = index + 1
+                break
+    return "/".join(segments)
+
+class MetricsMiddleware:
+    """Latencia por ruta y peticiones en curso (middleware ASGI puro)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        REQUESTS_IN_PROGRESS.inc()
+        observed = False
+
+        async def send_with_metrics(message):
+            nonlocal observed
+            if message["type"] == "http.response.start" and not observed:
+                observed = True
+                REQUEST_LATENCY.labels(
+                    method=scope["method"], route=route_template(scope), status=str(message["status"])
+                ).observe(time.perf_counter() - started_at)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+
+def render_metrics():
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def mark_process_dead():
+    # Descarta los gauges "live" del worker que termina
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
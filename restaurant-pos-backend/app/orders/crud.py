@@ -1,21 +1,80 @@
-from sqlalchemy.orm import Session
-from fastapi import HTTPException, status
-import random
-import string
 from datetime import datetime
+from types import SimpleNamespace
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+from fastapi import HTTPException, status
 from . import models, schemas
-from ..products.crud import get_product
-from ..tables.crud import get_table, occupy_table
+from .events import OrderEventType, publish_order_event, serialize_order
+from .numbering import order_numbers
+from .pricing import compute_totals, recompute_order_totals, to_cents
+from .transitions import RELEASES_TABLE, check_transition
+from ..products.crud import get_products_by_ids
+from ..tables.crud import get_table
+from ..tables.models import Table
+from ..reports.crud import record_sales
+from ..metrics import record_order_created, record_status_change
+from ..pagination import keyset_paginate
+
+def generate_order_number(db: Session):
+    # Número secuencial por día y local (ORD-20240101-01-00042), sin colisiones
+    return order_numbers.generate(db)
+
+def resolve_order_products(db: Session, items):
+    # Resuelve todos los productos de los items en una sola consulta
+    products = get_products_by_ids(db, [item.product_id for item in items])
+    missing_ids = sorted({item.product_id for item in items if item.product_id not in products})
+    if missing_ids:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Productos con ID {', '.join(str(product_id) for product_id in missing_ids)} no encontrados"
+        )
+    return products
+
+# Perfiles de carga para serializar OrderResponse (items -> product y table)
+# sin disparar consultas perezosas por cada relación (N+1).
+#   "joined":   una sola consulta con JOINs, ideal para una orden individual
+#   "selectin": una consulta para las órdenes y otra para todos sus items,
+#               evita multiplicar filas en listados
+#   "lazy":     sin carga anticipada (p. ej. para OrderSummary)
+ORDER_LOAD_PROFILES = {
+    "joined": lambda: (
+        joinedload(models.Order.table),
+        joinedload(models.Order.items).joinedload(models.OrderItem.product),
+    ),
+    "selectin": lambda: (
+        joinedload(models.Order.table),
+        selectinload(models.Order.items).joinedload(models.OrderItem.product),
+    ),
+    "lazy": lambda: (),
+}
+
+# Perfil usado por cada endpoint; se puede ajustar sin tocar los handlers
+ENDPOINT_LOAD_PROFILES = {
+    "detail": "joined",
+    "list": "lazy",
+    "kitchen": "selectin",
+    "cashier": "selectin",
+    "stream": "selectin",
+    "sync": "selectin",
+    "bulk": "selectin",
+    "mutation": "joined",
+}
 
-def generate_order_number():
-    # Genera un número de orden único basado en la fecha + números aleatorios
-    now = datetime.now()
-    date_str = now.strftime("%Y%m%d")
-    random_chars = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
-    return f"ORD-{date_str}-{random_chars}"
+def order_query(db: Session, endpoint: str = None):
+    query = db.query(models.Order)
+    if endpoint is None:
+        return query
+    profile = ENDPOINT_LOAD_PROFILES[endpoint]
+    query = query.options(*ORDER_LOAD_PROFILES[profile]())
+    if endpoint == "mutation":
+        # Tras un commit se recargan todos los atributos (incluidos los generados
+        # por la base, como updated_at) para serializar sin cargas perezosas
+        query = query.populate_existing()
+    return query
 
-def get_order(db: Session, order_id: int):
-    return db.query(models.Order).filter(models.Order.id == order_id).first()
+def get_order(db: Session, order_id: int, endpoint: str = None):
+    return order_query(db, endpoint).filter(models.Order.id == order_id).first()
 
 def get_order_by_number(db: Session, order_number: str):
     return db.query(models.Order).filter(models.Order.order_number == order_number).first()
@@ -25,9 +84,10 @@ def get_orders(
     skip: int = 0, 
     limit: int = 100, 
     status: models.OrderStatus = None,
-    order_type: models.OrderType = None
+    order_type: models.OrderType = None,
+    cursor: str = None
 ):
-    query = db.query(models.Order)
+    query = order_query(db, "list")
     
     if status:
         query = query.filter(models.Order.status == status)
@@ -35,10 +95,83 @@ def get_orders(
     if order_type:
         query = query.filter(models.Order.order_type == order_type)
     
-    return query.order_by(models.Order.created_at.desc()).offset(skip).limit(limit).all()
+    return keyset_paginate(
+        query,
+        [models.Order.created_at, models.Order.id],
+        limit=limit,
+        cursor=cursor,
+        descending=True,
+        offset=skip
+    )
 
-def create_order(db: Session, order: schemas.OrderCreate, user_id: int):
-    # Verificar si es un pedido de mesa y la mesa existe
+def get_orders_by_status(db: Session, statuses, endpoint: str = "stream"):
+    return order_query(db, endpoint).filter(
+        models.Order.status.in_(statuses)
+    ).order_by(models.Order.created_at.asc()).all()
+
+def get_kitchen_orders(db: Session):
+    # Órdenes para mostrar en cocina (pendientes y en preparación)
+    kitchen_statuses = [models.OrderStatus.PENDING, models.OrderStatus.PREPARING]
+    return get_orders_by_status(db, kitchen_statuses, endpoint="kitchen")
+
+def get_cashier_pending_orders(db: Session):
+    # Órdenes listas para pagar (listas para entrega o entregadas pero no pagadas)
+    cashier_statuses = [models.OrderStatus.READY, models.OrderStatus.DELIVERED]
+    return get_orders_by_status(db, cashier_statuses, endpoint="cashier")
+
+def order_conflict(db: Session, order_id: int):
+    # 409 con el estado actual para que el cliente pueda reintentar sobre él
+    current = get_order(db, order_id=order_id, endpoint="mutation")
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={
+            "message": "La orden fue modificada por otro usuario",
+            "order": serialize_order(current) if current is not None else None,
+        }
+    )
+
+def get_order_for_update(db: Session, order_id: int, expected_version: int = None):
+    db_order = get_order(db, order_id=order_id)
+    if not db_order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Orden no encontrada"
+        )
+    # El cliente envía la versión que tenía en pantalla (If-Match)
+    if expected_version is not None and db_order.version != expected_version:
+        raise order_conflict(db, order_id)
+    return db_order
+
+def commit_order(db: Session, order_id: int, before_commit=None):
+    # El UPDATE de la orden lleva "WHERE version = ?": si otra petición la
+    # modificó desde que se leyó, no se pierde su cambio sino que se responde 409
+    try:
+        if before_commit is not None:
+            # Lo que before_commit escriba (p. ej. la respuesta idempotente) se
+            # confirma junto con la orden, que se le pasa ya recargada
+            db.flush()
+            before_commit(db, get_order(db, order_id=order_id, endpoint="mutation"))
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise order_conflict(db, order_id)
+
+def touch_order(db_order: models.Order):
+    # Un cambio en los items que no altera los totales (p. ej. solo las notas)
+    # no generaría UPDATE de la orden y su versión no subiría: se fuerza
+    db_order.updated_at = func.now()
+
+def release_table(db: Session, db_order: models.Order):
+    # Libera la mesa dentro de la misma transacción que el cambio de la orden
+    if db_order.order_type == models.OrderType.TABLE and db_order.table_id is not None:
+        table = get_table(db, table_id=db_order.table_id)
+        if table is not None:
+            table.is_occupied = False
+
+def create_order(db: Session, order: schemas.OrderCreate, user_id: int, before_commit=None):
+    # Toda la creación de la orden ocurre en una sola transacción: si algo falla
+    # no queda una mesa ocupada sin orden ni una orden sin items.
+    table = None
     if order.order_type == models.OrderType.TABLE:
         table = get_table(db, table_id=order.table_id)
         if not table:
@@ -46,113 +179,213 @@ def create_order(db: Session, order: schemas.OrderCreate, user_id: int):
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Mesa no encontrada"
             )
-        # Marcar la mesa como ocupada
-        occupy_table(db, table_id=order.table_id, is_occupied=True)
     
-    # Calcular totales
-    subtotal = 0
+    # Calcular totales en centavos enteros
+    subtotal_cents = 0
     items_data = []
+    products = resolve_order_products(db, order.items)
     
     for item in order.items:
-        product = get_product(db, product_id=item.product_id)
-        if not product:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Producto con ID {item.product_id} no encontrado"
-            )
-        
-        item_price = product.price * item.quantity
-        subtotal += item_price
+        price_cents = to_cents(products[item.product_id].price)
+        subtotal_cents += price_cents * item.quantity
         
         items_data.append({
             "product_id": item.product_id,
             "quantity": item.quantity,
-            "price": product.price,
+            "price_cents": price_cents,
             "notes": item.notes
         })
     
-    # Calcular impuestos y total (ejemplo: 10% de impuestos)
-    tax_rate = 0.10
-    tax = subtotal * tax_rate
-    total = subtotal + tax
+    # Impuesto según las reglas configuradas para el tipo de orden
+    totals = compute_totals(subtotal_cents, order.order_type)
     
     # Crear la orden
     db_order = models.Order(
-        order_number=generate_order_number(),
+        order_number=generate_order_number(db),
         order_type=order.order_type,
         table_id=order.table_id if order.order_type == models.OrderType.TABLE else None,
         customer_name=order.customer_name if order.order_type == models.OrderType.DELIVERY else None,
         customer_phone=order.customer_phone if order.order_type == models.OrderType.DELIVERY else None,
         customer_address=order.customer_address if order.order_type == models.OrderType.DELIVERY else None,
-        subtotal=subtotal,
-        tax=tax,
-        total=total,
+        subtotal_cents=totals.subtotal_cents,
+        tax_cents=totals.tax_cents,
+        total_cents=totals.total_cents,
         created_by=user_id
     )
     
     db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
+    # Un único flush para obtener el ID de la orden
+    db.flush()
     
-    # Agregar items a la orden
+    # Agregar items a la orden en un solo INSERT masivo
     for item_data in items_data:
-        db_item = models.OrderItem(
-            order_id=db_order.id,
-            **item_data
-        )
-        db.add(db_item)
+        item_data["order_id"] = db_order.id
+    db.bulk_insert_mappings(models.OrderItem, items_data)
     
-    db.commit()
-    db.refresh(db_order)
+    # Marcar la mesa como ocupada dentro de la misma transacción
+    if table is not None:
+        table.is_occupied = True
+    
+    commit_order(db, db_order.id, before_commit)
+    
+    db_order = get_order(db, order_id=db_order.id, endpoint="mutation")
+    record_order_created(db_order)
+    publish_order_event(OrderEventType.ORDER_CREATED, db_order)
     return db_order
 
-def update_order_status(db: Session, order_id: int, status: models.OrderStatus):
-    db_order = get_order(db, order_id=order_id)
-    if not db_order:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Orden no encontrada"
-        )
+def mark_paid(db: Session, db_order: models.Order):
+    # Los agregados de ventas se actualizan en la misma transacción del pago
+    db_order.paid_at = datetime.now()
+    record_sales(db, [db_order])
+
+def update_order_status(
+    db: Session,
+    order_id: int,
+    new_status: models.OrderStatus,
+    expected_version: int = None,
+    user_role=None
+):
+    db_order = get_order_for_update(db, order_id=order_id, expected_version=expected_version)
+    # Sin cambio de estado no se escribe ni se avisa a las pantallas
+    if not check_transition(db_order.status, new_status, user_role):
+        return get_order(db, order_id=order_id, endpoint="mutation")
     
     # Si estamos marcando como pagado o entregado y es una orden de mesa, liberamos la mesa
-    if (status == models.OrderStatus.PAID or status == models.OrderStatus.DELIVERED) and db_order.order_type == models.OrderType.TABLE:
-        occupy_table(db, table_id=db_order.table_id, is_occupied=False)
-    
-    db_order.status = status
-    db.commit()
-    db.refresh(db_order)
+    if new_status in RELEASES_TABLE:
+        release_table(db, db_order)
+    
+    previous_status = db_order.status
+    db_order.status = new_status
+    if new_status == models.OrderStatus.PAID:
+        mark_paid(db, db_order)
+    commit_order(db, order_id)
+    
+    db_order = get_order(db, order_id=order_id, endpoint="mutation")
+    record_status_change(previous_status, db_order.status)
+    publish_order_event(OrderEventType.STATUS_CHANGED, db_order, previous_status=previous_status)
     return db_order
 
-def update_order(db: Session, order_id: int, order: schemas.OrderUpdate):
-    db_order = get_order(db, order_id=order_id)
-    if not db_order:
+def update_orders_status(db: Session, order_ids, new_status: models.OrderStatus, user_role=None):
+    """Cambia el estado de varias órdenes en una sola transacción.
+
+    Se validan todas las transiciones antes de escribir y el cambio se aplica
+    con un único UPDATE condicionado a la versión leída de cada orden; si
+    alguna cambió entretanto no se modifica ninguna (409).
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    rows = db.query(
+        models.Order.id, models.Order.status, models.Order.version,
+        models.Order.order_type, models.Order.table_id, models.Order.created_by,
+        models.Order.subtotal_cents, models.Order.tax_cents, models.Order.total_cents
+    ).filter(models.Order.id.in_(order_ids)).all()
+
+    found_ids = {row.id for row in rows}
+    missing_ids = [order_id for order_id in order_ids if order_id not in found_ids]
+    if missing_ids:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Orden no encontrada"
+            detail=f"Órdenes con ID {', '.join(str(order_id) for order_id in missing_ids)} no encontradas"
+        )
+
+    changing = []
+    errors = {}
+    for row in rows:
+        try:
+            if check_transition(row.status, new_status, user_role):
+                changing.append(row)
+        except HTTPException as exc:
+            errors[row.id] = exc
+    if errors:
+        all_forbidden = all(exc.status_code == status.HTTP_403_FORBIDDEN for exc in errors.values())
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN if all_forbidden else status.HTTP_400_BAD_REQUEST,
+            detail={
+                "message": "No se puede cambiar el estado de algunas órdenes",
+                "orders": {str(order_id): exc.detail for order_id, exc in errors.items()},
+            }
         )
+
+    if changing:
+        values = {
+            models.Order.status: new_status,
+            models.Order.version: models.Order.version + 1,
+        }
+        paid_at = datetime.now()
+        if new_status == models.OrderStatus.PAID:
+            values[models.Order.paid_at] = paid_at
+        updated = db.query(models.Order).filter(
+            tuple_(models.Order.id, models.Order.version).in_([(row.id, row.version) for row in changing])
+        ).update(values, synchronize_session=False)
+        if updated != len(changing):
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Algunas órdenes fueron modificadas por otro usuario"
+            )
+        if new_status in RELEASES_TABLE:
+            table_ids = {
+                row.table_id for row in changing
+                if row.order_type == models.OrderType.TABLE and row.table_id is not None
+            }
+            if table_ids:
+                db.query(Table).filter(Table.id.in_(table_ids)).update(
+                    {Table.is_occupied: False}, synchronize_session=False
+                )
+        if new_status == models.OrderStatus.PAID:
+            record_sales(db, [SimpleNamespace(**row._mapping, paid_at=paid_at) for row in changing])
+        db.commit()
+
+    db_orders = {
+        db_order.id: db_order
+        for db_order in order_query(db, "bulk").filter(models.Order.id.in_(order_ids)).populate_existing()
+    }
+    for row in changing:
+        record_status_change(row.status, new_status)
+        publish_order_event(OrderEventType.STATUS_CHANGED, db_orders[row.id], previous_status=row.status)
+    return [db_orders[order_id] for order_id in order_ids]
+
+def update_order(
+    db: Session,
+    order_id: int,
+    order: schemas.OrderUpdate,
+    expected_version: int = None,
+    user_role=None
+):
+    db_order = get_order_for_update(db, order_id=order_id, expected_version=expected_version)
     
     order_data = order.dict(exclude_unset=True)
     
     # Si estamos actualizando el estado y es para pagar o entregar una orden de mesa, liberamos la mesa
     if "status" in order_data:
-        status = order_data["status"]
-        if (status == models.OrderStatus.PAID or status == models.OrderStatus.DELIVERED) and db_order.order_type == models.OrderType.TABLE:
-            occupy_table(db, table_id=db_order.table_id, is_occupied=False)
+        new_status = order_data["status"]
+        check_transition(db_order.status, new_status, user_role)
+        if new_status in RELEASES_TABLE:
+            release_table(db, db_order)
     
+    previous_status = db_order.status
     for key, value in order_data.items():
         setattr(db_order, key, value)
+    if db_order.status == models.OrderStatus.PAID and previous_status != db_order.status:
+        mark_paid(db, db_order)
+    
+    commit_order(db, order_id)
     
-    db.commit()
-    db.refresh(db_order)
+    db_order = get_order(db, order_id=order_id, endpoint="mutation")
+    if db_order.status != previous_status:
+        record_status_change(previous_status, db_order.status)
+        publish_order_event(OrderEventType.STATUS_CHANGED, db_order, previous_status=previous_status)
+    else:
+        publish_order_event(OrderEventType.ORDER_UPDATED, db_order)
     return db_order
 
-def add_items_to_order(db: Session, order_id: int, items: schemas.OrderItemsCreate):
-    db_order = get_order(db, order_id=order_id)
-    if not db_order:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Orden no encontrada"
-        )
+def add_items_to_order(
+    db: Session,
+    order_id: int,
+    items: schemas.OrderItemsCreate,
+    expected_version: int = None,
+    before_commit=None
+):
+    db_order = get_order_for_update(db, order_id=order_id, expected_version=expected_version)
     
     # Si la orden ya está pagada o entregada, no se pueden agregar más items
     if db_order.status in [models.OrderStatus.PAID, models.OrderStatus.DELIVERED, models.OrderStatus.CANCELLED]:
@@ -161,47 +394,32 @@ def add_items_to_order(db: Session, order_id: int, items: schemas.OrderItemsCrea
             detail=f"No se pueden agregar items a una orden en estado {db_order.status}"
         )
     
-    # Calcular totales adicionales
-    additional_subtotal = 0
     items_data = []
+    products = resolve_order_products(db, items.items)
     
     for item in items.items:
-        product = get_product(db, product_id=item.product_id)
-        if not product:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Producto con ID {item.product_id} no encontrado"
-            )
-        
-        item_price = product.price * item.quantity
-        additional_subtotal += item_price
-        
-        db_item = models.OrderItem(
-            order_id=order_id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            price=product.price,
-            notes=item.notes
-        )
-        db.add(db_item)
+        items_data.append({
+            "order_id": order_id,
+            "product_id": item.product_id,
+            "quantity": item.quantity,
+            "price_cents": to_cents(products[item.product_id].price),
+            "notes": item.notes
+        })
     
-    # Recalcular totales
-    tax_rate = 0.10
-    db_order.subtotal += additional_subtotal
-    db_order.tax = db_order.subtotal * tax_rate
-    db_order.total = db_order.subtotal + db_order.tax
+    db.bulk_insert_mappings(models.OrderItem, items_data)
     
-    db.commit()
-    db.refresh(db_order)
+    # Recalcular totales desde los items
+    recompute_order_totals(db, db_order)
+    touch_order(db_order)
+    
+    commit_order(db, order_id, before_commit)
+    
+    db_order = get_order(db, order_id=order_id, endpoint="mutation")
+    publish_order_event(OrderEventType.ITEMS_CHANGED, db_order)
     return db_order
 
-def remove_item_from_order(db: Session, order_id: int, item_id: int):
-    db_order = get_order(db, order_id=order_id)
-    if not db_order:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Orden no encontrada"
-        )
+def remove_item_from_order(db: Session, order_id: int, item_id: int, expected_version: int = None):
+    db_order = get_order_for_update(db, order_id=order_id, expected_version=expected_version)
     
     # Si la orden ya está pagada o entregada, no se pueden eliminar items
     if db_order.status in [models.OrderStatus.PAID, models.OrderStatus.DELIVERED, models.OrderStatus.CANCELLED]:
@@ -221,25 +439,18 @@ def remove_item_from_order(db: Session, order_id: int, item_id: int):
             detail="Item no encontrado en la orden"
         )
     
-    # Recalcular totales
-    item_total = db_item.price * db_item.quantity
-    db_order.subtotal -= item_total
-    tax_rate = 0.10
-    db_order.tax = db_order.subtotal * tax_rate
-    db_order.total = db_order.subtotal + db_order.tax
-    
     db.delete(db_item)
-    db.commit()
-    db.refresh(db_order)
+    # Recalcular totales desde los items restantes
+    recompute_order_totals(db, db_order)
+    touch_order(db_order)
+    commit_order(db, order_id)
+    
+    db_order = get_order(db, order_id=order_id, endpoint="mutation")
+    publish_order_event(OrderEventType.ITEMS_CHANGED, db_order)
     return db_order
 
-def update_order_item(db: Session, order_id: int, item_id: int, item: schemas.OrderItemUpdate):
-    db_order = get_order(db, order_id=order_id)
-    if not db_order:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Orden no encontrada"
-        )
+def update_order_item(db: Session, order_id: int, item_id: int, item: schemas.OrderItemUpdate, expected_version: int = None):
+    db_order = get_order_for_update(db, order_id=order_id, expected_version=expected_version)
     
     # Si la orden ya está pagada o entregada, no se pueden actualizar items
     if db_order.status in [models.OrderStatus.PAID, models.OrderStatus.DELIVERED, models.OrderStatus.CANCELLED]:
@@ -259,25 +470,17 @@ def update_order_item(db: Session, order_id: int, item_id: int, item: schemas.Or
             detail="Item no encontrado en la orden"
         )
     
-    # Guardar valores anteriores para recalcular
-    old_quantity = db_item.quantity
-    old_total = db_item.price * old_quantity
-    
     # Actualizar el item
     item_data = item.dict(exclude_unset=True)
     for key, value in item_data.items():
         setattr(db_item, key, value)
     
-    # Recalcular totales
-    new_total = db_item.price * db_item.quantity
-    total_difference = new_total - old_total
+    # Recalcular totales desde los items
+    recompute_order_totals(db, db_order)
+    touch_order(db_order)
     
-    db_order.subtotal += total_difference
-    tax_rate = 0.10
-    db_order.tax = db_order.subtotal * tax_rate
-    db_order.total = db_order.subtotal + db_order.tax
+    commit_order(db, order_id)
     
-    db.commit()
-    db.refresh(db_item)
-    db.refresh(db_order)
+    db_order = get_order(db, order_id=order_id, endpoint="mutation")
+    publish_order_event(OrderEventType.ITEMS_CHANGED, db_order)
     return db_order
\ No newline at end of file
@@ -0,0 +1,156 @@
+import asyncio
+import enum
+import json
+import threading
+import time
+from collections import deque
+from typing import Optional
+from . import models, schemas
+
+# Cantidad de eventos recientes que se conservan para reanudar conexiones
+EVENT_BUFFER_SIZE = 1000
+# Eventos pendientes por suscriptor antes de forzar un nuevo snapshot
+SUBSCRIBER_QUEUE_SIZE = 500
+
+class OrderEventType(str, enum.Enum):
+    SNAPSHOT = "snapshot"
+    ORDER_CREATED = "order_created"
+    ITEMS_CHANGED = "items_changed"
+    STATUS_CHANGED = "status_changed"
+    ORDER_UPDATED = "order_updated"
+
+class Station(str, enum.Enum):
+    ALL = "all"
+    KITCHEN = "kitchen"
+    CASHIER = "cashier"
+
+# Estados visibles en cada pantalla
+STATION_STATUSES = {
+    Station.ALL: {
+        models.OrderStatus.PENDING,
+        models.OrderStatus.PREPARING,
+        models.OrderStatus.READY,
+        models.OrderStatus.DELIVERED,
+    },
+    Station.KITCHEN: {models.OrderStatus.PENDING, models.OrderStatus.PREPARING},
+    Station.CASHIER: {models.OrderStatus.READY, models.OrderStatus.DELIVERED},
+}
+
+class OrderEvent:
+    def __init__(self, id: int, type: OrderEventType, order: dict, previous_status: Optional[str] = None):
+        self.id = id
+        self.type = type
+        self.order = order
+        self.previous_status = previous_status
+
+    def matches(self, station: Station):
+        # Un evento interesa a la estación si la orden entra, sigue o sale de su vista
+        statuses = {status.value for status in STATION_STATUSES[station]}
+        return self.order["status"] in statuses or self.previous_status in statuses
+
+    def to_sse(self):
+        data = {"order": self.order, "previous_status": self.previous_status}
+        return format_sse(self.id, self.type.value, data)
+
+def format_sse(event_id: int, event_type: str, data):
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+class Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop, station: Station):
+        self.loop = loop
+        self.station = station
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, event: OrderEvent):
+        # Se ejecuta en el loop del suscriptor
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+class OrderEventBroker:
+    """Difusión en memoria de los cambios de órdenes hacia las pantallas conectadas.
+
+    Los eventos se publican desde los hilos de los endpoints síncronos y se
+    entregan a cada suscriptor en su propio event loop. El buffer circular
+    permite reanudar desde el último ID recibido sin pedir un snapshot nuevo.
+    """
+
+    def __init__(self, buffer_size: int = EVENT_BUFFER_SIZE):
+        self._lock = threading.Lock()
+        self._buffer = deque(maxlen=buffer_size)
+        self._subscribers = set()
+        # Los IDs parten del reloj para seguir siendo crecientes tras un reinicio
+        self.last_event_id = int(time.time() * 1000)
+
+    def publish(self, type: OrderEventType, order: dict, previous_status: Optional[str] = None):
+        with self._lock:
+            self.last_event_id += 1
+            event = OrderEvent(self.last_event_id, type, order, previous_status)
+            self._buffer.append(event)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            if event.matches(subscriber.station):
+                try:
+                    subscriber.loop.call_soon_threadsafe(subscriber.offer, event)
+                except RuntimeError:
+                    # El loop del suscriptor ya se cerró
+                    self.unsubscribe(subscriber)
+        return event
+
+    def subscribe(self, station: Station, last_event_id: Optional[int] = None):
+        # Devuelve el suscriptor, los eventos a reenviar y el ID en el que se
+        # posiciona. Si el ID pedido ya salió del buffer, el backlog es None y
+        # el cliente necesita un snapshot completo.
+        subscriber = Subscriber(asyncio.get_running_loop(), station)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            current_id = self.last_event_id
+            backlog = None
+            if last_event_id is not None and last_event_id <= current_id:
+                oldest_id = self._buffer[0].id if self._buffer else current_id + 1
+                if last_event_id + 1 >= oldest_id:
+                    backlog = [
+                        event for event in self._buffer
+                        if event.id > last_event_id and event.matches(station)
+                    ]
+        return subscriber, backlog, current_id
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+broker = OrderEventBroker()
+
+def serialize_order(db_order: models.Order):
+    return schemas.OrderResponse.model_validate(db_order, from_attributes=True).model_dump(mode="json")
+
+def publish_order_event(type: OrderEventType, db_order: models.Order, previous_status=None):
+    if previous_status is not None:
+        previous_status = models.OrderStatus(previous_status).value
+    return broker.publish(type, serialize_order(db_order), previous_status)
+
+async def event_stream(request, subscriber: Subscriber, snapshot, backlog, current_id: int, heartbeat: float = 15.0):
+    try:
+        # El cliente reintenta a los 2s y envía Last-Event-ID para reanudar
+        yield "retry: 2000\n\n"
+        if snapshot is not None:
+            yield format_sse(current_id, OrderEventType.SNAPSHOT.value, {"orders": snapshot})
+        for event in backlog or []:
+            yield event.to_sse()
+        while not subscriber.overflowed:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": ping\n\n"
+                continue
+            yield event.to_sse()
+        # Si el cliente se retrasó demasiado se cierra el stream; al reconectar
+        # recibe el backlog o un snapshot nuevo
+    finally:
+        broker.unsubscribe(subscriber)
@@ -0,0 +1,114 @@
+import csv
+import io
+import json
+from datetime import date, datetime, time, timedelta, timezone
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..pagination import cursor_param
+from ..products.models import Product
+from .models import Order, OrderItem, OrderStatus
+
+# Columnas de la exportación: una fila por item (o por orden si no tiene items)
+EXPORT_COLUMNS = [
+    ("order_id", Order.id),
+    ("order_number", Order.order_number),
+    ("order_type", Order.order_type),
+    ("status", Order.status),
+    ("created_at", Order.created_at),
+    ("paid_at", Order.paid_at),
+    ("table_id", Order.table_id),
+    ("created_by", Order.created_by),
+    ("customer_name", Order.customer_name),
+    ("order_subtotal_cents", Order.subtotal_cents),
+    ("order_tax_cents", Order.tax_cents),
+    ("order_total_cents", Order.total_cents),
+    ("item_id", OrderItem.id),
+    ("product_id", OrderItem.product_id),
+    ("product_name", Product.name),
+    ("quantity", OrderItem.quantity),
+    ("unit_price_cents", OrderItem.price_cents),
+    ("notes", OrderItem.notes),
+]
+EXPORT_FIELDS = [name for name, _ in EXPORT_COLUMNS]
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+def local_midnight_utc(day: date):
+    """Inicio del día ``day`` en hora local del servidor, expresado en UTC.
+
+    Los días de la exportación son locales, como los de los reportes (que
+    agrupan por paid_at en hora local). created_at lo llena la base con now(),
+    en UTC, así que los límites se convierten antes de comparar.
+    """
+    return datetime.combine(day, time.min).astimezone(timezone.utc)
+
+def export_query(
+    db: Session,
+    start_date: date = None,
+    end_date: date = None,
+    status: OrderStatus = None
+):
+    statement = select(*[column.label(name) for name, column in EXPORT_COLUMNS]).select_from(Order).outerjoin(
+        OrderItem, OrderItem.order_id == Order.id
+    ).outerjoin(Product, Product.id == OrderItem.product_id)
+
+    # Rango inclusivo de días locales sobre la fecha de creación
+    dialect_name = db.get_bind().dialect.name
+    if start_date is not None:
+        statement = statement.where(Order.created_at >= cursor_param(local_midnight_utc(start_date), dialect_name))
+    if end_date is not None:
+        end = local_midnight_utc(end_date + timedelta(days=1))
+        statement = statement.where(Order.created_at < cursor_param(end, dialect_name))
+    if status:
+        statement = statement.where(Order.status == status)
+    return statement.order_by(Order.id, OrderItem.id)
+
+def export_value(value):
+    if hasattr(value, "value"):
+        return value.value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def iter_export_rows(db: Session, statement, batch_size: int = None):
+    """Itera las filas de la exportación por lotes con un cursor del servidor.
+
+    yield_per activa stream_results (cursor con nombre en PostgreSQL), así que
+    solo un lote de filas vive en memoria sin importar el tamaño del rango.
+    La sesión se cierra al terminar o si el cliente corta la descarga.
+    """
+    try:
+        result = db.execute(statement.execution_options(yield_per=batch_size or settings.export_batch_size))
+        for partition in result.partitions():
+            yield [[export_value(value) for value in row] for row in partition]
+    finally:
+        db.close()
+
+def iter_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Encabezado de una exportación vacía
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def iter_ndjson(batches):
+    for rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False, separators=(",", ":")) + "\n"
+            for row in rows
+        )
+
+EXPORT_WRITERS = {
+    "csv": iter_csv,
+    "ndjson": iter_ndjson,
+}
@@ -1,5 +1,6 @@
 import enum
-from sqlalchemy import Column, Integer, String, Float, Boolean, Enum, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, Enum, DateTime, ForeignKey, Text, Index
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..db import Base
@@ -25,37 +26,77 @@ class Order(Base):
     status = Column(Enum(OrderStatus), default=OrderStatus.PENDING, index=True)
     
     # Para pedidos de mesa
-    table_id = Column(Integer, ForeignKey("tables.id"), nullable=True)
+    table_id = Column(Integer, ForeignKey("tables.id"), nullable=True, index=True)
     
     # Para pedidos a domicilio
     customer_name = Column(String, nullable=True)
     customer_phone = Column(String, nullable=True)
     customer_address = Column(Text, nullable=True)
     
-    subtotal = Column(Float, default=0)
-    tax = Column(Float, default=0)
-    total = Column(Float, default=0)
+    # Montos en centavos enteros (ver pricing.py); la API los expone en
+    # unidades a través de subtotal, tax y total
+    subtotal_cents = Column(Integer, nullable=False, default=0, server_default="0")
+    tax_cents = Column(Integer, nullable=False, default=0, server_default="0")
+    total_cents = Column(Integer, nullable=False, default=0, server_default="0")
     
-    created_by = Column(Integer, ForeignKey("users.id"))
+    created_by = Column(Integer, ForeignKey("users.id"), index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Indexado para la sincronización incremental de órdenes cerradas
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), index=True)
+    # Control de concurrencia optimista: cada UPDATE de la orden incluye
+    # "WHERE version = <leída>" y la incrementa
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Hora local del servidor en que la orden pasó a PAID (reportes de ventas)
+    paid_at = Column(DateTime, nullable=True)
 
     table = relationship("Table", back_populates="orders")
     user = relationship("User")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Paginación por cursor (created_at, id) del listado de órdenes
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        # Pantallas de cocina y caja: filtran por estado y ordenan por antigüedad
+        Index("ix_orders_status_created_at", "status", "created_at"),
+    )
+    __mapper_args__ = {"version_id_col": version}
+
+    @hybrid_property
+    def subtotal(self):
+        return self.subtotal_cents / 100
+
+    @hybrid_property
+    def tax(self):
+        return self.tax_cents / 100
+
+    @hybrid_property
+    def total(self):
+        return self.total_cents / 100
+
+class OrderSequence(Base):
+    """Último número de orden reservado por día y local."""
+    __tablename__ = "order_sequences"
+
+    day = Column(String(8), primary_key=True)
+    location = Column(String, primary_key=True)
+    last_value = Column(Integer, nullable=False, default=0)
+
 class OrderItem(Base):
     __tablename__ = "order_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
-    product_id = Column(Integer, ForeignKey("products.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), index=True)
     quantity = Column(Integer, default=1)
-    price = Column(Float)  # Precio en el momento de la orden
+    price_cents = Column(Integer, nullable=False)  # Precio en el momento de la orden
     notes = Column(Text, nullable=True)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     order = relationship("Order", back_populates="items")
-    product = relationship("Product", back_populates="order_items")
\ No newline at end of file
+    product = relationship("Product", back_populates="order_items")
+
+    @hybrid_property
+    def price(self):
+        return self.price_cents / 100
\ No newline at end of file
@@ -0,0 +1,85 @@
+import threading
+from datetime import datetime
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..config import settings
+from .models import OrderSequence
+
+def insert_ignore(dialect_name: str):
+    # INSERT que no falla si el contador del día ya existe
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert(OrderSequence).on_conflict_do_nothing()
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert(OrderSequence).on_conflict_do_nothing()
+    return None
+
+def reserve_block(engine, day: str, location: str, size: int):
+    """Reserva ``size`` números consecutivos y devuelve el rango [inicio, fin].
+
+    Se usa una transacción propia y corta: el contador queda bloqueado solo
+    durante el UPDATE y no durante toda la creación de la orden.
+    """
+    with engine.begin() as conn:
+        statement = insert_ignore(conn.dialect.name)
+        if statement is not None:
+            conn.execute(statement.values(day=day, location=location, last_value=0))
+        else:
+            try:
+                with conn.begin_nested():
+                    conn.execute(OrderSequence.__table__.insert().values(day=day, location=location, last_value=0))
+            except IntegrityError:
+                pass
+        end = conn.execute(
+            update(OrderSequence)
+            .where(OrderSequence.day == day, OrderSequence.location == location)
+            .values(last_value=OrderSequence.last_value + size)
+            .returning(OrderSequence.last_value)
+        ).scalar_one()
+    return end - size + 1, end
+
+class OrderNumberAllocator:
+    """Genera números de orden únicos por día y local a partir de bloques.
+
+    Cada worker reserva en la base de datos un bloque de números (UPDATE
+    atómico sobre order_sequences) y los entrega desde memoria, así que solo
+    una de cada ``block_size`` órdenes toca el contador. Los números son
+    crecientes dentro de cada worker; entre workers pueden intercalarse y los
+    sobrantes de un bloque se pierden al reiniciar (quedan huecos).
+    """
+
+    def __init__(self, location: str, block_size: int):
+        self.location = location
+        self.block_size = max(block_size, 1)
+        self._lock = threading.Lock()
+        self._day = None
+        self._next = 0
+        self._end = -1
+
+    def next_value(self, engine, day: str):
+        with self._lock:
+            if day != self._day or self._next > self._end:
+                self._next, self._end = reserve_block(engine, day, self.location, self.block_size)
+                self._day = day
+            value = self._next
+            self._next += 1
+            return value
+
+    def reset(self):
+        # Descarta el bloque en memoria (p. ej. al cambiar de base de datos)
+        with self._lock:
+            self._day = None
+            self._next = 0
+            self._end = -1
+
+    def generate(self, db: Session, now: datetime = None):
+        now = now or datetime.now()
+        day = now.strftime("%Y%m%d")
+        bind = db.get_bind()
+        value = self.next_value(getattr(bind, "engine", bind), day)
+        # Ancho fijo para que el orden alfabético coincida con el de creación
+        return f"ORD-{day}-{self.location}-{value:05d}"
+
+order_numbers = OrderNumberAllocator(settings.location_code, settings.order_number_block_size)
@@ -0,0 +1,83 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import NamedTuple
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import Session
+from ..config import settings
+from . import models
+
+# Las tasas se guardan en puntos básicos (1000 = 10%) para operar solo con enteros
+BASIS_POINTS = 10000
+
+def to_basis_points(rate: float):
+    return int((Decimal(str(rate)) * BASIS_POINTS).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+TAX_RULES = {
+    models.OrderType.TABLE: to_basis_points(settings.tax_rate_table),
+    models.OrderType.DELIVERY: to_basis_points(settings.tax_rate_delivery),
+}
+
+class Totals(NamedTuple):
+    subtotal_cents: int
+    tax_cents: int
+    total_cents: int
+
+def to_cents(amount: float):
+    # Se pasa por str para que 8.99 sea 899 y no 898.99999...
+    return int((Decimal(str(amount)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def tax_cents(subtotal_cents: int, order_type: models.OrderType):
+    # Redondeo half-up al centavo, en aritmética entera
+    return (subtotal_cents * TAX_RULES[order_type] + BASIS_POINTS // 2) // BASIS_POINTS
+
+def compute_totals(subtotal_cents: int, order_type: models.OrderType):
+    tax = tax_cents(subtotal_cents, order_type)
+    return Totals(subtotal_cents, tax, subtotal_cents + tax)
+
+def apply_totals(db_order: models.Order, totals: Totals):
+    db_order.subtotal_cents = totals.subtotal_cents
+    db_order.tax_cents = totals.tax_cents
+    db_order.total_cents = totals.total_cents
+
+def items_subtotal(order_id):
+    return select(
+        func.coalesce(func.sum(models.OrderItem.price_cents * models.OrderItem.quantity), 0)
+    ).where(models.OrderItem.order_id == order_id)
+
+def recompute_order_totals(db: Session, db_order: models.Order):
+    """Recalcula los totales de la orden desde sus items con una sola consulta.
+
+    Los totales nunca se ajustan con sumas y restas sucesivas: siempre se
+    derivan de los items, así que no acumulan diferencias.
+    """
+    # Los cambios pendientes de los items deben estar en la base antes del SUM
+    db.flush()
+    subtotal = db.execute(items_subtotal(db_order.id)).scalar_one()
+    totals = compute_totals(subtotal, db_order.order_type)
+    apply_totals(db_order, totals)
+    return totals
+
+def recompute_totals(db: Session, order_ids=None):
+    """Recalcula en bloque los totales de muchas órdenes con dos UPDATE.
+
+    Toda la aritmética ocurre en la base de datos sobre enteros, sin traer
+    las órdenes a Python. Sin ``order_ids`` se recalculan todas.
+    """
+    orders = models.Order.__table__
+    subtotal = items_subtotal(orders.c.id).scalar_subquery()
+    rate = case(
+        *[(orders.c.order_type == order_type, rate) for order_type, rate in TAX_RULES.items()],
+        else_=0
+    )
+    tax = (orders.c.subtotal_cents * rate + BASIS_POINTS // 2) // BASIS_POINTS
+
+    subtotal_update = update(orders).values(subtotal_cents=subtotal)
+    # En SET se usan los valores previos de la fila: el total se calcula con la misma expresión del impuesto
+    totals_update = update(orders).values(tax_cents=tax, total_cents=orders.c.subtotal_cents + tax)
+    if order_ids is not None:
+        subtotal_update = subtotal_update.where(orders.c.id.in_(order_ids))
+        totals_update = totals_update.where(orders.c.id.in_(order_ids))
+
+    updated = db.execute(subtotal_update).rowcount
+    db.execute(totals_update)
+    db.commit()
+    return updated
@@ -1,40 +1,150 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from ..db import get_db
+from datetime import date
+from typing import List, Literal, Optional
+from ..db import get_db, get_session, run_crud
 from ..auth.dependencies import get_current_active_user, get_waiter_user, get_kitchen_user, get_cashier_user
-from ..users.models import User
+from ..users.schemas import UserResponse
+from ..pagination import MAX_PAGE_SIZE, set_next_cursor
+from ..idempotency.utils import run_idempotent
+from ..request_stats import TimedRoute
 from . import crud, schemas, models
+from .export import EXPORT_WRITERS, MEDIA_TYPES, export_query, iter_export_rows
+from .events import Station, STATION_STATUSES, broker, event_stream, serialize_order
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+
+def parse_if_match(if_match: Optional[str]):
+    # If-Match lleva la versión de la orden que el cliente tenía, p. ej. "3" o 3
+    if if_match is None:
+        return None
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="If-Match debe contener la versión de la orden"
+        )
 
 @router.post("/", response_model=schemas.OrderResponse, status_code=status.HTTP_201_CREATED)
-def create_order(
+async def create_order(
     order: schemas.OrderCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_waiter_user)
+    request: Request,
+    db=Depends(get_session),
+    current_user: UserResponse = Depends(get_waiter_user)
 ):
-    return crud.create_order(db=db, order=order, user_id=current_user.id)
+    # Con Idempotency-Key, un reintento de la tablet devuelve la orden ya creada
+    return await run_idempotent(
+        request, db, current_user.id, status.HTTP_201_CREATED,
+        lambda before_commit: run_crud(
+            db, crud.create_order, order=order, user_id=current_user.id, before_commit=before_commit
+        ),
+        serialize_order
+    )
 
 @router.get("/", response_model=List[schemas.OrderSummary])
-def read_orders(
+async def read_orders(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     status: Optional[models.OrderStatus] = None,
     order_type: Optional[models.OrderType] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db=Depends(get_session),
+    current_user: UserResponse = Depends(get_current_active_user)
 ):
-    orders = crud.get_orders(db, skip=skip, limit=limit, status=status, order_type=order_type)
+    orders = await run_crud(
+        db, crud.get_orders,
+        skip=skip, limit=limit, status=status, order_type=order_type, cursor=cursor
+    )
+    set_next_cursor(response, orders)
     return orders
 
+# Las rutas fijas deben registrarse antes de /{order_id}
+@router.get("/kitchen", response_model=List[schemas.OrderResponse])
+async def read_kitchen_orders(
+    db=Depends(get_session),
+    current_user: UserResponse = Depends(get_kitchen_user)
+):
+    return await run_crud(db, crud.get_kitchen_orders)
+
+@router.get("/cashier/pending", response_model=List[schemas.OrderResponse])
+async def read_cashier_pending_orders(
+    db=Depends(get_session),
+    current_user: UserResponse = Depends(get_cashier_user)
+):
+    return await run_crud(db, crud.get_cashier_pending_orders)
+
+@router.get("/export")
+def export_orders(
+    format: Literal["csv", "ndjson"] = "csv",
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    status: Optional[models.OrderStatus] = None,
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_cashier_user)
+):
+    # Órdenes con sus items y productos, escritas a medida que se leen. Las
+    # fechas son días locales sobre created_at (ver export.local_midnight_utc)
+    statement = export_query(db, start_date=start_date, end_date=end_date, status=status)
+    filename = f"orders-{start_date or 'inicio'}-{end_date or 'hoy'}.{format}"
+    return StreamingResponse(
+        EXPORT_WRITERS[format](iter_export_rows(db, statement)),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def build_station_snapshot(db: Session, station: Station):
+    orders = crud.get_orders_by_status(db, STATION_STATUSES[station])
+    return [serialize_order(order) for order in orders]
+
+@router.get("/stream")
+async def stream_orders(
+    request: Request,
+    station: Station = Station.ALL,
+    last_event_id: Optional[int] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_current_active_user)
+):
+    # Server-Sent Events: snapshot inicial (o reenvío desde Last-Event-ID) y
+    # luego los cambios de órdenes a medida que ocurren
+    subscriber, backlog, current_id = broker.subscribe(station, last_event_id)
+    snapshot = None
+    if backlog is None:
+        try:
+            snapshot = await run_in_threadpool(build_station_snapshot, db, station)
+        except Exception:
+            broker.unsubscribe(subscriber)
+            raise
+    # La conexión a la base de datos no se retiene mientras dura el stream
+    db.close()
+    return StreamingResponse(
+        event_stream(request, subscriber, snapshot, backlog, current_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.put("/status", response_model=List[schemas.OrderResponse])
+async def update_orders_status(
+    update: schemas.OrderStatusBulkUpdate,
+    db=Depends(get_session),
+    current_user: UserResponse = Depends(get_current_active_user)
+):
+    # Cambio de estado de varias órdenes a la vez (p. ej. "bump" de cocina)
+    return await run_crud(
+        db, crud.update_orders_status,
+        order_ids=update.order_ids, new_status=update.status, user_role=current_user.role
+    )
+
 @router.get("/{order_id}", response_model=schemas.OrderResponse)
-def read_order(
+async def read_order(
     order_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db=Depends(get_session),
+    current_user: UserResponse = Depends(get_current_active_user)
 ):
-    db_order = crud.get_order(db, order_id=order_id)
+    db_order = await run_crud(db, crud.get_order, order_id=order_id, endpoint="detail")
     if db_order is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -43,92 +153,76 @@ def read_order(
     return db_order
 
 @router.put("/{order_id}/status", response_model=schemas.OrderResponse)
-def update_order_status(
+async def update_order_status(
     order_id: int,
-    status: models.OrderStatus,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    new_status: models.OrderStatus = Query(..., alias="status"),
+    if_match: Optional[str] = Header(None),
+    db=Depends(get_session),
+    current_user: UserResponse = Depends(get_current_active_user)
 ):
-    # Validar permisos según el estado a actualizar
-    if status in [models.OrderStatus.PREPARING, models.OrderStatus.READY]:
-        # Solo cocina y admin pueden cambiar a estos estados
-        if current_user.role not in [models.UserRole.KITCHEN, models.UserRole.ADMIN]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="No tienes permiso para cambiar a este estado"
-            )
-    elif status == models.OrderStatus.PAID:
-        # Solo cajero y admin pueden marcar como pagado
-        if current_user.role not in [models.UserRole.CASHIER, models.UserRole.ADMIN]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="No tienes permiso para marcar como pagado"
-            )
-    elif status == models.OrderStatus.DELIVERED:
-        # Solo mesero y admin pueden marcar como entregado
-        if current_user.role not in [models.UserRole.WAITER, models.UserRole.ADMIN]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="No tienes permiso para marcar como entregado"
-            )
-    
-    return crud.update_order_status(db=db, order_id=order_id, status=status)
+    # Los permisos por rol se validan en la tabla de transiciones
+    return await run_crud(
+        db, crud.update_order_status,
+        order_id=order_id, new_status=new_status,
+        expected_version=parse_if_match(if_match), user_role=current_user.role
+    )
 
 @router.put("/{order_id}", response_model=schemas.OrderResponse)
-def update_order(
+async def update_order(
     order_id: int,
     order: schemas.OrderUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_waiter_user)
+    if_match: Optional[str] = Header(None),
+    db=Depends(get_session),
+    current_user: UserResponse = Depends(get_waiter_user)
 ):
-    return crud.update_order(db=db, order_id=order_id, order=order)
+    return await run_crud(
+        db, crud.update_order,
+        order_id=order_id, order=order,
+        expected_version=parse_if_match(if_match), user_role=current_user.role
+    )
 
 @router.post("/{order_id}/items", response_model=schemas.OrderResponse)
-def add_items_to_order(
+async def add_items_to_order(
     order_id: int,
     items: schemas.OrderItemsCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_waiter_user)
+    request: Request,
+    if_match: Optional[str] = Header(None),
+    db=Depends(get_session),
+    current_user: UserResponse = Depends(get_waiter_user)
 ):
-    return crud.add_items_to_order(db=db, order_id=order_id, items=items)
+    expected_version = parse_if_match(if_match)
+    return await run_idempotent(
+        request, db, current_user.id, status.HTTP_200_OK,
+        lambda before_commit: run_crud(
+            db, crud.add_items_to_order,
+            order_id=order_id, items=items, expected_version=expected_version, before_commit=before_commit
+        ),
+        serialize_order
+    )
 
 @router.delete("/{order_id}/items/{item_id}", response_model=schemas.OrderResponse)
-def remove_item_from_order(
+async def remove_item_from_order(
     order_id: int,
     item_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_waiter_user)
+    if_match: Optional[str] = Header(None),
+    db=Depends(get_session),
+    current_user: UserResponse = Depends(get_waiter_user)
 ):
-    return crud.remove_item_from_order(db=db, order_id=order_id, item_id=item_id)
+    return await run_crud(
+        db, crud.remove_item_from_order,
+        order_id=order_id, item_id=item_id, expected_version=parse_if_match(if_match)
+    )
 
 @router.put("/{order_id}/items/{item_id}", response_model=schemas.OrderResponse)
-def update_order_item(
+async def update_order_item(
     order_id: int,
     item_id: int,
     item: schemas.OrderItemUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_waiter_user)
-):
-    return crud.update_order_item(db=db, order_id=order_id, item_id=item_id, item=item)
-
-@router.get("/kitchen", response_model=List[schemas.OrderResponse])
-def read_kitchen_orders(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_kitchen_user)
-):
-    # Órdenes para mostrar en cocina (pendientes y en preparación)
-    kitchen_statuses = [models.OrderStatus.PENDING, models.OrderStatus.PREPARING]
-    orders = db.query(models.Order).filter(models.Order.status.in_(kitchen_statuses)).order_by(models.Order.created_at.asc()).all()
-    return orders
-
-@router.get("/cashier/pending", response_model=List[schemas.OrderResponse])
-def read_cashier_pending_orders(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_cashier_user)
+    if_match: Optional[str] = Header(None),
+    db=Depends(get_session),
+    current_user: UserResponse = Depends(get_waiter_user)
 ):
-    # Órdenes listas para pagar (listas para entrega o entregadas pero no pagadas)
-    cashier_statuses = [models.OrderStatus.READY, models.OrderStatus.DELIVERED]
-    orders = db.query(models.Order).filter(
-        models.Order.status.in_(cashier_statuses)
-    ).order_by(models.Order.created_at.asc()).all()
-    return orders
\ No newline at end of file
+    return await run_crud(
+        db, crud.update_order_item,
+        order_id=order_id, item_id=item_id, item=item, expected_version=parse_if_match(if_match)
+    )
@@ -64,6 +64,17 @@ class OrderUpdate(BaseModel):
     customer_phone: Optional[str] = None
     customer_address: Optional[str] = None
 
+    @validator('status')
+    def validate_status(cls, v):
+        # Omitir el campo conserva el estado; un null explícito no es un estado
+        if v is None:
+            raise ValueError('El estado no puede ser nulo')
+        return v
+
+class OrderStatusBulkUpdate(BaseModel):
+    order_ids: List[int] = Field(..., min_length=1, max_length=200)
+    status: OrderStatus
+
 class OrderResponse(OrderBase):
     id: int
     order_number: str
@@ -74,6 +85,8 @@ class OrderResponse(OrderBase):
     created_by: int
     created_at: datetime
     updated_at: Optional[datetime] = None
+    # Se envía en If-Match al modificar la orden
+    version: int
     items: List[OrderItemResponse]
     table: Optional[Table] = None
 
@@ -89,6 +102,7 @@ class OrderSummary(BaseModel):
     created_at: datetime
     table_id: Optional[int] = None
     customer_name: Optional[str] = None
+    version: int
 
     class Config:
         orm_mode = True
\ No newline at end of file
@@ -0,0 +1,55 @@
+from fastapi import HTTPException, status
+from ..users.models import UserRole
+from .models import OrderStatus
+
+# Estado actual -> {estado destino: roles que pueden hacer el cambio}.
+# El administrador puede hacer cualquier cambio de esta tabla; lo que no
+# aparece aquí (p. ej. de PAID a PENDING) no está permitido para nadie.
+TRANSITIONS = {
+    OrderStatus.PENDING: {
+        OrderStatus.PREPARING: {UserRole.KITCHEN},
+        OrderStatus.CANCELLED: {UserRole.WAITER, UserRole.CASHIER},
+    },
+    OrderStatus.PREPARING: {
+        OrderStatus.READY: {UserRole.KITCHEN},
+        # La cocina puede devolver una comanda marcada por error
+        OrderStatus.PENDING: {UserRole.KITCHEN},
+        OrderStatus.CANCELLED: {UserRole.CASHIER},
+    },
+    OrderStatus.READY: {
+        OrderStatus.DELIVERED: {UserRole.WAITER},
+        OrderStatus.PAID: {UserRole.CASHIER},
+        OrderStatus.PREPARING: {UserRole.KITCHEN},
+        OrderStatus.CANCELLED: {UserRole.CASHIER},
+    },
+    OrderStatus.DELIVERED: {
+        OrderStatus.PAID: {UserRole.CASHIER},
+    },
+    OrderStatus.PAID: {},
+    OrderStatus.CANCELLED: {},
+}
+
+# Al pagar o entregar una orden de mesa se libera la mesa
+RELEASES_TABLE = {OrderStatus.PAID, OrderStatus.DELIVERED}
+
+def role_allowed(roles, role: UserRole):
+    return role is None or role == UserRole.ADMIN or role in roles
+
+def check_transition(current: OrderStatus, target: OrderStatus, role: UserRole = None):
+    # Devuelve False si no hay cambio; lanza 400 si la transición no existe y
+    # 403 si el rol no puede hacerla. role=None omite la validación de rol.
+    current, target = OrderStatus(current), OrderStatus(target)
+    if current == target:
+        return False
+    roles = TRANSITIONS[current].get(target)
+    if roles is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"No se puede cambiar una orden de {current.value} a {target.value}"
+        )
+    if not role_allowed(roles, role):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"No tienes permiso para cambiar una orden a {target.value}"
+        )
+    return True
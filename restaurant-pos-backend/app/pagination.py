@@ -0,0 +1,81 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException, Response, status
+from sqlalchemy import String, literal, tuple_
+
+# Cabecera con el cursor de la página siguiente; el cuerpo sigue siendo una lista
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Tamaño máximo de página aceptado por los listados
+MAX_PAGE_SIZE = 1000
+
+class Page(list):
+    """Lista de resultados con el cursor opaco de la página siguiente (o None)."""
+
+    def __init__(self, items, next_cursor=None):
+        super().__init__(items)
+        self.next_cursor = next_cursor
+
+def encode_cursor(values):
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, columns, detail: str = "Cursor de paginación inválido"):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(payload, list) or len(payload) != len(columns):
+            raise ValueError(cursor)
+        return [
+            datetime.fromisoformat(value) if column.type.python_type is datetime else value
+            for column, value in zip(columns, payload)
+        ]
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=detail
+        )
+
+def cursor_param(value, dialect_name: str):
+    # SQLite guarda CURRENT_TIMESTAMP como texto sin fracción de segundo; se
+    # compara con el mismo formato para que las filas empatadas no se repitan
+    if dialect_name == "sqlite" and isinstance(value, datetime):
+        text_value = value.strftime("%Y-%m-%d %H:%M:%S")
+        if value.microsecond:
+            text_value += f".{value.microsecond:06d}"
+        return literal(text_value, String)
+    return literal(value)
+
+def keyset_paginate(query, columns, limit: int, cursor: str = None, descending: bool = False, offset: int = 0):
+    """Paginación por cursor sobre ``columns`` (la última debe ser única, p. ej. el ID).
+
+    En lugar de OFFSET se filtra por la tupla de la última fila entregada, de
+    modo que cada página cuesta lo mismo sin importar su profundidad si existe
+    un índice compuesto sobre esas columnas. ``offset`` se mantiene solo por
+    compatibilidad con los clientes que aún envían ``skip``.
+    """
+    if limit <= 0:
+        return Page([])
+    if cursor:
+        dialect_name = query.session.get_bind().dialect.name
+        values = decode_cursor(cursor, columns)
+        keys = tuple_(*columns)
+        params = tuple_(*[cursor_param(value, dialect_name) for value in values])
+        query = query.filter(keys < params if descending else keys > params)
+
+    order = [column.desc() if descending else column.asc() for column in columns]
+    query = query.order_by(*order)
+    if offset and not cursor:
+        query = query.offset(offset)
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+    return Page(rows, next_cursor)
+
+def set_next_cursor(response: Response, page):
+    if getattr(page, "next_cursor", None):
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
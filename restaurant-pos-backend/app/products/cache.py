@@ -0,0 +1,81 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from ..config import settings
+
+class MenuSnapshot:
+    def __init__(self, version: int, body: bytes, next_cursor=None, ttl_seconds: int = 0):
+        self.version = version
+        self.body = body
+        # El ETag depende solo del contenido: dos workers con el mismo menú
+        # responden el mismo ETag y el 304 funciona aunque cambie el worker
+        self.etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        self.next_cursor = next_cursor
+        self.expires_at = time.monotonic() + ttl_seconds
+
+class MenuCache:
+    """Snapshots pre-serializados del catálogo (productos y categorías).
+
+    Cada combinación de filtros y página guarda el JSON ya generado junto con
+    su ETag. Las operaciones de products.crud llaman a bump() después del
+    commit, lo que incrementa la versión y descarta todos los snapshots. El
+    TTL limita cuánto tiempo otro worker puede servir un menú desactualizado.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            snapshot = self._entries.get(key)
+            if snapshot is None or snapshot.version != self.version or snapshot.expires_at < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return snapshot
+
+    def set(self, key, items, schema, next_cursor=None, version: int = None):
+        data = [schema.model_validate(item, from_attributes=True).model_dump(mode="json") for item in items]
+        body = json.dumps(data, separators=(",", ":")).encode()
+        with self._lock:
+            # Si hubo un bump mientras se consultaba, el snapshot ya nace viejo
+            snapshot = MenuSnapshot(self.version if version is None else version, body, next_cursor, self.ttl_seconds)
+            if self.max_entries > 0 and snapshot.version == self.version:
+                self._entries[key] = snapshot
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return snapshot
+
+    def bump(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            return self.version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+menu_cache = MenuCache(settings.menu_cache_max_entries, settings.menu_cache_ttl_seconds)
+
+def etag_matches(if_none_match: str, etag: str):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Se acepta la comparación débil (W/"...") como indica RFC 9110 para If-None-Match
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
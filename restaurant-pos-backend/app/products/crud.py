@@ -1,6 +1,9 @@
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from . import models, schemas
+from ..pagination import keyset_paginate
+from .cache import menu_cache
+from ..sync.models import DeletedRecord
 
 # Operaciones CRUD para Categorías
 def get_category(db: Session, category_id: int):
@@ -9,8 +12,18 @@ def get_category(db: Session, category_id: int):
 def get_category_by_name(db: Session, name: str):
     return db.query(models.Category).filter(models.Category.name == name).first()
 
-def get_categories(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Category).offset(skip).limit(limit).all()
+def get_categories(db: Session, skip: int = 0, limit: int = 100, cursor: str = None):
+    return keyset_paginate(db.query(models.Category), [models.Category.id], limit=limit, cursor=cursor, offset=skip)
+
+def get_categories_snapshot(db: Session, skip: int = 0, limit: int = 100, cursor: str = None):
+    key = ("categories", skip, limit, cursor)
+    snapshot = menu_cache.get(key)
+    if snapshot is None:
+        # La versión se toma antes de consultar para no guardar datos previos a un bump
+        version = menu_cache.version
+        categories = get_categories(db, skip=skip, limit=limit, cursor=cursor)
+        snapshot = menu_cache.set(key, categories, schemas.Category, categories.next_cursor, version=version)
+    return snapshot
 
 def create_category(db: Session, category: schemas.CategoryCreate):
     db_category = get_category_by_name(db, name=category.name)
@@ -23,6 +36,7 @@ def create_category(db: Session, category: schemas.CategoryCreate):
     db_category = models.Category(**category.dict())
     db.add(db_category)
     db.commit()
+    menu_cache.bump()
     db.refresh(db_category)
     return db_category
 
@@ -40,6 +54,7 @@ def update_category(db: Session, category_id: int, category: schemas.CategoryUpd
         setattr(db_category, key, value)
     
     db.commit()
+    menu_cache.bump()
     db.refresh(db_category)
     return db_category
 
@@ -52,24 +67,51 @@ def delete_category(db: Session, category_id: int):
         )
     
     db.delete(db_category)
+    # Tombstone para la sincronización incremental, en la misma transacción
+    db.add(DeletedRecord(entity="categories", entity_id=category_id))
     db.commit()
+    menu_cache.bump()
     return {"ok": True}
 
 # Operaciones CRUD para Productos
 def get_product(db: Session, product_id: int):
     return db.query(models.Product).filter(models.Product.id == product_id).first()
 
+def get_products_by_ids(db: Session, product_ids):
+    # Obtiene varios productos en una sola consulta (IN) y los devuelve indexados por ID
+    ids = set(product_ids)
+    if not ids:
+        return {}
+    products = db.query(models.Product).filter(models.Product.id.in_(ids)).all()
+    return {product.id: product for product in products}
+
 def get_products(
     db: Session, 
     skip: int = 0, 
     limit: int = 100, 
-    category_id: int = None
+    category_id: int = None,
+    cursor: str = None
 ):
     query = db.query(models.Product)
     if category_id:
         query = query.filter(models.Product.category_id == category_id)
     
-    return query.offset(skip).limit(limit).all()
+    return keyset_paginate(query, [models.Product.id], limit=limit, cursor=cursor, offset=skip)
+
+def get_products_snapshot(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    category_id: int = None,
+    cursor: str = None
+):
+    key = ("products", skip, limit, category_id, cursor)
+    snapshot = menu_cache.get(key)
+    if snapshot is None:
+        version = menu_cache.version
+        products = get_products(db, skip=skip, limit=limit, category_id=category_id, cursor=cursor)
+        snapshot = menu_cache.set(key, products, schemas.ProductSimple, products.next_cursor, version=version)
+    return snapshot
 
 def create_product(db: Session, product: schemas.ProductCreate):
     db_category = get_category(db, category_id=product.category_id)
@@ -82,6 +124,7 @@ def create_product(db: Session, product: schemas.ProductCreate):
     db_product = models.Product(**product.dict())
     db.add(db_product)
     db.commit()
+    menu_cache.bump()
     db.refresh(db_product)
     return db_product
 
@@ -109,6 +152,7 @@ def update_product(db: Session, product_id: int, product: schemas.ProductUpdate)
         setattr(db_product, key, value)
     
     db.commit()
+    menu_cache.bump()
     db.refresh(db_product)
     return db_product
 
@@ -121,5 +165,7 @@ def delete_product(db: Session, product_id: int):
         )
     
     db.delete(db_product)
+    db.add(DeletedRecord(entity="products", entity_id=product_id))
     db.commit()
+    menu_cache.bump()
     return {"ok": True}
\ No newline at end of file
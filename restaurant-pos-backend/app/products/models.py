@@ -22,7 +22,7 @@ class Product(Base):
     name = Column(String, index=True)
     description = Column(Text, nullable=True)
     price = Column(Float)
-    category_id = Column(Integer, ForeignKey("categories.id"))
+    category_id = Column(Integer, ForeignKey("categories.id"), index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -1,37 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from ..db import get_db
 from ..auth.dependencies import get_admin_user, get_current_active_user
-from ..users.models import User
+from ..users.schemas import UserResponse
+from ..pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
+from ..request_stats import TimedRoute
 from . import crud, schemas, models
+from .cache import etag_matches
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+
+def menu_response(request: Request, snapshot):
+    # no-cache: el cliente puede guardar el menú pero debe revalidarlo con If-None-Match
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+    if snapshot.next_cursor:
+        headers[NEXT_CURSOR_HEADER] = snapshot.next_cursor
+    if etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
 
 # Rutas para categorías
 @router.post("/categories/", response_model=schemas.Category, status_code=status.HTTP_201_CREATED)
 def create_category(
     category: schemas.CategoryCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_admin_user)
+    current_user: UserResponse = Depends(get_admin_user)
 ):
     return crud.create_category(db=db, category=category)
 
 @router.get("/categories/", response_model=List[schemas.Category])
 def read_categories(
+    request: Request,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: UserResponse = Depends(get_current_active_user)
 ):
-    categories = crud.get_categories(db, skip=skip, limit=limit)
-    return categories
+    snapshot = crud.get_categories_snapshot(db, skip=skip, limit=limit, cursor=cursor)
+    return menu_response(request, snapshot)
 
 @router.get("/categories/{category_id}", response_model=schemas.Category)
 def read_category(
     category_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: UserResponse = Depends(get_current_active_user)
 ):
     db_category = crud.get_category(db, category_id=category_id)
     if db_category is None:
@@ -46,7 +60,7 @@ def update_category(
     category_id: int,
     category: schemas.CategoryUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_admin_user)
+    current_user: UserResponse = Depends(get_admin_user)
 ):
     return crud.update_category(db=db, category_id=category_id, category=category)
 
@@ -54,7 +68,7 @@ def update_category(
 def delete_category(
     category_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_admin_user)
+    current_user: UserResponse = Depends(get_admin_user)
 ):
     return crud.delete_category(db=db, category_id=category_id)
 
@@ -63,26 +77,28 @@ def delete_category(
 def create_product(
     product: schemas.ProductCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_admin_user)
+    current_user: UserResponse = Depends(get_admin_user)
 ):
     return crud.create_product(db=db, product=product)
 
 @router.get("/", response_model=List[schemas.ProductSimple])
 def read_products(
+    request: Request,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
     category_id: Optional[int] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: UserResponse = Depends(get_current_active_user)
 ):
-    products = crud.get_products(db, skip=skip, limit=limit, category_id=category_id)
-    return products
+    snapshot = crud.get_products_snapshot(db, skip=skip, limit=limit, category_id=category_id, cursor=cursor)
+    return menu_response(request, snapshot)
 
 @router.get("/{product_id}", response_model=schemas.Product)
 def read_product(
     product_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: UserResponse = Depends(get_current_active_user)
 ):
     db_product = crud.get_product(db, product_id=product_id)
     if db_product is None:
@@ -97,7 +113,7 @@ def update_product(
     product_id: int,
     product: schemas.ProductUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_admin_user)
+    current_user: UserResponse = Depends(get_admin_user)
 ):
     return crud.update_product(db=db, product_id=product_id, product=product)
 
@@ -105,6 +121,6 @@ def update_product(
 def delete_product(
     product_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_admin_user)
+    current_user: UserResponse = Depends(get_admin_user)
 ):
     return crud.delete_product(db=db, product_id=product_id)
\ No newline at end of file
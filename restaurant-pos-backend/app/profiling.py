@@ -0,0 +1,278 @@
+import cProfile
+import logging
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextvars import ContextVar
+from fnmatch import fnmatchcase
+from typing import Optional
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_FILE_HEADER = b"x-profile-file"
+MODES = {"cprofile": "pstats", "stack": "collapsed"}
+# Desde 3.12 cProfile usa sys.monitoring: un solo perfilador activo en todo el
+# proceso, que ya ve todos los hilos; antes cada hilo necesita el suyo
+PER_THREAD_PROFILERS = sys.version_info < (3, 12)
+
+class ProfileSession:
+    """Perfil de una petición: cProfile (un perfilador por hilo) o muestras de pila.
+
+    Antes de 3.12 cProfile solo sigue al hilo en que se activa, así que el
+    trabajo que la petición manda al threadpool (profile_call) usa su propio
+    perfilador y al final se combinan; desde 3.12 basta el del loop. Si otra
+    herramienta ocupa el perfilador la petición sigue sin perfil. En modo "stack" un hilo aparte toma la pila de los
+    hilos registrados cada ``interval`` segundos. En el hilo del loop también
+    aparece lo que otras peticiones concurrentes ejecuten mientras tanto.
+    """
+
+    def __init__(self, mode: str, interval: float):
+        self.mode = mode
+        self.interval = interval
+        self.thread_ids = set()
+        self.profilers = []
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def enter_thread(self):
+        thread_id = threading.get_ident()
+        if thread_id in self.thread_ids:
+            return None
+        first = not self.thread_ids
+        self.thread_ids.add(thread_id)
+        if self.mode != "cprofile" or not (first or PER_THREAD_PROFILERS):
+            return thread_id, None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # "Another profiling tool is already active": no se rompe la petición
+            logger.warning("No se pudo activar cProfile", exc_info=True)
+            return thread_id, None
+        self.profilers.append(profiler)
+        return thread_id, profiler
+
+    def exit_thread(self, handle):
+        if handle is None:
+            return
+        thread_id, profiler = handle
+        if profiler is not None:
+            profiler.disable()
+        self.thread_ids.discard(thread_id)
+
+    def start(self):
+        handle = self.enter_thread()
+        if self.mode == "stack":
+            self._sampler = threading.Thread(target=self.sample_loop, name="profile-sampler", daemon=True)
+            self._sampler.start()
+        return handle
+
+    def stop(self, handle):
+        self.exit_thread(handle)
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+
+    def sample_loop(self):
+        # La primera muestra se toma al arrancar: hasta la petición más corta deja una
+        while True:
+            frames = sys._current_frames()
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.samples[collapse_stack(frame)] += 1
+            if self._stop.wait(self.interval):
+                break
+
+    def write(self, path: str):
+        if self.mode == "cprofile":
+            if not self.profilers:
+                logger.warning("Perfil vacío, no se guarda %s", path)
+                return
+            stats = pstats.Stats(self.profilers[0])
+            for profiler in self.profilers[1:]:
+                stats.add(profiler)
+            stats.dump_stats(path)
+        else:
+            # Formato "collapsed" de flamegraph.pl / speedscope: pila;de;marcos cuenta
+            with open(path, "w", encoding="utf-8") as output:
+                for stack, count in self.samples.most_common():
+                    output.write(f"{stack} {count}\n")
+
+def frame_label(code):
+    filename = "/".join(code.co_filename.replace("\\", "/").split("/")[-2:])
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+
+def collapse_stack(frame):
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+# Perfil de la petición en curso; el threadpool copia el contexto, así que
+# profile_call lo ve desde el hilo que ejecuta el CRUD o el endpoint síncrono
+current_profile: ContextVar[Optional[ProfileSession]] = ContextVar("current_profile", default=None)
+
+def profile_call(fn, *args, **kwargs):
+    session = current_profile.get()
+    if session is None:
+        return fn(*args, **kwargs)
+    handle = session.enter_thread()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        session.exit_thread(handle)
+
+class ProfileSampler:
+    """Decide qué peticiones se perfilan: probabilidad, tope por minuto y una a la vez.
+
+    Una sola petición perfilada por proceso: dos perfiladores en el hilo del
+    loop se pisarían y el perfil de cada una mezclaría las dos.
+    """
+
+    def __init__(self, sample_rate: float, max_per_minute: int):
+        self.sample_rate = sample_rate
+        self.max_per_minute = max_per_minute
+        self._started = deque()
+        self._active = False
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.max_per_minute <= 0 or random.random() >= self.sample_rate:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            while self._started and now - self._started[0] >= 60:
+                self._started.popleft()
+            if self._active or len(self._started) >= self.max_per_minute:
+                return False
+            self._started.append(now)
+            self._active = True
+            return True
+
+    def release(self):
+        with self._lock:
+            self._active = False
+
+def compile_routes(routes: str):
+    # "POST /api/orders/,PUT /api/orders/*/status": método y ruta con comodines
+    return [pattern.strip() for pattern in routes.split(",") if pattern.strip()]
+
+def route_selected(patterns, method: str, path: str):
+    target = f"{method} {path}"
+    return any(fnmatchcase(target, pattern) for pattern in patterns)
+
+def profile_filename(method: str, path: str, mode: str):
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return f"{stamp}-{method.lower()}-{slug}-{uuid.uuid4().hex[:8]}.{MODES[mode]}"
+
+def profiling_user(scope, session_factory):
+    """Usuario del access token de la petición, o None si no es válido."""
+    # Importación diferida: app.db importa este módulo para profile_call
+    from .auth.jwt import verify_token
+
+    authorization = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    db = session_factory()
+    try:
+        return verify_token(token, db)
+    except HTTPException:
+        return None
+    finally:
+        db.close()
+
+def is_admin(user):
+    # Importación diferida por el mismo motivo que en profiling_user
+    from .users.models import UserRole
+    return user is not None and user.is_active and user.role == UserRole.ADMIN
+
+class ProfilingMiddleware:
+    """Perfila peticiones seleccionadas de un administrador (cabecera X-Profile).
+
+    Solo se instala con PROFILING_ENABLED: desactivado no agrega nada a la
+    cadena de middlewares. La petición debe coincidir con PROFILING_ROUTES,
+    traer un access token de administrador y pasar el muestreo. El archivo se
+    guarda en PROFILING_DIR y su nombre vuelve en X-Profile-File.
+    """
+
+    def __init__(self, app, session_factory, directory: str = None, routes: str = None,
+                 sample_rate: float = None, max_per_minute: int = None, default_mode: str = None,
+                 stack_interval_ms: int = None):
+        self.app = app
+        self.session_factory = session_factory
+        self.directory = directory or settings.profiling_dir
+        self.routes = compile_routes(routes if routes is not None else settings.profiling_routes)
+        self.sampler = ProfileSampler(
+            settings.profiling_sample_rate if sample_rate is None else sample_rate,
+            settings.profiling_max_per_minute if max_per_minute is None else max_per_minute,
+        )
+        self.default_mode = default_mode or settings.profiling_mode
+        if self.default_mode not in MODES:
+            raise ValueError(f"PROFILING_MODE debe ser uno de: {', '.join(MODES)}")
+        interval_ms = settings.profiling_stack_interval_ms if stack_interval_ms is None else stack_interval_ms
+        self.stack_interval = max(interval_ms, 1) / 1000
+
+    def requested_mode(self, scope):
+        if scope["type"] != "http":
+            return None
+        value = dict(scope["headers"]).get(PROFILE_HEADER)
+        if value is None or not route_selected(self.routes, scope["method"], scope["path"]):
+            return None
+        value = value.decode("latin-1").strip().lower()
+        return value if value in MODES else self.default_mode
+
+    async def __call__(self, scope, receive, send):
+        mode = self.requested_mode(scope)
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        # El rol se valida antes de muestrear para que nadie más gaste el cupo
+        user = await run_in_threadpool(profiling_user, scope, self.session_factory)
+        if not is_admin(user) or not self.sampler.acquire():
+            await self.app(scope, receive, send)
+            return
+
+        filename = profile_filename(scope["method"], scope["path"], mode)
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((PROFILE_FILE_HEADER, filename.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        session = ProfileSession(mode, self.stack_interval)
+        token = current_profile.set(session)
+        handle = session.start()
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            session.stop(handle)
+            current_profile.reset(token)
+            try:
+                await run_in_threadpool(self.save, session, filename)
+            finally:
+                self.sampler.release()
+
+    def save(self, session: ProfileSession, filename: str):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            session.write(os.path.join(self.directory, filename))
+        except OSError:
+            logger.warning("No se pudo guardar el perfil %s", filename, exc_info=True)
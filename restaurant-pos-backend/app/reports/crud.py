@@ -0,0 +1,199 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from ..orders.models import Order, OrderItem, OrderStatus, OrderType
+from ..products.models import Category, Product
+from ..tables.models import Table
+from ..users.models import User
+from .models import HourlySales, ProductSales, WaiterSales, TableSales
+
+# Órdenes por lote al reconstruir los agregados
+REBUILD_BATCH_SIZE = 1000
+
+def upsert_increment(model, dialect_name: str):
+    # INSERT que, si la fila del período ya existe, suma los contadores
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    statement = insert(model)
+    keys = [column.name for column in model.__table__.primary_key]
+    return statement.on_conflict_do_update(
+        index_elements=keys,
+        set_={
+            column.name: column + statement.excluded[column.name]
+            for column in model.__table__.columns
+            if column.name not in keys and column.name != "category_id"
+        }
+    )
+
+def increment_rows(db: Session, model, rows):
+    if not rows:
+        return
+    statement = upsert_increment(model, db.get_bind().dialect.name)
+    if statement is not None:
+        db.execute(statement, rows)
+        return
+    # Otros motores: se suma sobre la fila existente o se crea
+    keys = [column.name for column in model.__table__.primary_key]
+    for row in rows:
+        current = db.get(model, tuple(row[key] for key in keys))
+        if current is None:
+            db.add(model(**row))
+            continue
+        for name, value in row.items():
+            if name not in keys and name != "category_id":
+                setattr(current, name, getattr(current, name) + value)
+    db.flush()
+
+def record_sales(db: Session, orders):
+    """Suma a los agregados de ventas las órdenes recién pagadas.
+
+    ``orders`` son órdenes u objetos con id, order_type, table_id, created_by,
+    los montos en centavos y paid_at. No hace commit: se llama antes del
+    commit que marca las órdenes como pagadas para que ambos cambios se
+    confirmen (o se descarten) juntos.
+    """
+    orders = list(orders)
+    if not orders:
+        return
+
+    hourly = defaultdict(lambda: defaultdict(int))
+    waiters = defaultdict(lambda: defaultdict(int))
+    tables = defaultdict(lambda: defaultdict(int))
+    order_days = {}
+    for order in orders:
+        hour = order.paid_at.replace(minute=0, second=0, microsecond=0)
+        day = order.paid_at.date()
+        order_days[order.id] = (hour, day)
+
+        bucket = hourly[hour]
+        bucket["order_count"] += 1
+        bucket["subtotal_cents"] += order.subtotal_cents
+        bucket["tax_cents"] += order.tax_cents
+        bucket["total_cents"] += order.total_cents
+        if order.created_by is not None:
+            waiters[(day, order.created_by)]["order_count"] += 1
+            waiters[(day, order.created_by)]["total_cents"] += order.total_cents
+        if order.order_type == OrderType.TABLE and order.table_id is not None:
+            tables[(day, order.table_id)]["order_count"] += 1
+            tables[(day, order.table_id)]["total_cents"] += order.total_cents
+
+    # Una sola consulta agrupada por orden y producto para todos los items
+    products = {}
+    item_rows = db.query(
+        OrderItem.order_id,
+        OrderItem.product_id,
+        Product.category_id,
+        func.sum(OrderItem.quantity),
+        func.sum(OrderItem.price_cents * OrderItem.quantity)
+    ).outerjoin(Product, Product.id == OrderItem.product_id).filter(
+        OrderItem.order_id.in_(order_days)
+    ).group_by(OrderItem.order_id, OrderItem.product_id, Product.category_id)
+    for order_id, product_id, category_id, quantity, revenue_cents in item_rows:
+        hour, day = order_days[order_id]
+        hourly[hour]["item_count"] += quantity
+        row = products.setdefault((day, product_id), {
+            "day": day, "product_id": product_id, "category_id": category_id,
+            "quantity": 0, "revenue_cents": 0,
+        })
+        row["quantity"] += quantity
+        row["revenue_cents"] += revenue_cents
+
+    increment_rows(db, HourlySales, [
+        {"hour": hour, "order_count": 0, "item_count": 0, "subtotal_cents": 0, "tax_cents": 0,
+         "total_cents": 0, **values}
+        for hour, values in hourly.items()
+    ])
+    increment_rows(db, ProductSales, list(products.values()))
+    increment_rows(db, WaiterSales, [
+        {"day": day, "user_id": user_id, **values} for (day, user_id), values in waiters.items()
+    ])
+    increment_rows(db, TableSales, [
+        {"day": day, "table_id": table_id, **values} for (day, table_id), values in tables.items()
+    ])
+
+def rebuild_sales(db: Session):
+    """Recalcula los agregados desde las órdenes pagadas (p. ej. tras migrar)."""
+    for model in (HourlySales, ProductSales, WaiterSales, TableSales):
+        db.query(model).delete(synchronize_session=False)
+    paid_orders = db.query(
+        Order.id, Order.order_type, Order.table_id, Order.created_by,
+        Order.subtotal_cents, Order.tax_cents, Order.total_cents, Order.paid_at
+    ).filter(Order.status == OrderStatus.PAID, Order.paid_at.isnot(None)).order_by(Order.id)
+
+    count = 0
+    last_id = 0
+    while True:
+        batch = paid_orders.filter(Order.id > last_id).limit(REBUILD_BATCH_SIZE).all()
+        if not batch:
+            break
+        record_sales(db, batch)
+        count += len(batch)
+        last_id = batch[-1].id
+    db.commit()
+    return count
+
+def day_range(column, start_date: date = None, end_date: date = None):
+    # Rango de días inclusivo
+    conditions = []
+    if start_date is not None:
+        conditions.append(column >= start_date)
+    if end_date is not None:
+        conditions.append(column <= end_date)
+    return conditions
+
+def get_hourly_sales(db: Session, start_date: date = None, end_date: date = None):
+    conditions = []
+    if start_date is not None:
+        conditions.append(HourlySales.hour >= datetime.combine(start_date, datetime.min.time()))
+    if end_date is not None:
+        conditions.append(HourlySales.hour < datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+    return db.query(HourlySales).filter(*conditions).order_by(HourlySales.hour).all()
+
+def get_product_sales(db: Session, start_date: date = None, end_date: date = None):
+    revenue = func.sum(ProductSales.revenue_cents)
+    return db.query(
+        ProductSales.product_id,
+        Product.name.label("product_name"),
+        func.sum(ProductSales.quantity).label("quantity"),
+        (revenue / 100.0).label("revenue")
+    ).outerjoin(Product, Product.id == ProductSales.product_id).filter(
+        *day_range(ProductSales.day, start_date, end_date)
+    ).group_by(ProductSales.product_id, Product.name).order_by(revenue.desc(), ProductSales.product_id).all()
+
+def get_category_sales(db: Session, start_date: date = None, end_date: date = None):
+    revenue = func.sum(ProductSales.revenue_cents)
+    return db.query(
+        ProductSales.category_id,
+        Category.name.label("category_name"),
+        func.sum(ProductSales.quantity).label("quantity"),
+        (revenue / 100.0).label("revenue")
+    ).outerjoin(Category, Category.id == ProductSales.category_id).filter(
+        *day_range(ProductSales.day, start_date, end_date)
+    ).group_by(ProductSales.category_id, Category.name).order_by(revenue.desc(), ProductSales.category_id).all()
+
+def get_waiter_sales(db: Session, start_date: date = None, end_date: date = None):
+    total = func.sum(WaiterSales.total_cents)
+    return db.query(
+        WaiterSales.user_id,
+        User.full_name,
+        func.sum(WaiterSales.order_count).label("order_count"),
+        (total / 100.0).label("total")
+    ).outerjoin(User, User.id == WaiterSales.user_id).filter(
+        *day_range(WaiterSales.day, start_date, end_date)
+    ).group_by(WaiterSales.user_id, User.full_name).order_by(total.desc(), WaiterSales.user_id).all()
+
+def get_table_sales(db: Session, start_date: date = None, end_date: date = None):
+    total = func.sum(TableSales.total_cents)
+    return db.query(
+        TableSales.table_id,
+        Table.name.label("table_name"),
+        func.sum(TableSales.order_count).label("order_count"),
+        (total / 100.0).label("total")
+    ).outerjoin(Table, Table.id == TableSales.table_id).filter(
+        *day_range(TableSales.day, start_date, end_date)
+    ).group_by(TableSales.table_id, Table.name).order_by(total.desc(), TableSales.table_id).all()
@@ -0,0 +1,58 @@
+from sqlalchemy import Column, Integer, Date, DateTime
+from sqlalchemy.ext.hybrid import hybrid_property
+from ..db import Base
+
+# Tablas de agregados de ventas. Se actualizan de forma incremental cuando una
+# orden pasa a PAID (ver reports.crud.record_sales), en la misma transacción
+# que el cambio de estado. Los montos están en centavos, como en las órdenes.
+
+class HourlySales(Base):
+    __tablename__ = "sales_hourly"
+
+    # Inicio de la hora (hora local del servidor) en que se pagó la orden
+    hour = Column(DateTime, primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    item_count = Column(Integer, nullable=False, default=0)
+    subtotal_cents = Column(Integer, nullable=False, default=0)
+    tax_cents = Column(Integer, nullable=False, default=0)
+    total_cents = Column(Integer, nullable=False, default=0)
+
+    @hybrid_property
+    def subtotal(self):
+        return self.subtotal_cents / 100
+
+    @hybrid_property
+    def tax(self):
+        return self.tax_cents / 100
+
+    @hybrid_property
+    def total(self):
+        return self.total_cents / 100
+
+class ProductSales(Base):
+    __tablename__ = "sales_by_product"
+
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+    # Categoría del producto al momento del pago; el reporte por categoría
+    # se obtiene agrupando esta tabla
+    category_id = Column(Integer, nullable=True, index=True)
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue_cents = Column(Integer, nullable=False, default=0)
+
+class WaiterSales(Base):
+    __tablename__ = "sales_by_waiter"
+
+    day = Column(Date, primary_key=True)
+    # Usuario que creó la orden (orders.created_by)
+    user_id = Column(Integer, primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    total_cents = Column(Integer, nullable=False, default=0)
+
+class TableSales(Base):
+    __tablename__ = "sales_by_table"
+
+    day = Column(Date, primary_key=True)
+    table_id = Column(Integer, primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    total_cents = Column(Integer, nullable=False, default=0)
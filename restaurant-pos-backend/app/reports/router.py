@@ -0,0 +1,67 @@
+from datetime import date
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from ..db import get_db
+from ..auth.dependencies import get_admin_user, get_cashier_user
+from ..users.schemas import UserResponse
+from ..request_stats import TimedRoute
+from . import crud, schemas
+
+router = APIRouter(route_class=TimedRoute)
+
+# Todos los reportes aceptan ?start_date=&end_date= (días inclusivos, hora
+# local del servidor) y leen solo las tablas de agregados
+
+@router.get("/sales/hourly", response_model=List[schemas.HourlySales])
+def read_hourly_sales(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_cashier_user)
+):
+    return crud.get_hourly_sales(db, start_date=start_date, end_date=end_date)
+
+@router.get("/sales/products", response_model=List[schemas.ProductSales])
+def read_product_sales(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_cashier_user)
+):
+    return crud.get_product_sales(db, start_date=start_date, end_date=end_date)
+
+@router.get("/sales/categories", response_model=List[schemas.CategorySales])
+def read_category_sales(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_cashier_user)
+):
+    return crud.get_category_sales(db, start_date=start_date, end_date=end_date)
+
+@router.get("/sales/waiters", response_model=List[schemas.WaiterSales])
+def read_waiter_sales(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_cashier_user)
+):
+    return crud.get_waiter_sales(db, start_date=start_date, end_date=end_date)
+
+@router.get("/sales/tables", response_model=List[schemas.TableSales])
+def read_table_sales(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_cashier_user)
+):
+    return crud.get_table_sales(db, start_date=start_date, end_date=end_date)
+
+@router.post("/rebuild", response_model=schemas.RebuildResult)
+def rebuild_reports(
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_admin_user)
+):
+    # Recalcula los agregados desde cero (después de migrar o importar órdenes)
+    return {"orders": crud.rebuild_sales(db)}
@@ -0,0 +1,54 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+
+class HourlySales(BaseModel):
+    hour: datetime
+    order_count: int
+    item_count: int
+    subtotal: float
+    tax: float
+    total: float
+
+    class Config:
+        orm_mode = True
+
+class ProductSales(BaseModel):
+    product_id: int
+    product_name: Optional[str] = None
+    quantity: int
+    revenue: float
+
+    class Config:
+        orm_mode = True
+
+class CategorySales(BaseModel):
+    category_id: Optional[int] = None
+    category_name: Optional[str] = None
+    quantity: int
+    revenue: float
+
+    class Config:
+        orm_mode = True
+
+class WaiterSales(BaseModel):
+    user_id: int
+    full_name: Optional[str] = None
+    order_count: int
+    total: float
+
+    class Config:
+        orm_mode = True
+
+class TableSales(BaseModel):
+    table_id: int
+    table_name: Optional[str] = None
+    order_count: int
+    total: float
+
+    class Config:
+        orm_mode = True
+
+class RebuildResult(BaseModel):
+    # Órdenes pagadas procesadas
+    orders: int
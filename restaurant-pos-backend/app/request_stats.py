@@ -0,0 +1,147 @@
+import functools
+import inspect
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from .config import settings
+from .profiling import profile_call
+
+logger = logging.getLogger(__name__)
+
+class RequestStats:
+    """Consultas SQL y tiempos de una petición HTTP."""
+
+    def __init__(self, max_statements: int):
+        self.started_at = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        # Fin del endpoint: lo que sigue hasta enviar la respuesta es serialización
+        self.endpoint_finished_at = None
+        self.max_statements = max_statements
+        self.statements = []
+
+    def add_query(self, statement: str, duration: float):
+        self.query_count += 1
+        self.db_time += duration
+        if len(self.statements) < self.max_statements:
+            self.statements.append((statement, duration))
+
+    def server_timing(self, now: float):
+        total = now - self.started_at
+        serialize = now - self.endpoint_finished_at if self.endpoint_finished_at is not None else 0.0
+        app = max(total - self.db_time - serialize, 0.0)
+        return ", ".join([
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.query_count} queries"',
+            f"serialize;dur={serialize * 1000:.2f}",
+            f"app;dur={app * 1000:.2f}",
+            f"total;dur={total * 1000:.2f}",
+        ])
+
+# Estadísticas de la petición en curso. El objeto es mutable, así que las
+# consultas hechas desde el threadpool (que copia el contexto) también cuentan
+current_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_stats", default=None)
+
+# El inicio se guarda en el contexto de cada ejecución y no en la conexión: si
+# la consulta falla after_cursor_execute no se llama, y nada queda acumulado
+# en la conexión del pool
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and current_stats.get() is not None:
+        context._query_started_at = time.perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats.get()
+    if stats is None:
+        return
+    started = getattr(context, "_query_started_at", None)
+    if started is not None:
+        stats.add_query(statement, time.perf_counter() - started)
+
+def install_query_hooks(target=Engine):
+    # Sobre la clase Engine: cubre el motor de app.db, el síncrono interno del
+    # motor async y los motores creados en las pruebas
+    if not event.contains(target, "before_cursor_execute", before_cursor_execute):
+        event.listen(target, "before_cursor_execute", before_cursor_execute)
+        event.listen(target, "after_cursor_execute", after_cursor_execute)
+
+def mark_endpoint_finished():
+    stats = current_stats.get()
+    if stats is not None:
+        stats.endpoint_finished_at = time.perf_counter()
+
+def timed_endpoint(endpoint):
+    # Conserva la firma (functools.wraps) para que FastAPI resuelva los parámetros
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                mark_endpoint_finished()
+    else:
+        # Los endpoints síncronos corren en el threadpool: con PROFILING_ENABLED
+        # se perfilan en su hilo; si no, se llaman directamente
+        call = functools.partial(profile_call, endpoint) if settings.profiling_enabled else endpoint
+
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            try:
+                return call(*args, **kwargs)
+            finally:
+                mark_endpoint_finished()
+    return wrapper
+
+class TimedRoute(APIRoute):
+    """Ruta que marca el fin del endpoint para separar la serialización."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, timed_endpoint(endpoint), **kwargs)
+
+class RequestStatsMiddleware:
+    """Agrega Server-Timing (BD, serialización, resto y total) a cada respuesta.
+
+    Es un middleware ASGI puro para no interferir con las respuestas en
+    streaming. Los tiempos se toman al enviar las cabeceras; si superan
+    SLOW_REQUEST_MS se registra la petición con sus consultas.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.request_stats_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(settings.slow_request_max_statements)
+        token = current_stats.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                now = time.perf_counter()
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing(now).encode()))
+                message = {**message, "headers": headers}
+                log_if_slow(scope, message["status"], stats, now)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_stats.reset(token)
+
+def log_if_slow(scope, status_code: int, stats: RequestStats, now: float):
+    elapsed_ms = (now - stats.started_at) * 1000
+    if settings.slow_request_ms <= 0 or elapsed_ms < settings.slow_request_ms:
+        return
+    statements = "\n".join(
+        f"  {duration * 1000:8.2f} ms  {' '.join(statement.split())}" for statement, duration in stats.statements
+    )
+    logger.warning(
+        "Petición lenta %s %s -> %d: %.1f ms, %d consultas (%.1f ms en BD)\n%s",
+        scope["method"], scope["path"], status_code, elapsed_ms,
+        stats.query_count, stats.db_time * 1000, statements
+    )
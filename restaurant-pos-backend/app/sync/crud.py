@@ -0,0 +1,112 @@
+from datetime import timedelta
+from sqlalchemy import exists, func, or_
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..pagination import cursor_param, decode_cursor, encode_cursor
+from ..tables.models import Table
+from ..products.models import Category, Product
+from ..orders import models as order_models
+from ..orders.crud import order_query
+from ..orders.events import STATION_STATUSES, Station
+from .models import DeletedRecord
+
+# Órdenes que las tablets mantienen en pantalla
+OPEN_ORDER_STATUSES = STATION_STATUSES[Station.ALL]
+CLOSED_ORDER_STATUSES = [order_models.OrderStatus.PAID, order_models.OrderStatus.CANCELLED]
+
+def encode_sync_token(value):
+    return encode_cursor([value])
+
+def decode_sync_token(token: str):
+    return decode_cursor(token, [DeletedRecord.deleted_at], detail="Token de sincronización inválido")[0]
+
+def changed_since(model, since):
+    # updated_at solo se llena al modificar; una fila recién creada usa created_at
+    return func.coalesce(model.updated_at, model.created_at) >= since
+
+def get_deleted_ids(db: Session, entity: str, since):
+    return [
+        entity_id for (entity_id,) in db.query(DeletedRecord.entity_id).filter(
+            DeletedRecord.entity == entity,
+            DeletedRecord.deleted_at >= since
+        )
+    ]
+
+def get_changes(db: Session, since: str = None):
+    """Cambios en mesas, menú y órdenes abiertas desde el token ``since``.
+
+    El token es la hora de la base de datos menos un margen (SYNC_LAG_SECONDS)
+    para cubrir transacciones que confirmaron tarde; por eso una fila puede
+    llegar dos veces y el cliente debe aplicar los cambios como upsert. Sin
+    token, o si es más antiguo que la retención de tombstones, se devuelve el
+    estado completo.
+    """
+    now = db.query(func.now()).scalar()
+    token = encode_sync_token(now - timedelta(seconds=settings.sync_lag_seconds))
+    dialect_name = db.get_bind().dialect.name
+
+    since_value = decode_sync_token(since) if since else None
+    if since_value is not None:
+        # Los tombstones más antiguos ya se purgaron: no se puede calcular el delta
+        horizon = now - timedelta(days=settings.sync_tombstone_retention_days)
+        if since_value.replace(tzinfo=None) < horizon.replace(tzinfo=None):
+            since_value = None
+
+    tables = db.query(Table)
+    categories = db.query(Category)
+    products = db.query(Product)
+    orders = order_query(db, "sync").filter(order_models.Order.status.in_(OPEN_ORDER_STATUSES))
+
+    if since_value is None:
+        return {
+            "token": token,
+            "full": True,
+            "tables": {"updated": tables.order_by(Table.id).all()},
+            "categories": {"updated": categories.order_by(Category.id).all()},
+            "products": {"updated": products.order_by(Product.id).all()},
+            "orders": {"updated": orders.order_by(order_models.Order.created_at.asc()).all()},
+        }
+
+    since_param = cursor_param(since_value, dialect_name)
+    # Agregar o quitar items modifica los totales de la orden, pero editar solo
+    # las notas de un item no; se revisan también los items
+    item_changed = exists().where(
+        order_models.OrderItem.order_id == order_models.Order.id,
+        changed_since(order_models.OrderItem, since_param)
+    )
+    closed_orders = db.query(order_models.Order.id).filter(
+        order_models.Order.status.in_(CLOSED_ORDER_STATUSES),
+        order_models.Order.updated_at >= since_param
+    )
+
+    return {
+        "token": token,
+        "full": False,
+        "tables": {
+            "updated": tables.filter(changed_since(Table, since_param)).order_by(Table.id).all(),
+            "deleted": get_deleted_ids(db, "tables", since_param),
+        },
+        "categories": {
+            "updated": categories.filter(changed_since(Category, since_param)).order_by(Category.id).all(),
+            "deleted": get_deleted_ids(db, "categories", since_param),
+        },
+        "products": {
+            "updated": products.filter(changed_since(Product, since_param)).order_by(Product.id).all(),
+            "deleted": get_deleted_ids(db, "products", since_param),
+        },
+        "orders": {
+            "updated": orders.filter(
+                or_(changed_since(order_models.Order, since_param), item_changed)
+            ).order_by(order_models.Order.created_at.asc()).all(),
+            "deleted": [order_id for (order_id,) in closed_orders],
+        },
+    }
+
+def delete_expired_tombstones(db: Session):
+    now = db.query(func.now()).scalar()
+    cutoff = now - timedelta(days=settings.sync_tombstone_retention_days)
+    deleted = db.query(DeletedRecord).filter(
+        DeletedRecord.deleted_at < cursor_param(cutoff, db.get_bind().dialect.name)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
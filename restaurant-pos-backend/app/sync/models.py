@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from sqlalchemy.sql import func
+from ..db import Base
+
+class DeletedRecord(Base):
+    """Marca (tombstone) de una fila eliminada para la sincronización incremental."""
+    __tablename__ = "deleted_records"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Nombre de la tabla de origen: "tables", "categories" o "products"
+    entity = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_deleted_records_entity_deleted_at", "entity", "deleted_at"),
+    )
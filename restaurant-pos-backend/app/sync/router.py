@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from typing import Optional
+from ..db import get_db
+from ..auth.dependencies import get_current_active_user
+from ..users.schemas import UserResponse
+from ..request_stats import TimedRoute
+from . import crud, schemas
+
+router = APIRouter(route_class=TimedRoute)
+
+@router.get("", response_model=schemas.SyncResponse)
+def sync_changes(
+    since: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_current_active_user)
+):
+    # Las tablets guardan el token devuelto y lo envían como ?since= al reconectar
+    return crud.get_changes(db, since=since)
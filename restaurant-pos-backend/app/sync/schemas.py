@@ -0,0 +1,32 @@
+from typing import List
+from pydantic import BaseModel
+from ..products.schemas import Category, ProductSimple
+from ..tables.schemas import Table
+from ..orders.schemas import OrderResponse
+
+class TableChanges(BaseModel):
+    updated: List[Table] = []
+    deleted: List[int] = []
+
+class CategoryChanges(BaseModel):
+    updated: List[Category] = []
+    deleted: List[int] = []
+
+class ProductChanges(BaseModel):
+    updated: List[ProductSimple] = []
+    deleted: List[int] = []
+
+class OrderChanges(BaseModel):
+    updated: List[OrderResponse] = []
+    # Órdenes que dejaron de estar abiertas (pagadas o canceladas)
+    deleted: List[int] = []
+
+class SyncResponse(BaseModel):
+    # Token a enviar como ?since= en la siguiente sincronización
+    token: str
+    # True si la respuesta contiene el estado completo y no solo los cambios
+    full: bool
+    tables: TableChanges
+    categories: CategoryChanges
+    products: ProductChanges
+    orders: OrderChanges
@@ -1,6 +1,8 @@
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from . import models, schemas
+from ..pagination import keyset_paginate
+from ..sync.models import DeletedRecord
 
 def get_table(db: Session, table_id: int):
     return db.query(models.Table).filter(models.Table.id == table_id).first()
@@ -8,11 +10,11 @@ def get_table(db: Session, table_id: int):
 def get_table_by_name(db: Session, name: str):
     return db.query(models.Table).filter(models.Table.name == name).first()
 
-def get_tables(db: Session, skip: int = 0, limit: int = 100, is_occupied: bool = None):
+def get_tables(db: Session, skip: int = 0, limit: int = 100, is_occupied: bool = None, cursor: str = None):
     query = db.query(models.Table)
     if is_occupied is not None:
         query = query.filter(models.Table.is_occupied == is_occupied)
-    return query.offset(skip).limit(limit).all()
+    return keyset_paginate(query, [models.Table.id], limit=limit, cursor=cursor, offset=skip)
 
 def create_table(db: Session, table: schemas.TableCreate):
     db_table = get_table_by_name(db, name=table.name)
@@ -54,6 +56,8 @@ def delete_table(db: Session, table_id: int):
         )
     
     db.delete(db_table)
+    # Tombstone para la sincronización incremental, en la misma transacción
+    db.add(DeletedRecord(entity="tables", entity_id=table_id))
     db.commit()
     return {"ok": True}
 
@@ -1,37 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from ..db import get_db
 from ..auth.dependencies import get_admin_user, get_current_active_user, get_waiter_user
-from ..users.models import User
+from ..users.schemas import UserResponse
+from ..pagination import MAX_PAGE_SIZE, set_next_cursor
+from ..request_stats import TimedRoute
 from . import crud, schemas, models
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 @router.post("/", response_model=schemas.Table, status_code=status.HTTP_201_CREATED)
 def create_table(
     table: schemas.TableCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_admin_user)
+    current_user: UserResponse = Depends(get_admin_user)
 ):
     return crud.create_table(db=db, table=table)
 
 @router.get("/", response_model=List[schemas.Table])
 def read_tables(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
     is_occupied: Optional[bool] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: UserResponse = Depends(get_current_active_user)
 ):
-    tables = crud.get_tables(db, skip=skip, limit=limit, is_occupied=is_occupied)
+    tables = crud.get_tables(db, skip=skip, limit=limit, is_occupied=is_occupied, cursor=cursor)
+    set_next_cursor(response, tables)
     return tables
 
 @router.get("/{table_id}", response_model=schemas.Table)
 def read_table(
     table_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: UserResponse = Depends(get_current_active_user)
 ):
     db_table = crud.get_table(db, table_id=table_id)
     if db_table is None:
@@ -46,7 +51,7 @@ def update_table(
     table_id: int,
     table: schemas.TableUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_admin_user)
+    current_user: UserResponse = Depends(get_admin_user)
 ):
     return crud.update_table(db=db, table_id=table_id, table=table)
 
@@ -54,7 +59,7 @@ def update_table(
 def delete_table(
     table_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_admin_user)
+    current_user: UserResponse = Depends(get_admin_user)
 ):
     return crud.delete_table(db=db, table_id=table_id)
 
@@ -63,6 +68,6 @@ def set_table_occupy_status(
     table_id: int,
     is_occupied: bool,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_waiter_user)
+    current_user: UserResponse = Depends(get_waiter_user)
 ):
     return crud.occupy_table(db=db, table_id=table_id, is_occupied=is_occupied)
\ No newline at end of file
@@ -1,7 +1,11 @@
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from . import models, schemas
-from ..auth.utils import get_password_hash, verify_password
+from ..pagination import keyset_paginate
+from ..auth.utils import verify_password, verify_and_update_password
+from ..auth.cache import invalidate_user
+from ..auth.crud import revoke_user_sessions, delete_user_sessions
 
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
@@ -12,10 +16,11 @@ def get_user_by_username(db: Session, username: str):
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+def get_users(db: Session, skip: int = 0, limit: int = 100, cursor: str = None):
+    return keyset_paginate(db.query(models.User), [models.User.id], limit=limit, cursor=cursor, offset=skip)
 
-def create_user(db: Session, user: schemas.UserCreate):
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str):
+    # El hash se calcula antes, en el pool de bcrypt (get_password_hash_async)
     db_user = get_user_by_username(db, username=user.username)
     if db_user:
         raise HTTPException(
@@ -30,7 +35,6 @@ def create_user(db: Session, user: schemas.UserCreate):
             detail="El correo electrónico ya está registrado"
         )
     
-    hashed_password = get_password_hash(user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
@@ -43,7 +47,7 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.refresh(db_user)
     return db_user
 
-def update_user(db: Session, user_id: int, user: schemas.UserUpdate):
+def update_user(db: Session, user_id: int, user: schemas.UserUpdate, hashed_password: str = None):
     db_user = get_user(db, user_id=user_id)
     if not db_user:
         raise HTTPException(
@@ -53,13 +57,20 @@ def update_user(db: Session, user_id: int, user: schemas.UserUpdate):
     
     user_data = user.dict(exclude_unset=True)
     
-    if "password" in user_data and user_data["password"]:
-        user_data["password"] = get_password_hash(user_data["password"])
+    # La contraseña nueva llega ya hasheada; una vacía no cambia la actual
+    user_data.pop("password", None)
+    if hashed_password:
+        user_data["password"] = hashed_password
     
     for key, value in user_data.items():
         setattr(db_user, key, value)
     
+    # Un usuario desactivado pierde también sus sesiones de dispositivo
+    if user_data.get("is_active") is False:
+        revoke_user_sessions(db, user_id)
+    
     db.commit()
+    invalidate_user(db, user_id)
     db.refresh(db_user)
     return db_user
 
@@ -71,14 +82,36 @@ def delete_user(db: Session, user_id: int):
             detail="Usuario no encontrado"
         )
     
+    delete_user_sessions(db, user_id)
     db.delete(db_user)
     db.commit()
+    invalidate_user(db, user_id)
     return {"ok": True}
 
 def authenticate_user(db: Session, username: str, password: str):
+    # Versión síncrona para scripts; el login usa authenticate_user_async
     user = get_user_by_username(db, username)
     if not user:
         return False
     if not verify_password(password, user.password):
         return False
+    return user
+
+def update_password_hash(db: Session, db_user: models.User, hashed_password: str):
+    db_user.password = hashed_password
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+async def authenticate_user_async(db: Session, username: str, password: str):
+    # Las consultas van al threadpool y bcrypt al pool dedicado de auth.utils
+    user = await run_in_threadpool(get_user_by_username, db, username)
+    if not user:
+        return False
+    valid, new_hash = await verify_and_update_password(password, user.password)
+    if not valid:
+        return False
+    # Regenerar el hash si cambió el costo configurado
+    if new_hash:
+        user = await run_in_threadpool(update_password_hash, db, user, new_hash)
     return user
\ No newline at end of file
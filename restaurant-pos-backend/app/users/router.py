@@ -1,62 +1,111 @@
-from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from ..db import get_db
-from ..auth.jwt import create_access_token
+from ..auth import crud as auth_crud
 from ..auth.dependencies import get_admin_user, get_current_active_user
-from ..config import settings
-from . import crud, schemas, models
+from ..auth.utils import get_password_hash_async
+from ..pagination import MAX_PAGE_SIZE, set_next_cursor
+from ..request_stats import TimedRoute
+from . import crud, schemas
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 @router.post("/", response_model=schemas.UserResponse)
-def create_user(
+async def create_user(
     user: schemas.UserCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_admin_user)
+    current_user: schemas.UserResponse = Depends(get_admin_user)
 ):
-    return crud.create_user(db=db, user=user)
+    # bcrypt en su pool sin ocupar un hilo del threadpool mientras espera turno
+    hashed_password = await get_password_hash_async(user.password)
+    return await run_in_threadpool(crud.create_user, db, user, hashed_password)
 
 @router.post("/login", response_model=schemas.Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
-    user = crud.authenticate_user(db, form_data.username, form_data.password)
+    user = await crud.authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuario o contraseña incorrectos",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-    access_token = create_access_token(
-        data={"sub": str(user.id)}, 
-        expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    # Cada terminal (client_id del formulario OAuth2) obtiene su propia sesión
+    # con un refresh token para renovar sin volver a pasar por bcrypt
+    return await run_in_threadpool(auth_crud.create_session, db, user.id, form_data.client_id)
+
+@router.post("/token/refresh", response_model=schemas.Token)
+def refresh_access_token(
+    request: schemas.RefreshRequest,
+    db: Session = Depends(get_db)
+):
+    return auth_crud.refresh_session(db, request.refresh_token)
+
+@router.post("/logout")
+def logout(
+    request: schemas.RefreshRequest,
+    db: Session = Depends(get_db)
+):
+    payload = auth_crud.decode_refresh_token(request.refresh_token)
+    db_session = auth_crud.get_session(db, payload["sid"])
+    if db_session is None or db_session.token_id != payload["jti"]:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token inválido o expirado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if db_session.revoked_at is not None:
+        return {"ok": True}
+    return auth_crud.revoke_session(db, db_session)
 
 @router.get("/me", response_model=schemas.UserResponse)
-def read_users_me(current_user: models.User = Depends(get_current_active_user)):
+def read_users_me(current_user: schemas.UserResponse = Depends(get_current_active_user)):
     return current_user
 
+@router.get("/me/sessions", response_model=List[schemas.DeviceSessionResponse])
+def read_my_sessions(
+    db: Session = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(get_current_active_user)
+):
+    return auth_crud.get_user_sessions(db, user_id=current_user.id)
+
+@router.delete("/me/sessions/{session_id}")
+def revoke_my_session(
+    session_id: int,
+    db: Session = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(get_current_active_user)
+):
+    db_session = auth_crud.get_session(db, session_id=session_id)
+    if db_session is None or db_session.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sesión no encontrada"
+        )
+    return auth_crud.revoke_session(db, db_session)
+
 @router.get("/", response_model=List[schemas.UserResponse])
 def read_users(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_admin_user)
+    current_user: schemas.UserResponse = Depends(get_admin_user)
 ):
-    users = crud.get_users(db, skip=skip, limit=limit)
+    users = crud.get_users(db, skip=skip, limit=limit, cursor=cursor)
+    set_next_cursor(response, users)
     return users
 
 @router.get("/{user_id}", response_model=schemas.UserResponse)
 def read_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_admin_user)
+    current_user: schemas.UserResponse = Depends(get_admin_user)
 ):
     db_user = crud.get_user(db, user_id=user_id)
     if db_user is None:
@@ -67,18 +116,19 @@ def read_user(
     return db_user
 
 @router.put("/{user_id}", response_model=schemas.UserResponse)
-def update_user(
+async def update_user(
     user_id: int,
     user: schemas.UserUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_admin_user)
+    current_user: schemas.UserResponse = Depends(get_admin_user)
 ):
-    return crud.update_user(db=db, user_id=user_id, user=user)
+    hashed_password = await get_password_hash_async(user.password) if user.password else None
+    return await run_in_threadpool(crud.update_user, db, user_id, user, hashed_password)
 
 @router.delete("/{user_id}")
 def delete_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_admin_user)
+    current_user: schemas.UserResponse = Depends(get_admin_user)
 ):
     return crud.delete_user(db=db, user_id=user_id)
\ No newline at end of file
@@ -35,6 +35,20 @@ class UserPayload(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class DeviceSessionResponse(BaseModel):
+    id: int
+    device_id: Optional[str] = None
+    created_at: datetime
+    last_used_at: Optional[datetime] = None
+    expires_at: datetime
+
+    class Config:
+        orm_mode = True
 
 class TokenData(BaseModel):
     username: Optional[str] = None
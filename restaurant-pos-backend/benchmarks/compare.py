@@ -0,0 +1,46 @@
+"""Compara dos archivos de resultados de benchmarks.run.
+
+    python -m benchmarks.compare base.json nuevo.json --threshold 0.2
+
+Sale con código 1 si algún benchmark empeoró su p99 (o --metric) más que el
+umbral relativo indicado.
+"""
+import argparse
+import json
+import sys
+
+def load_results(path: str):
+    with open(path) as source:
+        report = json.load(source)
+    return report, {result["name"]: result for result in report["results"]}
+
+def compare(base, current, metric: str = "p99_ms", threshold: float = 0.2):
+    rows = []
+    for name, result in current.items():
+        before = base.get(name, {}).get(metric)
+        after = result.get(metric)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before else 0.0
+        rows.append((name, before, after, change, change > threshold))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara resultados de benchmarks")
+    parser.add_argument("base")
+    parser.add_argument("current")
+    parser.add_argument("--metric", default="p99_ms")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Empeoramiento relativo permitido (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    base_report, base = load_results(args.base)
+    current_report, current = load_results(args.current)
+    print(f"{args.metric}: {base_report.get('commit')} -> {current_report.get('commit')}")
+    rows = compare(base, current, args.metric, args.threshold)
+    for name, before, after, change, regressed in rows:
+        marker = "  REGRESIÓN" if regressed else ""
+        print(f"{name:<40} {before:>10} {after:>10} {change:>+8.1%}{marker}")
+    return 1 if any(row[-1] for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
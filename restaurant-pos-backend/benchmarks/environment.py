@@ -0,0 +1,60 @@
+import random
+from app.auth.cache import user_cache, revoked_sessions
+from app.auth.utils import get_password_hash
+from app.idempotency.cache import idempotency_cache
+from app.orders.numbering import order_numbers
+from app.products.cache import menu_cache
+from app.products.models import Category, Product
+from app.tables.models import Table
+from app.users.models import User, UserRole
+
+BENCH_PASSWORD = "bench123"
+
+def reset_caches():
+    # Las cachés de proceso no deben arrastrar datos de otra base
+    user_cache.clear()
+    revoked_sessions.replace([])
+    menu_cache.bump()
+    idempotency_cache.clear()
+    order_numbers.reset()
+
+def seed_service(db, waiters: int = 4, categories: int = 5, products: int = 40, tables: int = 20, seed: int = 1):
+    """Personal, menú y mesas de un servicio; devuelve IDs y usuarios creados."""
+    rng = random.Random(seed)
+    password = get_password_hash(BENCH_PASSWORD)
+
+    staff = {UserRole.WAITER: [], UserRole.KITCHEN: [], UserRole.CASHIER: [], UserRole.ADMIN: []}
+    counts = {UserRole.WAITER: waiters, UserRole.KITCHEN: 1, UserRole.CASHIER: 1, UserRole.ADMIN: 1}
+    for role, count in counts.items():
+        for i in range(count):
+            username = f"bench_{role.value}_{i}"
+            staff[role].append(User(
+                username=username,
+                email=f"{username}@example.com",
+                password=password,
+                full_name=username,
+                role=role,
+            ))
+    db.add_all([user for users in staff.values() for user in users])
+
+    category_rows = [Category(name=f"Categoría {i}") for i in range(categories)]
+    db.add_all(category_rows)
+    db.flush()
+    product_rows = [
+        Product(
+            name=f"Producto {i}",
+            price=round(rng.uniform(2, 30), 2),
+            category_id=category_rows[i % categories].id,
+        )
+        for i in range(products)
+    ]
+    table_rows = [Table(name=f"Mesa {i + 1}", capacity=rng.choice([2, 4, 6])) for i in range(tables)]
+    db.add_all(product_rows + table_rows)
+    db.commit()
+
+    return {
+        "users": {role: [user.username for user in users] for role, users in staff.items()},
+        "user_ids": {role: [user.id for user in users] for role, users in staff.items()},
+        "product_ids": [product.id for product in product_rows],
+        "table_ids": [table.id for table in table_rows],
+    }
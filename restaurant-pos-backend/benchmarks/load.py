@@ -0,0 +1,115 @@
+"""Escenario de carga en proceso: un servicio de cena contra la API completa.
+
+Cada mesero corre en su propio hilo sobre el mismo TestClient. Por ronda abre
+``tables_per_round`` órdenes en sus mesas, agrega y edita items, la cocina
+las avanza en bloque (preparing y ready), el mesero las entrega y el cajero
+las cobra. Se mide cada petición por tipo de operación.
+"""
+import random
+import threading
+import time
+import uuid
+from app.users.models import UserRole
+from .environment import BENCH_PASSWORD
+from .stats import Recorder
+
+class ServiceError(RuntimeError):
+    pass
+
+class Terminal:
+    """Un dispositivo autenticado que registra la latencia de cada petición."""
+
+    def __init__(self, client, recorder: Recorder, username: str):
+        self.client = client
+        self.recorder = recorder
+        self.username = username
+        self.headers = {}
+
+    def request(self, name: str, method: str, url: str, expected: int = 200, **kwargs):
+        with self.recorder.measure(name):
+            response = self.client.request(method, url, headers={**self.headers, **kwargs.pop("headers", {})}, **kwargs)
+        if response.status_code != expected:
+            raise ServiceError(f"{name}: {response.status_code} {response.text}")
+        return response.json()
+
+    def login(self):
+        token = self.request("login", "POST", "/api/users/login", data={
+            "username": self.username,
+            "password": BENCH_PASSWORD,
+            "client_id": f"bench-{self.username}",
+        })
+        self.headers = {"Authorization": f"Bearer {token['access_token']}"}
+        return self
+
+def serve_tables(waiter: Terminal, kitchen: Terminal, cashier: Terminal, table_ids, product_ids, rng):
+    orders = []
+    for table_id in table_ids:
+        items = [
+            {"product_id": rng.choice(product_ids), "quantity": rng.randint(1, 3)}
+            for _ in range(rng.randint(2, 5))
+        ]
+        order = waiter.request("create_order", "POST", "/api/orders/", expected=201, json={
+            "order_type": "table", "table_id": table_id, "items": items,
+        }, headers={"Idempotency-Key": str(uuid.uuid4())})
+        # Segunda ronda de bebidas y un cambio de cantidad
+        order = waiter.request("add_items", "POST", f"/api/orders/{order['id']}/items", json={
+            "items": [{"product_id": rng.choice(product_ids), "quantity": 1}],
+        }, headers={"Idempotency-Key": str(uuid.uuid4())})
+        item = order["items"][0]
+        order = waiter.request("update_item", "PUT", f"/api/orders/{order['id']}/items/{item['id']}", json={
+            "quantity": item["quantity"] + 1,
+        }, headers={"If-Match": str(order["version"])})
+        orders.append(order)
+
+    order_ids = [order["id"] for order in orders]
+    kitchen.request("kitchen_screen", "GET", "/api/orders/kitchen")
+    for status in ("preparing", "ready"):
+        kitchen.request("kitchen_bump", "PUT", "/api/orders/status", json={"order_ids": order_ids, "status": status})
+    for order_id in order_ids:
+        waiter.request("deliver", "PUT", f"/api/orders/{order_id}/status", params={"status": "delivered"})
+    cashier.request("cashier_screen", "GET", "/api/orders/cashier/pending")
+    for order_id in order_ids:
+        cashier.request("pay", "PUT", f"/api/orders/{order_id}/status", params={"status": "paid"})
+    return len(order_ids)
+
+def run_dinner_service(client, service, rounds: int = 5, tables_per_round: int = 3, seed: int = 1):
+    """Ejecuta el servicio y devuelve los resúmenes por operación."""
+    waiters = service["users"][UserRole.WAITER]
+    table_ids = service["table_ids"]
+    if tables_per_round * len(waiters) > len(table_ids):
+        raise ValueError("No hay mesas suficientes para todos los meseros")
+
+    recorder = Recorder()
+    errors = []
+    served = []
+
+    def run_waiter(index: int, username: str):
+        try:
+            rng = random.Random(seed + index)
+            waiter = Terminal(client, recorder, username).login()
+            kitchen = Terminal(client, recorder, service["users"][UserRole.KITCHEN][0]).login()
+            cashier = Terminal(client, recorder, service["users"][UserRole.CASHIER][0]).login()
+            # Cada mesero atiende sus propias mesas
+            own_tables = table_ids[index::len(waiters)][:tables_per_round]
+            for _ in range(rounds):
+                served.append(serve_tables(waiter, kitchen, cashier, own_tables, service["product_ids"], rng))
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [
+        threading.Thread(target=run_waiter, args=(index, username), name=f"bench-{username}")
+        for index, username in enumerate(waiters)
+    ]
+    started_at = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started_at
+
+    if errors:
+        raise errors[0]
+    results = recorder.summaries("load", elapsed)
+    results.append({"name": "load.orders_served", "count": sum(served), "elapsed_s": round(elapsed, 3),
+                    "throughput_per_s": round(sum(served) / elapsed, 2) if elapsed else 0.0})
+    return results
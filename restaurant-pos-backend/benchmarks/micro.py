@@ -0,0 +1,84 @@
+"""Micro-benchmarks de las rutas críticas sin pasar por HTTP."""
+import json
+from typing import List
+from pydantic import TypeAdapter
+from app.auth.cache import user_cache
+from app.auth.jwt import create_access_token, verify_token
+from app.orders import crud as order_crud, schemas as order_schemas
+from app.users.models import UserRole
+from .stats import run_timed, summarize
+
+def order_payload(product_ids, index: int, items: int = 4):
+    # Pedidos a domicilio: no dependen de que haya mesas libres
+    return order_schemas.OrderCreate(
+        order_type="delivery",
+        customer_name=f"Cliente {index}",
+        customer_phone="5550000",
+        customer_address="Calle 1",
+        items=[
+            {"product_id": product_ids[(index + j) % len(product_ids)], "quantity": j + 1}
+            for j in range(items)
+        ],
+    )
+
+def bench_create_order(session_factory, service, iterations: int):
+    user_id = service["user_ids"][UserRole.WAITER][0]
+    product_ids = service["product_ids"]
+    counter = iter(range(iterations * 2))
+
+    def create():
+        db = session_factory()
+        try:
+            order_crud.create_order(db, order=order_payload(product_ids, next(counter)), user_id=user_id)
+        finally:
+            db.close()
+
+    return summarize("micro.create_order", run_timed(create, iterations, warmup=min(iterations, 5)))
+
+def bench_verify_token(session_factory, service, iterations: int):
+    user_id = service["user_ids"][UserRole.WAITER][0]
+    token = create_access_token(data={"sub": str(user_id)})
+    db = session_factory()
+    try:
+        def cached():
+            verify_token(token=token, db=db)
+
+        def uncached():
+            # Sin caché: decodificación del JWT más la consulta del usuario
+            user_cache.clear()
+            verify_token(token=token, db=db)
+
+        results = [
+            summarize("micro.verify_token.cached", run_timed(cached, iterations, warmup=1)),
+            summarize("micro.verify_token.uncached", run_timed(uncached, iterations, warmup=1)),
+        ]
+    finally:
+        db.close()
+        user_cache.clear()
+    return results
+
+def bench_serialize_orders(session_factory, service, iterations: int, orders: int = 50):
+    # Serialización de la respuesta de /kitchen: validación con OrderResponse y JSON
+    db = session_factory()
+    try:
+        user_id = service["user_ids"][UserRole.WAITER][0]
+        for index in range(orders):
+            order_crud.create_order(db, order=order_payload(service["product_ids"], index), user_id=user_id)
+        db_orders = order_crud.get_kitchen_orders(db)[:orders]
+        adapter = TypeAdapter(List[order_schemas.OrderResponse])
+
+        def serialize():
+            json.dumps(adapter.dump_python(adapter.validate_python(db_orders, from_attributes=True), mode="json"))
+
+        return summarize(
+            f"micro.serialize_orders.{orders}",
+            run_timed(serialize, iterations, warmup=min(iterations, 3))
+        )
+    finally:
+        db.close()
+
+def run_micro(session_factory, service, iterations: int = 200):
+    results = [bench_create_order(session_factory, service, iterations)]
+    results.extend(bench_verify_token(session_factory, service, iterations))
+    results.append(bench_serialize_orders(session_factory, service, max(iterations // 10, 1)))
+    return results
@@ -0,0 +1,70 @@
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+def percentile(sorted_values, fraction: float):
+    # Percentil por rango más cercano sobre una lista ya ordenada
+    if not sorted_values:
+        return 0.0
+    index = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[index]
+
+def summarize(name: str, durations, elapsed: float = None):
+    """Resumen en milisegundos de una serie de duraciones (en segundos).
+
+    ``elapsed`` es el tiempo de pared total; si se omite, el throughput se
+    calcula con la suma de las duraciones (operaciones secuenciales).
+    """
+    values = sorted(durations)
+    total = sum(values)
+    wall = elapsed if elapsed is not None else total
+    return {
+        "name": name,
+        "count": len(values),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p90_ms": round(percentile(values, 0.90) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "mean_ms": round(total / len(values) * 1000, 3) if values else 0.0,
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+        "throughput_per_s": round(len(values) / wall, 2) if wall else 0.0,
+    }
+
+def run_timed(fn, iterations: int, warmup: int = 0):
+    # Mide ``fn`` llamada ``iterations`` veces tras ``warmup`` llamadas sin medir
+    for _ in range(warmup):
+        fn()
+    durations = []
+    for _ in range(iterations):
+        started_at = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - started_at)
+    return durations
+
+class Recorder:
+    """Acumula duraciones por operación desde varios hilos."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, name: str):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started_at
+            with self._lock:
+                self.samples[name].append(duration)
+
+    def summaries(self, prefix: str, elapsed: float):
+        # Una fila por operación y una con todas las peticiones juntas
+        results = [
+            summarize(f"{prefix}.{name}", durations, elapsed)
+            for name, durations in sorted(self.samples.items())
+        ]
+        all_durations = [duration for durations in self.samples.values() for duration in durations]
+        results.append(summarize(f"{prefix}.all", all_durations, elapsed))
+        return results
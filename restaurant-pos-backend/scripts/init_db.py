@@ -1,6 +1,8 @@
+import argparse
 import sys
 import os
 import asyncio
+from datetime import date
 from sqlalchemy.orm import Session
 
 # Añadir el directorio principal del proyecto al path
@@ -11,6 +13,8 @@ from app.users.models import User, UserRole
 from app.products.models import Category, Product
 from app.tables.models import Table
 from app.auth.utils import get_password_hash
+from app.reports.crud import rebuild_sales
+from scripts.synthetic_data import GeneratorOptions, generate_history
 
 def init_db():
     db = SessionLocal()
@@ -93,5 +97,61 @@ def init_db():
     finally:
         db.close()
 
+def parse_args(argv=None):
+    defaults = GeneratorOptions()
+    parser = argparse.ArgumentParser(
+        description="Inicializa la base con datos de ejemplo y, opcionalmente, un historial sintético"
+    )
+    parser.add_argument("--skip-sample", action="store_true", help="No crear los usuarios y el menú de ejemplo")
+    parser.add_argument("--days", type=int, default=0, help="Días de historial sintético (0 = ninguno)")
+    parser.add_argument("--end-date", type=date.fromisoformat, help="Último día del historial (por defecto ayer)")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--locations", type=int, default=defaults.locations)
+    parser.add_argument("--orders-per-day", type=int, default=defaults.orders_per_day, help="Media por local")
+    parser.add_argument("--menu-size", type=int, default=defaults.menu_size)
+    parser.add_argument("--categories", type=int, default=defaults.categories)
+    parser.add_argument("--tables-per-location", type=int, default=defaults.tables_per_location)
+    parser.add_argument("--waiters-per-location", type=int, default=defaults.waiters_per_location)
+    parser.add_argument("--items-per-order", type=float, default=defaults.items_per_order, help="Media de items")
+    parser.add_argument("--delivery-ratio", type=float, default=defaults.delivery_ratio)
+    parser.add_argument("--cancel-ratio", type=float, default=defaults.cancel_ratio)
+    parser.add_argument("--popularity-skew", type=float, default=defaults.popularity_skew,
+                        help="Exponente de Zipf de la popularidad de productos (0 = uniforme)")
+    parser.add_argument("--batch-size", type=int, default=defaults.batch_size)
+    parser.add_argument("--copy", action="store_true", help="Usar COPY en PostgreSQL")
+    parser.add_argument("--skip-reports", action="store_true", help="No recalcular los agregados de ventas")
+    return parser.parse_args(argv)
+
+def init_synthetic(args):
+    options = GeneratorOptions(
+        seed=args.seed,
+        locations=args.locations,
+        days=args.days,
+        end_date=args.end_date,
+        orders_per_day=args.orders_per_day,
+        menu_size=args.menu_size,
+        categories=args.categories,
+        tables_per_location=args.tables_per_location,
+        waiters_per_location=args.waiters_per_location,
+        items_per_order=args.items_per_order,
+        delivery_ratio=args.delivery_ratio,
+        cancel_ratio=args.cancel_ratio,
+        popularity_skew=args.popularity_skew,
+        batch_size=args.batch_size,
+        use_copy=args.copy,
+    )
+    written = generate_history(engine, options)
+    print(", ".join(f"{table}: {count}" for table, count in written.items()))
+    if not args.skip_reports:
+        db = SessionLocal()
+        try:
+            print(f"Agregados de ventas recalculados ({rebuild_sales(db)} órdenes pagadas)")
+        finally:
+            db.close()
+
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    args = parse_args()
+    if not args.skip_sample:
+        init_db()
+    if args.days > 0:
+        init_synthetic(args)
\ No newline at end of file
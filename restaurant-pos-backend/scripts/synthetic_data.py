@@ -0,0 +1,274 @@
+"""Generador de historial sintético de ventas para perfilar consultas y reportes.
+
+Crea menú, mesas y meseros por local y luego días completos de órdenes
+pagadas o canceladas con sus items. Todo sale de un random.Random(seed): con
+la misma semilla, los mismos parámetros (incluida --end-date) y la misma base
+inicial se obtiene exactamente el mismo conjunto de datos.
+
+Las filas se escriben por lotes con INSERT multi-fila (executemany) o, en
+PostgreSQL con --copy, con COPY FROM STDIN. Los IDs se asignan aquí para que
+los items puedan apuntar a su orden sin leerla de vuelta.
+"""
+import csv
+import enum
+import io
+import random
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, select, text
+from app.auth.utils import get_password_hash
+from app.orders.models import Order, OrderItem, OrderSequence, OrderStatus, OrderType
+from app.orders.pricing import compute_totals, to_cents
+from app.products.models import Category, Product
+from app.tables.models import Table
+from app.users.models import User, UserRole
+
+# Peso relativo de cada hora de apertura: picos de almuerzo y cena
+HOUR_WEIGHTS = {
+    11: 3, 12: 9, 13: 12, 14: 8, 15: 3, 16: 2, 17: 3,
+    18: 5, 19: 10, 20: 13, 21: 10, 22: 5, 23: 2,
+}
+# Lunes = 0: más movimiento el fin de semana
+WEEKDAY_FACTORS = [0.8, 0.85, 0.9, 0.95, 1.2, 1.4, 1.1]
+QUANTITY_WEIGHTS = {1: 70, 2: 20, 3: 7, 4: 3}
+
+@dataclass
+class GeneratorOptions:
+    seed: int = 42
+    locations: int = 1
+    days: int = 30
+    end_date: date = None
+    orders_per_day: int = 200
+    menu_size: int = 80
+    categories: int = 8
+    tables_per_location: int = 20
+    waiters_per_location: int = 6
+    items_per_order: float = 3.0
+    delivery_ratio: float = 0.15
+    cancel_ratio: float = 0.03
+    # Exponente de Zipf de la popularidad de los productos (0 = uniforme)
+    popularity_skew: float = 1.1
+    batch_size: int = 20000
+    use_copy: bool = False
+
+def next_id(conn, model):
+    return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+def copy_value(value):
+    if isinstance(value, enum.Enum):
+        return value.name
+    return value
+
+class BulkWriter:
+    """Acumula filas por tabla y las escribe por lotes en su propia transacción."""
+
+    def __init__(self, engine, batch_size: int, use_copy: bool = False):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.use_copy = use_copy and engine.dialect.name == "postgresql"
+        self.pending = {}
+        self.written = {}
+
+    def add(self, model, row):
+        rows = self.pending.setdefault(model.__table__, [])
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not any(self.pending.values()):
+            return
+        with self.engine.begin() as conn:
+            # Las tablas en el orden en que se agregaron: las padre primero
+            for table, rows in self.pending.items():
+                if not rows:
+                    continue
+                if self.use_copy:
+                    self.copy(conn, table, rows)
+                else:
+                    conn.execute(table.insert(), rows)
+                self.written[table.name] = self.written.get(table.name, 0) + len(rows)
+                rows.clear()
+
+    def copy(self, conn, table, rows):
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([copy_value(row[column]) for column in columns])
+        buffer.seek(0)
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+        finally:
+            cursor.close()
+
+def zipf_weights(count: int, skew: float):
+    return [1 / (rank + 1) ** skew for rank in range(count)]
+
+def create_catalog(engine, writer: BulkWriter, options: GeneratorOptions, rng: random.Random):
+    """Menú, mesas y personal de cada local. Devuelve lo necesario para las órdenes."""
+    with engine.connect() as conn:
+        category_id = next_id(conn, Category)
+        product_id = next_id(conn, Product)
+        table_id = next_id(conn, Table)
+        user_id = next_id(conn, User)
+        run_tag = product_id
+
+    password = get_password_hash("sintetico123")
+    now = datetime.now().replace(microsecond=0)
+
+    category_ids = []
+    for i in range(options.categories):
+        writer.add(Category, {
+            "id": category_id + i, "name": f"Categoría {run_tag}-{i + 1:02d}",
+            "description": None, "created_at": now, "updated_at": None,
+        })
+        category_ids.append(category_id + i)
+
+    products = []
+    for i in range(options.menu_size):
+        price = round(rng.uniform(1.5, 35.0), 2)
+        writer.add(Product, {
+            "id": product_id + i, "name": f"Producto {run_tag}-{i + 1:04d}", "description": None,
+            "price": price, "category_id": category_ids[i % len(category_ids)],
+            "created_at": now, "updated_at": None,
+        })
+        products.append((product_id + i, to_cents(price)))
+    # La popularidad no depende del orden de creación
+    rng.shuffle(products)
+
+    locations = []
+    for location in range(options.locations):
+        code = f"{location + 1:02d}"
+        tables = []
+        for i in range(options.tables_per_location):
+            writer.add(Table, {
+                "id": table_id, "name": f"L{code}-{run_tag} Mesa {i + 1}", "capacity": rng.choice([2, 4, 4, 6, 8]),
+                "is_occupied": False, "description": None, "created_at": now, "updated_at": None,
+            })
+            tables.append(table_id)
+            table_id += 1
+        waiters = []
+        for i in range(options.waiters_per_location):
+            username = f"mesero_{run_tag}_l{code}_{i + 1:02d}"
+            writer.add(User, {
+                "id": user_id, "username": username, "email": f"{username}@example.com",
+                "password": password, "full_name": f"Mesero {code}-{i + 1}", "role": UserRole.WAITER,
+                "is_active": True, "created_at": now, "updated_at": None,
+            })
+            waiters.append(user_id)
+            user_id += 1
+        locations.append({"code": code, "tables": tables, "waiters": waiters})
+    writer.flush()
+    return products, locations
+
+def generate_history(engine, options: GeneratorOptions, progress=print):
+    """Genera ``options.days`` días de órdenes por local hasta ``end_date`` (ayer por defecto)."""
+    rng = random.Random(options.seed)
+    writer = BulkWriter(engine, options.batch_size, options.use_copy)
+    started_at = time.perf_counter()
+
+    products, locations = create_catalog(engine, writer, options, rng)
+    product_weights = zipf_weights(len(products), options.popularity_skew)
+    hours = list(HOUR_WEIGHTS)
+    hour_weights = list(HOUR_WEIGHTS.values())
+    quantities = list(QUANTITY_WEIGHTS)
+    quantity_weights = list(QUANTITY_WEIGHTS.values())
+    # Probabilidad de seguir agregando items (geométrica con la media pedida)
+    extra_item_probability = 1 - 1 / max(options.items_per_order, 1)
+
+    end_date = options.end_date or date.today() - timedelta(days=1)
+    start_date = end_date - timedelta(days=options.days - 1)
+    with engine.connect() as conn:
+        order_id = next_id(conn, Order)
+        item_id = next_id(conn, OrderItem)
+        # Se continúa la numeración existente para no repetir números de orden
+        sequences = {
+            (row.day, row.location): row.last_value
+            for row in conn.execute(select(OrderSequence).where(
+                OrderSequence.day.between(start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d"))
+            ))
+        }
+    existing_sequences = set(sequences)
+
+    for day_offset in range(options.days):
+        day = start_date + timedelta(days=day_offset)
+        day_key = day.strftime("%Y%m%d")
+        for location in locations:
+            count = max(0, round(
+                options.orders_per_day * WEEKDAY_FACTORS[day.weekday()] * rng.uniform(0.85, 1.15)
+            ))
+            created_times = sorted(
+                datetime(day.year, day.month, day.day, rng.choices(hours, hour_weights)[0],
+                         rng.randrange(60), rng.randrange(60))
+                for _ in range(count)
+            )
+            sequence = sequences.get((day_key, location["code"]), 0)
+            for created_at in created_times:
+                sequence += 1
+                order_type = OrderType.DELIVERY if rng.random() < options.delivery_ratio else OrderType.TABLE
+                closed_at = created_at + timedelta(minutes=rng.randint(15, 120))
+                cancelled = rng.random() < options.cancel_ratio
+
+                items = []
+                picked = rng.choices(products, product_weights, k=1)
+                while rng.random() < extra_item_probability:
+                    picked.extend(rng.choices(products, product_weights, k=1))
+                for product_id, price_cents in picked:
+                    items.append({
+                        "id": item_id, "order_id": order_id, "product_id": product_id,
+                        "quantity": rng.choices(quantities, quantity_weights)[0],
+                        "price_cents": price_cents, "notes": None, "created_at": created_at, "updated_at": None,
+                    })
+                    item_id += 1
+                subtotal = sum(item["price_cents"] * item["quantity"] for item in items)
+
+                totals = compute_totals(subtotal, order_type)
+                delivery = order_type == OrderType.DELIVERY
+                writer.add(Order, {
+                    "id": order_id,
+                    "order_number": f"ORD-{day_key}-{location['code']}-{sequence:05d}",
+                    "order_type": order_type,
+                    "status": OrderStatus.CANCELLED if cancelled else OrderStatus.PAID,
+                    "table_id": None if delivery else rng.choice(location["tables"]),
+                    "customer_name": f"Cliente {order_id}" if delivery else None,
+                    "customer_phone": "5550000" if delivery else None,
+                    "customer_address": "Dirección de prueba" if delivery else None,
+                    "subtotal_cents": totals.subtotal_cents,
+                    "tax_cents": totals.tax_cents,
+                    "total_cents": totals.total_cents,
+                    "created_by": rng.choice(location["waiters"]),
+                    "created_at": created_at,
+                    "updated_at": closed_at,
+                    "version": 2 if cancelled else 4,
+                    "paid_at": None if cancelled else closed_at,
+                })
+                # La orden se agrega antes que sus items (clave foránea)
+                for item in items:
+                    writer.add(OrderItem, item)
+                order_id += 1
+            sequences[(day_key, location["code"])] = sequence
+        if (day_offset + 1) % 30 == 0 or day_offset + 1 == options.days:
+            progress(f"{day_offset + 1}/{options.days} días, {order_id - 1} órdenes ({time.perf_counter() - started_at:.1f}s)")
+
+    writer.flush()
+    with engine.begin() as conn:
+        for (day_key, code), last_value in sequences.items():
+            if (day_key, code) in existing_sequences:
+                conn.execute(OrderSequence.__table__.update().where(
+                    OrderSequence.day == day_key, OrderSequence.location == code
+                ).values(last_value=last_value))
+            else:
+                conn.execute(OrderSequence.__table__.insert().values(day=day_key, location=code, last_value=last_value))
+        if engine.dialect.name == "postgresql":
+            # Los IDs se insertaron explícitos: se adelantan las secuencias
+            for model in (Category, Product, Table, User, Order, OrderItem):
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{model.__tablename__}', 'id'), "
+                    f"(SELECT COALESCE(MAX(id), 1) FROM {model.__tablename__}))"
+                ))
+    return writer.written
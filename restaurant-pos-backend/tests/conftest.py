@@ -0,0 +1,169 @@
+import os
+import sys
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Añadir el directorio principal del proyecto al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Costo mínimo de bcrypt para que las pruebas sean rápidas
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+# La base configurada de la aplicación no se usa en las pruebas
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from app.main import app
+from app.db import Base, get_db
+from app.users.models import User, UserRole
+from app.products.models import Category, Product
+from app.tables.models import Table
+from app.auth.utils import get_password_hash
+from app.auth.jwt import create_access_token
+from app.auth.cache import user_cache, revoked_sessions
+from app.products.cache import menu_cache
+from app.orders.numbering import order_numbers
+from app.idempotency.cache import idempotency_cache
+
+# Hash calculado una sola vez para no pagar bcrypt en cada prueba
+TEST_PASSWORD = "secret123"
+TEST_PASSWORD_HASH = get_password_hash(TEST_PASSWORD)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def reset(self):
+        self.statements = []
+
+
+@pytest.fixture()
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    # El bloque de números reservado pertenece a la base de la prueba anterior
+    order_numbers.reset()
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture()
+def session_factory(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture()
+def db(session_factory):
+    session = session_factory()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture()
+def query_counter(engine):
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(engine, "before_cursor_execute", counter)
+
+
+@pytest.fixture()
+def client(session_factory):
+    def override_get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    # Cada prueba usa una base nueva: los IDs de usuario y de sesión se repiten
+    user_cache.clear()
+    revoked_sessions.replace([])
+    menu_cache.bump()
+    idempotency_cache.clear()
+    with TestClient(app) as test_client:
+        yield test_client
+    app.dependency_overrides.clear()
+    user_cache.clear()
+    revoked_sessions.replace([])
+    menu_cache.clear()
+
+
+@pytest.fixture()
+def users(db):
+    users = {}
+    for role in UserRole:
+        user = User(
+            username=role.value,
+            email=f"{role.value}@example.com",
+            password=TEST_PASSWORD_HASH,
+            full_name=f"Usuario {role.value}",
+            role=role,
+        )
+        db.add(user)
+        users[role] = user
+    db.commit()
+    return users
+
+
+@pytest.fixture()
+def auth_headers(users):
+    def headers_for(role=UserRole.ADMIN):
+        token = create_access_token(data={"sub": str(users[role].id)})
+        return {"Authorization": f"Bearer {token}"}
+    return headers_for
+
+
+@pytest.fixture()
+def menu(db):
+    category = Category(name="Platos fuertes", description="Platos principales")
+    db.add(category)
+    db.flush()
+    products = [
+        Product(name=f"Producto {i}", price=5.0 + i, category_id=category.id)
+        for i in range(10)
+    ]
+    tables = [Table(name=f"Mesa {i}", capacity=4) for i in range(1, 6)]
+    db.add_all(products + tables)
+    db.commit()
+    return {"category": category, "products": products, "tables": tables}
+
+
+@pytest.fixture()
+def async_db_mode(tmp_path, monkeypatch):
+    # Base en archivo compartida por un motor síncrono (datos de prueba y
+    # autenticación) y uno asíncrono (handlers de órdenes con USE_ASYNC_DB)
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from app import db as app_db
+    from app.config import settings
+
+    path = tmp_path / "async.db"
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    order_numbers.reset()
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    monkeypatch.setattr(
+        app_db, "_async_sessionmaker",
+        async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+    )
+    monkeypatch.setattr(settings, "use_async_db", True)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
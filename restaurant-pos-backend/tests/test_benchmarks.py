@@ -0,0 +1,36 @@
+from benchmarks.compare import compare
+from benchmarks.environment import seed_service
+from benchmarks.load import run_dinner_service
+from benchmarks.micro import run_micro
+from benchmarks.stats import percentile, summarize
+
+# Versiones mínimas de los benchmarks para que no dejen de funcionar con
+# los cambios de la API; los tiempos no se validan aquí
+
+
+def test_summary_percentiles():
+    summary = summarize("x", [i / 1000 for i in range(1, 101)], elapsed=2.0)
+    assert (summary["p50_ms"], summary["p99_ms"], summary["max_ms"]) == (50.0, 99.0, 100.0)
+    assert summary["throughput_per_s"] == 50.0
+    assert percentile([], 0.5) == 0.0
+
+    rows = compare({"x": {"p99_ms": 10.0}}, {"x": {"p99_ms": 13.0}}, threshold=0.2)
+    assert rows[0][-1] is True
+
+
+def test_micro_benchmarks_run(session_factory, db):
+    service = seed_service(db, waiters=1, products=8, tables=2)
+    results = run_micro(session_factory, service, iterations=3)
+    assert [result["name"] for result in results] == [
+        "micro.create_order", "micro.verify_token.cached", "micro.verify_token.uncached", "micro.serialize_orders.50",
+    ]
+
+
+def test_dinner_service_scenario_runs(client, db):
+    # Un solo mesero: la base de las pruebas es una única conexión compartida
+    service = seed_service(db, waiters=1, products=8, tables=2)
+    results = {result["name"]: result for result in run_dinner_service(client, service, rounds=2, tables_per_round=2)}
+    assert results["load.orders_served"]["count"] == 4
+    assert results["load.pay"]["count"] == 4
+    assert results["load.kitchen_bump"]["count"] == 4
+    assert results["load.login"]["count"] == 3
@@ -0,0 +1,39 @@
+from prometheus_client import REGISTRY
+from app.users.models import UserRole
+from tests.test_orders import create_orders
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_metrics_endpoint_exposes_route_and_business_metrics(client, auth_headers, menu):
+    headers = auth_headers(UserRole.WAITER)
+    created_before = sample("pos_orders_created_total", order_type="table")
+    items_before = sample("pos_order_items_count")
+    route = dict(method="GET", route="/api/orders/{order_id}", status="200")
+    requests_before = sample("pos_http_request_duration_seconds_count", **route)
+    cancelled_before = sample("pos_order_status_transitions_total", from_status="pending", to_status="cancelled")
+
+    orders = create_orders(client, headers, menu, 2)
+    for order in orders:
+        assert client.get(f"/api/orders/{order['id']}", headers=headers).status_code == 200
+    response = client.put(f"/api/orders/{orders[0]['id']}/status", params={"status": "cancelled"}, headers=headers)
+    assert response.status_code == 200
+
+    assert sample("pos_orders_created_total", order_type="table") == created_before + 2
+    assert sample("pos_order_items_count") == items_before + 2
+    # Una sola serie para todas las órdenes: se etiqueta con la plantilla de la ruta
+    assert sample("pos_http_request_duration_seconds_count", **route) == requests_before + 2
+    assert sample(
+        "pos_order_status_transitions_total", from_status="pending", to_status="cancelled"
+    ) == cancelled_before + 1
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'pos_http_request_duration_seconds_bucket{le="0.005",method="GET",route="/api/orders/{order_id}",status="200"}' in body
+    for name in ("pos_http_requests_in_progress", "pos_db_pool_checked_out", "pos_auth_cache_requests_total",
+                 "pos_password_hash_in_flight"):
+        assert name in body
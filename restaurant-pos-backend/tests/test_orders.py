@@ -0,0 +1,800 @@
+import asyncio
+import csv
+import io
+import json
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import sessionmaker
+from app.orders.events import OrderEventBroker, OrderEventType, Station, broker
+from app.orders.models import Order, OrderStatus
+from app.orders.numbering import OrderNumberAllocator
+from app.orders import crud as order_crud, schemas as order_schemas, pricing, export
+from app.config import settings
+from app.pagination import MAX_PAGE_SIZE
+from app import request_stats
+from app.orders.models import OrderType
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from app.main import app
+from app.db import Base, get_db
+from app.auth.cache import user_cache
+from app.idempotency.cache import idempotency_cache
+from app.idempotency import crud as idempotency_crud
+from app.idempotency.utils import request_fingerprint
+from app.auth.jwt import create_access_token
+from app.products.models import Category, Product
+from app.tables.models import Table
+from app.users.models import User, UserRole
+from tests.conftest import TEST_PASSWORD_HASH
+
+# Consultas fijas por petición: autenticación (usuario) + carga de órdenes.
+# El límite no depende del número de órdenes ni de items.
+AUTH_QUERIES = 1
+
+
+def create_orders(client, headers, menu, count, items_per_order=4):
+    products = menu["products"]
+    orders = []
+    for i in range(count):
+        payload = {
+            "order_type": "table",
+            "table_id": menu["tables"][i % len(menu["tables"])].id,
+            "items": [
+                {"product_id": products[(i + j) % len(products)].id, "quantity": j + 1}
+                for j in range(items_per_order)
+            ],
+        }
+        response = client.post("/api/orders/", json=payload, headers=headers)
+        assert response.status_code == 201, response.text
+        orders.append(response.json())
+    return orders
+
+
+def set_status(db, status):
+    db.query(Order).update({Order.status: status})
+    db.commit()
+
+
+def test_create_order_computes_totals(client, auth_headers, menu):
+    products = menu["products"]
+    payload = {
+        "order_type": "table",
+        "table_id": menu["tables"][0].id,
+        "items": [
+            {"product_id": products[0].id, "quantity": 2},
+            {"product_id": products[1].id, "quantity": 1},
+        ],
+    }
+    response = client.post("/api/orders/", json=payload, headers=auth_headers(UserRole.WAITER))
+    assert response.status_code == 201
+    data = response.json()
+    assert data["subtotal"] == pytest.approx(16.0)
+    assert data["total"] == pytest.approx(17.6)
+    assert len(data["items"]) == 2
+    assert data["table"]["is_occupied"] is True
+
+
+def test_create_order_reports_all_missing_products(client, auth_headers, menu, db):
+    payload = {
+        "order_type": "table",
+        "table_id": menu["tables"][0].id,
+        "items": [
+            {"product_id": 998, "quantity": 1},
+            {"product_id": menu["products"][0].id, "quantity": 1},
+            {"product_id": 999, "quantity": 1},
+        ],
+    }
+    response = client.post("/api/orders/", json=payload, headers=auth_headers(UserRole.WAITER))
+    assert response.status_code == 404
+    assert "998, 999" in response.json()["detail"]
+    # La transacción no deja la mesa ocupada ni una orden a medias
+    db.refresh(menu["tables"][0])
+    assert menu["tables"][0].is_occupied is False
+    assert db.query(Order).count() == 0
+
+
+def test_resolve_order_products_uses_one_in_query(db, menu, query_counter):
+    products = menu["products"]
+    # Productos repetidos en varias líneas se piden una sola vez
+    items = [order_schemas.OrderItemCreate(product_id=products[i % 5].id, quantity=1) for i in range(20)]
+    query_counter.reset()
+    resolved = order_crud.resolve_order_products(db, items)
+    assert set(resolved) == {product.id for product in products[:5]}
+    assert query_counter.count == 1
+    assert " IN " in query_counter.statements[0]
+
+    items.append(order_schemas.OrderItemCreate(product_id=999, quantity=1))
+    items.append(order_schemas.OrderItemCreate(product_id=997, quantity=1))
+    query_counter.reset()
+    with pytest.raises(HTTPException) as missing:
+        order_crud.resolve_order_products(db, items)
+    assert missing.value.status_code == 404
+    assert "997, 999" in missing.value.detail
+    assert query_counter.count == 1
+
+
+def test_add_items_reports_all_missing_products(client, auth_headers, menu):
+    headers = auth_headers(UserRole.WAITER)
+    order = create_orders(client, headers, menu, 1, items_per_order=1)[0]
+    items = [
+        {"product_id": 999, "quantity": 1},
+        {"product_id": menu["products"][1].id, "quantity": 1},
+        {"product_id": 998, "quantity": 1},
+    ]
+    response = client.post(f"/api/orders/{order['id']}/items", json={"items": items}, headers=headers)
+    assert response.status_code == 404
+    assert "998, 999" in response.json()["detail"]
+    response = client.get(f"/api/orders/{order['id']}", headers=headers)
+    assert len(response.json()["items"]) == 1
+
+
+def test_create_order_commits_once(db, engine, menu, users, query_counter):
+    products = menu["products"]
+    order = order_schemas.OrderCreate(
+        order_type="table",
+        table_id=menu["tables"][0].id,
+        items=[{"product_id": product.id, "quantity": 1} for product in products],
+    )
+    # El primer número del día reserva un bloque en su propia transacción
+    order_crud.generate_order_number(db)
+
+    commits = []
+    count_commit = commits.append
+    event.listen(engine, "commit", count_commit)
+    try:
+        query_counter.reset()
+        db_order = order_crud.create_order(db, order, user_id=users[UserRole.WAITER].id)
+    finally:
+        event.remove(engine, "commit", count_commit)
+
+    assert len(commits) == 1
+    # Orden e items en dos INSERT (los items en uno solo, masivo) y la mesa en el mismo commit
+    inserts = [statement for statement in query_counter.statements if statement.startswith("INSERT")]
+    assert len(inserts) == 2
+    assert len(db_order.items) == len(products)
+    assert db_order.table.is_occupied is True
+
+
+@pytest.mark.parametrize("order_count", [1, 10])
+def test_read_order_query_count(client, auth_headers, menu, query_counter, order_count):
+    headers = auth_headers(UserRole.ADMIN)
+    orders = create_orders(client, headers, menu, order_count)
+    query_counter.reset()
+    response = client.get(f"/api/orders/{orders[-1]['id']}", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 4
+    assert query_counter.count <= AUTH_QUERIES + 1, query_counter.statements
+
+
+@pytest.mark.parametrize("order_count", [1, 10])
+def test_kitchen_orders_query_count(client, auth_headers, menu, query_counter, order_count):
+    create_orders(client, auth_headers(UserRole.WAITER), menu, order_count)
+    headers = auth_headers(UserRole.KITCHEN)
+    query_counter.reset()
+    response = client.get("/api/orders/kitchen", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == order_count
+    assert query_counter.count <= AUTH_QUERIES + 2, query_counter.statements
+
+
+@pytest.mark.parametrize("order_count", [1, 10])
+def test_cashier_pending_query_count(client, auth_headers, menu, db, query_counter, order_count):
+    create_orders(client, auth_headers(UserRole.WAITER), menu, order_count)
+    set_status(db, OrderStatus.READY)
+    headers = auth_headers(UserRole.CASHIER)
+    query_counter.reset()
+    response = client.get("/api/orders/cashier/pending", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == order_count
+    assert query_counter.count <= AUTH_QUERIES + 2, query_counter.statements
+
+
+def test_add_items_query_count_is_constant(client, auth_headers, menu, query_counter):
+    headers = auth_headers(UserRole.WAITER)
+    order = create_orders(client, headers, menu, 1)[0]
+    items = [{"product_id": product.id, "quantity": 1} for product in menu["products"]]
+    query_counter.reset()
+    response = client.post(f"/api/orders/{order['id']}/items", json={"items": items}, headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 4 + len(items)
+    # Autenticación, orden, productos (IN), inserción, commit y recarga final
+    assert query_counter.count <= AUTH_QUERIES + 6, query_counter.statements
+
+
+def test_event_broker_filters_by_station_and_resumes():
+    async def scenario():
+        broker = OrderEventBroker(buffer_size=3)
+        created = broker.publish(OrderEventType.ORDER_CREATED, {"id": 1, "status": "pending"})
+        broker.publish(OrderEventType.STATUS_CHANGED, {"id": 1, "status": "ready"}, previous_status="pending")
+        paid = broker.publish(OrderEventType.STATUS_CHANGED, {"id": 1, "status": "paid"}, previous_status="ready")
+
+        # Cocina ve la orden entrar y salir de su vista, pero no el pago
+        subscriber, backlog, current_id = broker.subscribe(Station.KITCHEN, last_event_id=created.id - 1)
+        assert [event.type for event in backlog] == [OrderEventType.ORDER_CREATED, OrderEventType.STATUS_CHANGED]
+        assert current_id == paid.id
+
+        # Un ID que ya salió del buffer obliga a pedir un snapshot
+        broker.publish(OrderEventType.ORDER_CREATED, {"id": 2, "status": "pending"})
+        _, stale_backlog, _ = broker.subscribe(Station.CASHIER, last_event_id=created.id - 1)
+        assert stale_backlog is None
+
+        broker.publish(OrderEventType.ORDER_CREATED, {"id": 3, "status": "paid"})
+        live = broker.publish(OrderEventType.ORDER_CREATED, {"id": 4, "status": "preparing"})
+        await asyncio.wait_for(subscriber.queue.get(), timeout=1)
+        event = await asyncio.wait_for(subscriber.queue.get(), timeout=1)
+        assert event.id == live.id
+        assert subscriber.queue.empty()
+        assert "id: %d\nevent: order_created\n" % live.id in event.to_sse()
+
+    asyncio.run(scenario())
+
+
+def test_mutations_publish_order_events(client, auth_headers, menu, db):
+    start_id = broker.last_event_id
+    order = create_orders(client, auth_headers(UserRole.WAITER), menu, 1)[0]
+    response = client.put(
+        f"/api/orders/{order['id']}",
+        json={"status": "preparing"},
+        headers=auth_headers(UserRole.ADMIN)
+    )
+    assert response.status_code == 200
+
+    async def read_backlog():
+        subscriber, backlog, _ = broker.subscribe(Station.KITCHEN, last_event_id=start_id)
+        broker.unsubscribe(subscriber)
+        return backlog
+
+    backlog = asyncio.run(read_backlog())
+    assert [event.type for event in backlog] == [OrderEventType.ORDER_CREATED, OrderEventType.STATUS_CHANGED]
+    assert backlog[-1].previous_status == "pending"
+    assert backlog[-1].order["status"] == "preparing"
+
+
+def test_order_endpoints_with_async_session(async_db_mode, monkeypatch):
+    session_factory = async_db_mode
+    db = session_factory()
+    users = {}
+    for role in UserRole:
+        users[role] = User(
+            username=role.value,
+            email=f"{role.value}@example.com",
+            password=TEST_PASSWORD_HASH,
+            full_name=role.value,
+            role=role,
+        )
+    category = Category(name="Bebidas")
+    db.add_all(list(users.values()) + [category, Table(name="Mesa 1", capacity=4)])
+    db.flush()
+    products = [Product(name=f"Bebida {i}", price=2.0, category_id=category.id) for i in range(3)]
+    db.add_all(products)
+    db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': str(users[UserRole.ADMIN].id)})}"}
+    product_ids = [product.id for product in products]
+    db.close()
+
+    def override_get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    user_cache.clear()
+    try:
+        with TestClient(app) as client:
+            response = client.post("/api/orders/", json={
+                "order_type": "table",
+                "table_id": 1,
+                "items": [{"product_id": product_ids[0], "quantity": 2}],
+            }, headers=headers)
+            assert response.status_code == 201, response.text
+            order = response.json()
+            assert order["table"]["is_occupied"] is True
+
+            response = client.post(f"/api/orders/{order['id']}/items", json={
+                "items": [{"product_id": product_ids[1], "quantity": 1}]
+            }, headers=headers)
+            assert response.status_code == 200
+            item_id = response.json()["items"][0]["id"]
+
+            response = client.put(f"/api/orders/{order['id']}/items/{item_id}", json={"quantity": 3}, headers=headers)
+            assert response.status_code == 200
+            assert response.json()["subtotal"] == pytest.approx(8.0)
+
+            response = client.put(f"/api/orders/{order['id']}", json={"status": "preparing"}, headers=headers)
+            assert response.status_code == 200
+            assert response.json()["updated_at"] is not None
+
+            assert len(client.get("/api/orders/kitchen", headers=headers).json()) == 1
+            assert client.get(f"/api/orders/{order['id']}", headers=headers).json()["status"] == "preparing"
+            assert client.get("/api/orders/999", headers=headers).status_code == 404
+    finally:
+        app.dependency_overrides.clear()
+        user_cache.clear()
+
+
+def test_orders_cursor_pagination(client, auth_headers, menu, db):
+    headers = auth_headers(UserRole.ADMIN)
+    created = create_orders(client, headers, menu, 7, items_per_order=1)
+
+    seen = []
+    cursor = None
+    for _ in range(len(created)):
+        params = {"limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/orders/", params=params, headers=headers)
+        assert response.status_code == 200
+        seen.extend(order["id"] for order in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    # Todas las órdenes se crean en el mismo segundo: el desempate es el ID
+    assert seen == sorted((order["id"] for order in created), reverse=True)
+
+    response = client.get("/api/orders/", params={"cursor": "no-es-un-cursor"}, headers=headers)
+    assert response.status_code == 400
+
+    # Un límite fuera de rango se rechaza en lugar de romper la paginación
+    for path in ("/api/orders/", "/api/tables/", "/api/users/", "/api/products/", "/api/products/categories/"):
+        for limit in (0, MAX_PAGE_SIZE + 1):
+            assert client.get(path, params={"limit": limit}, headers=headers).status_code == 422, (path, limit)
+    assert order_crud.get_orders(db, limit=0) == []
+
+
+def test_order_numbers_are_sequential_per_day(db):
+    allocator = OrderNumberAllocator("01", block_size=2)
+    today = datetime(2024, 5, 1, 13, 0)
+    numbers = [allocator.generate(db, now=today) for _ in range(5)]
+    assert numbers == [f"ORD-20240501-01-{value:05d}" for value in range(1, 6)]
+    assert sorted(numbers) == numbers
+
+    # Cada día (y cada local) tiene su propio contador
+    assert allocator.generate(db, now=datetime(2024, 5, 2, 9, 0)) == "ORD-20240502-01-00001"
+    assert OrderNumberAllocator("02", block_size=2).generate(db, now=today) == "ORD-20240501-02-00001"
+
+
+def test_order_number_blocks_do_not_collide_across_workers(tmp_path):
+    # Cada allocator simula un worker; comparten el contador en la base
+    engine = create_engine(f"sqlite:///{tmp_path / 'numbers.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    today = datetime(2024, 5, 1, 13, 0)
+    results = {}
+
+    def worker(index):
+        allocator = OrderNumberAllocator("01", block_size=3)
+        session = session_factory()
+        try:
+            results[index] = [allocator.generate(session, now=today) for _ in range(25)]
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    numbers = [number for worker_numbers in results.values() for number in worker_numbers]
+    assert len(numbers) == 100
+    assert len(set(numbers)) == 100
+    for worker_numbers in results.values():
+        assert worker_numbers == sorted(worker_numbers)
+
+
+def test_idempotent_order_creation_replays_stored_response(client, auth_headers, menu, db, query_counter):
+    headers = {**auth_headers(UserRole.WAITER), "Idempotency-Key": "tablet-7-0001"}
+    payload = {
+        "order_type": "table",
+        "table_id": menu["tables"][0].id,
+        "items": [{"product_id": menu["products"][0].id, "quantity": 2}],
+    }
+    first = client.post("/api/orders/", json=payload, headers=headers)
+    assert first.status_code == 201
+    assert "Idempotent-Replayed" not in first.headers
+
+    # Reintento en el mismo worker: sale de la caché sin tocar la base de datos
+    query_counter.reset()
+    retry = client.post("/api/orders/", json=payload, headers=headers)
+    assert query_counter.count == 0
+    assert retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+
+    # Reintento en otro worker: se responde desde la tabla
+    idempotency_cache.clear()
+    retry = client.post("/api/orders/", json=payload, headers=headers)
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert db.query(Order).count() == 1
+
+    # La misma clave con otro cuerpo es un error del cliente
+    other = {**payload, "items": [{"product_id": menu["products"][1].id, "quantity": 1}]}
+    assert client.post("/api/orders/", json=other, headers=headers).status_code == 422
+
+
+def test_idempotency_key_is_released_when_request_fails(client, auth_headers, menu):
+    headers = {**auth_headers(UserRole.WAITER), "Idempotency-Key": "tablet-7-0002"}
+    payload = {"order_type": "table", "table_id": menu["tables"][0].id, "items": [{"product_id": 9999, "quantity": 1}]}
+    assert client.post("/api/orders/", json=payload, headers=headers).status_code == 404
+
+    payload["items"][0]["product_id"] = menu["products"][0].id
+    response = client.post("/api/orders/", json=payload, headers=headers)
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+
+
+def test_idempotency_key_is_released_after_database_error(client, auth_headers, menu, monkeypatch):
+    headers = {**auth_headers(UserRole.WAITER), "Idempotency-Key": "tablet-7-0004"}
+    payload = {"order_type": "table", "table_id": menu["tables"][0].id,
+               "items": [{"product_id": menu["products"][0].id, "quantity": 1}]}
+    duplicate = menu["products"][0]
+
+    def failing_create_order(db, order, user_id, before_commit=None):
+        # Un flush fallido deja la sesión pendiente de rollback
+        db.add(Product(id=duplicate.id, name="Duplicado", price=1.0, category_id=duplicate.category_id))
+        db.flush()
+
+    with monkeypatch.context() as patch:
+        patch.setattr(order_crud, "create_order", failing_create_order)
+        with pytest.raises(IntegrityError):
+            client.post("/api/orders/", json=payload, headers=headers)
+
+    # La reserva se liberó: el reintento crea la orden en lugar de responder 409
+    response = client.post("/api/orders/", json=payload, headers=headers)
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+
+
+def test_idempotency_key_survives_errors_after_commit(client, auth_headers, menu, db, monkeypatch):
+    headers = {**auth_headers(UserRole.WAITER), "Idempotency-Key": "tablet-7-0005"}
+    payload = {"order_type": "table", "table_id": menu["tables"][0].id,
+               "items": [{"product_id": menu["products"][0].id, "quantity": 1}]}
+
+    def failing_publish(*args, **kwargs):
+        raise RuntimeError("broker caído")
+
+    # La orden y su respuesta se confirman juntas; el fallo ocurre después
+    with monkeypatch.context() as patch:
+        patch.setattr(order_crud, "publish_order_event", failing_publish)
+        with pytest.raises(RuntimeError):
+            client.post("/api/orders/", json=payload, headers=headers)
+
+    response = client.post("/api/orders/", json=payload, headers=headers)
+    assert response.status_code == 201
+    assert response.headers["Idempotent-Replayed"] == "true"
+    assert db.query(Order).count() == 1
+
+
+def test_idempotency_reservation_expires_after_lease(client, auth_headers, menu, db, users):
+    headers = {**auth_headers(UserRole.WAITER), "Idempotency-Key": "tablet-7-0006",
+               "Content-Type": "application/json"}
+    body = json.dumps({"order_type": "table", "table_id": menu["tables"][0].id,
+                       "items": [{"product_id": menu["products"][0].id, "quantity": 1}]}).encode()
+
+    # Reserva de un worker que murió antes de confirmar la mutación
+    request_hash = request_fingerprint("POST", "/api/orders/", body)
+    db_key, reserved = idempotency_crud.reserve_key(db, users[UserRole.WAITER].id, "tablet-7-0006", request_hash)
+    assert reserved
+    assert db_key.expires_at <= datetime.utcnow() + timedelta(seconds=settings.idempotency_lease_seconds)
+    assert client.post("/api/orders/", content=body, headers=headers).status_code == 409
+
+    db_key.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    response = client.post("/api/orders/", content=body, headers=headers)
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+
+
+def test_idempotent_add_items_does_not_duplicate(client, auth_headers, menu):
+    headers = auth_headers(UserRole.WAITER)
+    order = create_orders(client, headers, menu, 1, items_per_order=1)[0]
+    payload = {"items": [{"product_id": menu["products"][3].id, "quantity": 1}]}
+    retry_headers = {**headers, "Idempotency-Key": "tablet-7-0003"}
+    for _ in range(3):
+        response = client.post(f"/api/orders/{order['id']}/items", json=payload, headers=retry_headers)
+        assert response.status_code == 200
+
+    assert len(response.json()["items"]) == 2
+    response = client.get(f"/api/orders/{order['id']}", headers=headers)
+    assert len(response.json()["items"]) == 2
+
+
+def test_stale_if_match_returns_conflict_with_current_state(client, auth_headers, menu):
+    headers = auth_headers(UserRole.WAITER)
+    order = create_orders(client, headers, menu, 1, items_per_order=1)[0]
+    assert order["version"] == 1
+    payload = {"items": [{"product_id": menu["products"][2].id, "quantity": 1}]}
+
+    response = client.post(f"/api/orders/{order['id']}/items", json=payload, headers={**headers, "If-Match": '"1"'})
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+
+    # Otro mesero todavía tiene la versión 1 en pantalla
+    item_id = order["items"][0]["id"]
+    response = client.put(
+        f"/api/orders/{order['id']}/items/{item_id}", json={"quantity": 5}, headers={**headers, "If-Match": "1"}
+    )
+    assert response.status_code == 409
+    current = response.json()["detail"]["order"]
+    assert current["version"] == 2
+    assert len(current["items"]) == 2
+
+
+def test_item_change_without_total_change_bumps_version(client, auth_headers, menu):
+    headers = auth_headers(UserRole.WAITER)
+    order = create_orders(client, headers, menu, 1, items_per_order=1)[0]
+    url = f"/api/orders/{order['id']}/items/{order['items'][0]['id']}"
+
+    # Solo las notas: los totales no cambian pero la versión sí
+    response = client.put(url, json={"notes": "sin sal"}, headers={**headers, "If-Match": "1"})
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+    assert response.json()["total"] == order["total"]
+
+    response = client.put(url, json={"notes": "con sal"}, headers={**headers, "If-Match": "1"})
+    assert response.status_code == 409
+    assert response.json()["detail"]["order"]["items"][0]["notes"] == "sin sal"
+
+
+def test_concurrent_item_changes_do_not_lose_updates(client, auth_headers, menu, session_factory):
+    headers = auth_headers(UserRole.WAITER)
+    order = create_orders(client, headers, menu, 1, items_per_order=1)[0]
+    items = order_schemas.OrderItemsCreate(items=[{"product_id": menu["products"][1].id, "quantity": 1}])
+
+    first, second = session_factory(), session_factory()
+    try:
+        # Ambos meseros leen la orden antes de que el otro confirme (se guarda
+        # la referencia: el identity map de la sesión es débil)
+        stale = order_crud.get_order(second, order["id"])
+        order_crud.add_items_to_order(first, order["id"], items)
+        with pytest.raises(HTTPException) as conflict:
+            order_crud.add_items_to_order(second, order["id"], items)
+        assert conflict.value.status_code == 409
+        assert stale.version == 2
+    finally:
+        first.close()
+        second.close()
+
+    response = client.get(f"/api/orders/{order['id']}", headers=headers)
+    data = response.json()
+    assert len(data["items"]) == 2
+    assert data["subtotal"] == pytest.approx(sum(item["price"] * item["quantity"] for item in data["items"]))
+
+
+def test_pricing_uses_exact_integer_cents():
+    assert pricing.to_cents(8.99) == 899
+    assert pricing.to_cents(0.1) * 3 == 30
+    # 10% de 10.05 = 1.005 -> se redondea hacia arriba al centavo
+    assert pricing.compute_totals(1005, OrderType.TABLE) == pricing.Totals(1005, 101, 1106)
+
+
+def test_order_totals_do_not_drift_on_long_tabs(client, auth_headers, menu, db):
+    headers = auth_headers(UserRole.WAITER)
+    product = Product(name="Pan", price=0.1, category_id=menu["category"].id)
+    db.add(product)
+    db.commit()
+    order = create_orders(client, headers, menu, 1, items_per_order=1)[0]
+    start_subtotal = order["subtotal"]
+
+    payload = {"items": [{"product_id": product.id, "quantity": 1}]}
+    for _ in range(10):
+        response = client.post(f"/api/orders/{order['id']}/items", json=payload, headers=headers)
+    added = [item for item in response.json()["items"] if item["product_id"] == product.id]
+    for item in added[:3]:
+        response = client.delete(f"/api/orders/{order['id']}/items/{item['id']}", headers=headers)
+
+    data = response.json()
+    db_order = db.get(Order, order["id"])
+    assert db_order.subtotal_cents == round(start_subtotal * 100) + 70
+    assert data["subtotal"] == db_order.subtotal_cents / 100
+    assert db_order.total_cents == db_order.subtotal_cents + db_order.tax_cents
+
+
+def test_tax_rules_per_order_type_and_bulk_recompute(client, auth_headers, menu, db, monkeypatch):
+    monkeypatch.setitem(pricing.TAX_RULES, OrderType.DELIVERY, 0)
+    headers = auth_headers(UserRole.WAITER)
+    table_order = create_orders(client, headers, menu, 1, items_per_order=2)[0]
+    payload = {
+        "order_type": "delivery",
+        "customer_name": "Ana",
+        "customer_phone": "5551234",
+        "customer_address": "Calle 1",
+        "items": [{"product_id": menu["products"][0].id, "quantity": 2}],
+    }
+    delivery_order = client.post("/api/orders/", json=payload, headers=headers).json()
+    assert delivery_order["tax"] == 0
+    assert delivery_order["total"] == delivery_order["subtotal"] == 10.0
+
+    # Totales corrompidos (p. ej. por una importación) se corrigen en bloque
+    db.query(Order).update({Order.subtotal_cents: 1, Order.tax_cents: 1, Order.total_cents: 1})
+    db.commit()
+    assert pricing.recompute_totals(db) == 2
+
+    db.expire_all()
+    assert db.get(Order, table_order["id"]).total_cents == round(table_order["total"] * 100)
+    assert db.get(Order, delivery_order["id"]).total_cents == 1000
+
+
+def test_status_transitions_follow_table_and_roles(client, auth_headers, menu):
+    waiter, kitchen, cashier = (auth_headers(role) for role in (UserRole.WAITER, UserRole.KITCHEN, UserRole.CASHIER))
+    order = create_orders(client, waiter, menu, 1, items_per_order=1)[0]
+    url = f"/api/orders/{order['id']}/status"
+
+    # El mesero no puede mandar la orden a preparación
+    response = client.put(url, params={"status": "preparing"}, headers=waiter)
+    assert response.status_code == 403
+    # Saltarse la cocina no es una transición válida
+    response = client.put(url, params={"status": "paid"}, headers=cashier)
+    assert response.status_code == 400
+
+    for status, headers in (("preparing", kitchen), ("ready", kitchen), ("paid", cashier)):
+        response = client.put(url, params={"status": status}, headers=headers)
+        assert response.status_code == 200, response.text
+        assert response.json()["status"] == status
+    assert response.json()["table"]["is_occupied"] is False
+
+    # Una orden pagada no vuelve atrás, ni siquiera para el administrador
+    response = client.put(f"/api/orders/{order['id']}", json={"status": "pending"}, headers=auth_headers(UserRole.ADMIN))
+    assert response.status_code == 400
+
+
+def test_status_no_op_does_not_publish_or_bump_version(client, auth_headers, menu):
+    kitchen = auth_headers(UserRole.KITCHEN)
+    order = create_orders(client, auth_headers(UserRole.WAITER), menu, 1, items_per_order=1)[0]
+    url = f"/api/orders/{order['id']}/status"
+    assert client.put(url, params={"status": "preparing"}, headers=kitchen).status_code == 200
+    last_event_id = broker.last_event_id
+
+    response = client.put(url, params={"status": "preparing"}, headers=kitchen)
+    assert response.status_code == 200
+    assert response.json()["status"] == "preparing"
+    assert response.json()["version"] == 2
+    assert broker.last_event_id == last_event_id
+
+    # Un null explícito se rechaza; omitir el estado lo conserva
+    admin = auth_headers(UserRole.ADMIN)
+    response = client.put(f"/api/orders/{order['id']}", json={"status": None}, headers=admin)
+    assert response.status_code == 422
+    response = client.put(f"/api/orders/{order['id']}", json={"customer_name": "Ana"}, headers=admin)
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == "preparing"
+
+
+def test_bulk_status_change_uses_constant_queries(client, auth_headers, menu, db, query_counter):
+    kitchen = auth_headers(UserRole.KITCHEN)
+    orders = create_orders(client, auth_headers(UserRole.WAITER), menu, 15, items_per_order=2)
+    order_ids = [order["id"] for order in orders]
+    set_status(db, OrderStatus.PREPARING)
+    start_id = broker.last_event_id
+
+    query_counter.reset()
+    response = client.put("/api/orders/status", json={"order_ids": order_ids, "status": "ready"}, headers=kitchen)
+    assert response.status_code == 200, response.text
+    assert [order["id"] for order in response.json()] == order_ids
+    assert {order["status"] for order in response.json()} == {"ready"}
+    assert {order["version"] for order in response.json()} == {orders[0]["version"] + 1}
+    # Autenticación, lectura de estados, UPDATE único y recarga (órdenes, items, productos, mesas)
+    assert query_counter.count <= AUTH_QUERIES + 7, query_counter.statements
+    assert broker.last_event_id == start_id + len(order_ids)
+
+    # Si una transición no es válida no se cambia ninguna orden
+    db.query(Order).filter(Order.id == order_ids[0]).update({Order.status: OrderStatus.PAID})
+    db.commit()
+    response = client.put("/api/orders/status", json={"order_ids": order_ids, "status": "delivered"}, headers=auth_headers(UserRole.WAITER))
+    assert response.status_code == 400
+    assert list(response.json()["detail"]["orders"]) == [str(order_ids[0])]
+    db.expire_all()
+    assert db.query(Order).filter(Order.status == OrderStatus.READY).count() == len(order_ids) - 1
+
+    response = client.put("/api/orders/status", json={"order_ids": [999], "status": "ready"}, headers=kitchen)
+    assert response.status_code == 404
+
+
+def test_export_streams_orders_with_items(client, auth_headers, menu, db, monkeypatch):
+    monkeypatch.setattr(settings, "export_batch_size", 3)
+    waiter = auth_headers(UserRole.WAITER)
+    cashier = auth_headers(UserRole.CASHIER)
+    orders = create_orders(client, waiter, menu, 4, items_per_order=2)
+    item_count = sum(len(order["items"]) for order in orders)
+
+    response = client.get("/api/orders/export", headers=cashier)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == item_count
+    assert [int(row["order_id"]) for row in rows] == sorted(int(row["order_id"]) for row in rows)
+    first = orders[0]["items"][0]
+    assert rows[0]["product_name"] == first["product"]["name"]
+    assert int(rows[0]["unit_price_cents"]) == round(first["price"] * 100)
+    assert rows[0]["status"] == "pending"
+
+    response = client.get("/api/orders/export", params={"format": "ndjson", "status": "pending"}, headers=cashier)
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == item_count
+    assert lines[-1]["order_number"] == orders[-1]["order_number"]
+
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+    response = client.get("/api/orders/export", params={"start_date": tomorrow}, headers=cashier)
+    assert response.text.splitlines() == [",".join(export.EXPORT_FIELDS)]
+    assert client.get("/api/orders/export", headers=waiter).status_code == 403
+
+
+@pytest.fixture()
+def bogota_timezone(monkeypatch):
+    monkeypatch.setenv("TZ", "America/Bogota")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_export_date_range_uses_local_days(client, auth_headers, menu, db, bogota_timezone):
+    cashier = auth_headers(UserRole.CASHIER)
+    order = create_orders(client, auth_headers(UserRole.WAITER), menu, 1, items_per_order=1)[0]
+    # created_at se guarda en UTC: las 03:00 UTC del 2 de enero son las 22:00 del 1 en Bogotá
+    db.query(Order).update({Order.created_at: datetime(2024, 1, 2, 3, 0)})
+    db.commit()
+
+    def exported(day):
+        response = client.get("/api/orders/export", params={"start_date": day, "end_date": day, "format": "ndjson"},
+                              headers=cashier)
+        return [json.loads(line)["order_id"] for line in response.text.splitlines()]
+
+    assert exported("2024-01-01") == [order["id"]]
+    assert exported("2024-01-02") == []
+    assert export.local_midnight_utc(date(2024, 1, 1)) == datetime(2024, 1, 1, 5, 0, tzinfo=timezone.utc)
+
+
+def test_export_reads_in_batches(db, menu, monkeypatch):
+    # Las filas llegan por lotes de yield_per, no como una lista completa
+    orders = [Order(order_type=OrderType.TABLE, order_number=f"ORD-{i}") for i in range(7)]
+    db.add_all(orders)
+    db.commit()
+    batches = list(export.iter_export_rows(db, export.export_query(db), batch_size=3))
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+
+
+def test_server_timing_reports_queries_and_logs_slow_requests(client, auth_headers, menu, query_counter, monkeypatch, caplog):
+    headers = auth_headers(UserRole.WAITER)
+    order = create_orders(client, headers, menu, 1)[0]
+
+    query_counter.reset()
+    response = client.get(f"/api/orders/{order['id']}", headers=headers)
+    timing = {
+        entry.split(";")[0].strip(): entry for entry in response.headers["Server-Timing"].split(",")
+    }
+    assert set(timing) == {"db", "serialize", "app", "total"}
+    assert f'desc="{query_counter.count} queries"' in timing["db"]
+
+    monkeypatch.setattr(settings, "slow_request_ms", 1)
+    with caplog.at_level("WARNING", logger="app.request_stats"):
+        client.get(f"/api/orders/{order['id']}", headers=headers)
+    assert "Petición lenta GET /api/orders/%d" % order["id"] in caplog.text
+    assert "FROM orders" in caplog.text
+
+
+def test_failed_statements_do_not_leak_timing_state(engine):
+    stats = request_stats.RequestStats(max_statements=10)
+    token = request_stats.current_stats.set(stats)
+    try:
+        with engine.connect() as connection:
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    connection.execute(text("SELECT * FROM tabla_inexistente"))
+            connection.execute(text("SELECT 1"))
+            assert "query_started_at" not in connection.info
+    finally:
+        request_stats.current_stats.reset(token)
+    # Solo la consulta que terminó cuenta, con su propia duración
+    assert stats.query_count == 1
+    assert stats.statements[0][0] == "SELECT 1"
@@ -0,0 +1,50 @@
+from app.users.models import UserRole
+
+
+def test_products_cursor_pagination(client, auth_headers, menu):
+    headers = auth_headers(UserRole.WAITER)
+    response = client.get("/api/products/", params={"limit": 4}, headers=headers)
+    first_page = [product["id"] for product in response.json()]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get("/api/products/", params={"limit": 4, "cursor": cursor}, headers=headers)
+    second_page = [product["id"] for product in response.json()]
+    assert second_page[0] > first_page[-1]
+
+    # skip sigue funcionando para los clientes existentes
+    response = client.get("/api/products/", params={"limit": 4, "skip": 4}, headers=headers)
+    assert [product["id"] for product in response.json()] == second_page
+
+
+def test_menu_snapshot_etag_and_invalidation(client, auth_headers, menu, query_counter):
+    headers = auth_headers(UserRole.WAITER)
+    admin_headers = auth_headers(UserRole.ADMIN)
+    response = client.get("/api/products/", headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert len(response.json()) == len(menu["products"])
+
+    # Con el snapshot en memoria el catálogo no toca la base de datos
+    query_counter.reset()
+    cached = client.get("/api/products/", headers=headers)
+    assert cached.content == response.content
+    assert query_counter.count == 0
+
+    not_modified = client.get("/api/products/", headers={**headers, "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    product_id = menu["products"][0].id
+    response = client.put(f"/api/products/{product_id}", json={"price": 99.5}, headers=admin_headers)
+    assert response.status_code == 200
+
+    response = client.get("/api/products/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert {product["id"]: product["price"] for product in response.json()}[product_id] == 99.5
+
+    categories = client.get("/api/products/categories/", headers=headers)
+    response = client.post("/api/products/categories/", json={"name": "Bebidas"}, headers=admin_headers)
+    assert response.status_code == 201
+    response = client.get("/api/products/categories/", headers={**headers, "If-None-Match": categories.headers["ETag"]})
+    assert [category["name"] for category in response.json()] == ["Platos fuertes", "Bebidas"]
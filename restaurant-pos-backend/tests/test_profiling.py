@@ -0,0 +1,131 @@
+import asyncio
+import cProfile
+import pstats
+import pytest
+from fastapi.testclient import TestClient
+from app import db as app_db, profiling, request_stats
+from app.config import settings
+from app.main import app
+from app.profiling import ProfilingMiddleware
+from app.users.models import UserRole
+
+
+def order_payload(menu):
+    return {"order_type": "table", "table_id": menu["tables"][0].id,
+            "items": [{"product_id": menu["products"][0].id, "quantity": 1}]}
+
+
+@pytest.fixture(autouse=True)
+def profiling_enabled(monkeypatch):
+    # run_crud solo pasa el trabajo por profile_call con el perfilado activo
+    monkeypatch.setattr(settings, "profiling_enabled", True)
+
+
+def profiling_client(session_factory, tmp_path, **options):
+    middleware = ProfilingMiddleware(
+        app, session_factory=session_factory, directory=str(tmp_path), routes="POST /api/orders/", **options
+    )
+    return TestClient(middleware)
+
+
+def test_admin_request_is_profiled_with_rate_limit(client, session_factory, auth_headers, menu, tmp_path):
+    profiler = profiling_client(session_factory, tmp_path, max_per_minute=1)
+    headers = {**auth_headers(UserRole.ADMIN), "X-Profile": "cprofile"}
+
+    response = profiler.post("/api/orders/", json=order_payload(menu), headers=headers)
+    assert response.status_code == 201
+    filename = response.headers["X-Profile-File"]
+    assert filename.endswith(".pstats")
+    # El CRUD corre en el threadpool: su perfil se combina con el del loop
+    stats = pstats.Stats(str(tmp_path / filename))
+    assert any(function == "create_order" and path.endswith("crud.py") for path, _, function in stats.stats)
+
+    # Tope de un perfil por minuto
+    response = profiler.post("/api/orders/", json=order_payload(menu), headers=headers)
+    assert response.status_code == 201
+    assert "X-Profile-File" not in response.headers
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_profiler_conflicts_do_not_break_the_request(client, session_factory, auth_headers, menu, tmp_path, monkeypatch):
+    # Como en 3.12+ con otro perfilador activo: ningún enable() adicional funciona
+    class BusyProfile(cProfile.Profile):
+        active = 0
+        owned = False
+
+        def enable(self):
+            if BusyProfile.active:
+                raise ValueError("Another profiling tool is already active")
+            BusyProfile.active, self.owned = 1, True
+            super().enable()
+
+        def disable(self):
+            super().disable()
+            if self.owned:
+                BusyProfile.active, self.owned = 0, False
+
+    monkeypatch.setattr(profiling.cProfile, "Profile", BusyProfile)
+    headers = {**auth_headers(UserRole.ADMIN), "X-Profile": "cprofile"}
+    for per_thread in (True, False):
+        monkeypatch.setattr(profiling, "PER_THREAD_PROFILERS", per_thread)
+        response = profiling_client(session_factory, tmp_path).post(
+            "/api/orders/", json=order_payload(menu), headers=headers
+        )
+        assert response.status_code == 201, response.text
+        assert BusyProfile.active == 0
+
+    # Ocupado desde antes de la petición: se responde sin perfil
+    BusyProfile.active = 1
+    response = profiling_client(session_factory, tmp_path).post(
+        "/api/orders/", json=order_payload(menu), headers=headers
+    )
+    assert response.status_code == 201
+    assert not (tmp_path / response.headers["X-Profile-File"]).exists()
+
+
+def test_only_admins_and_selected_routes_are_profiled(client, session_factory, auth_headers, menu, tmp_path):
+    profiler = profiling_client(session_factory, tmp_path)
+
+    waiter = {**auth_headers(UserRole.WAITER), "X-Profile": "1"}
+    response = profiler.post("/api/orders/", json=order_payload(menu), headers=waiter)
+    assert response.status_code == 201
+    assert "X-Profile-File" not in response.headers
+
+    admin = {**auth_headers(UserRole.ADMIN), "X-Profile": "1"}
+    response = profiler.get("/api/orders/", headers=admin)
+    assert response.status_code == 200
+    assert "X-Profile-File" not in response.headers
+
+    # Sin la cabecera no se perfila aunque la ruta coincida
+    response = profiler.post("/api/orders/", json=order_payload(menu), headers=auth_headers(UserRole.ADMIN))
+    assert "X-Profile-File" not in response.headers
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_stack_mode_writes_collapsed_stacks(client, session_factory, auth_headers, menu, tmp_path):
+    profiler = profiling_client(session_factory, tmp_path, stack_interval_ms=1)
+    headers = {**auth_headers(UserRole.ADMIN), "X-Profile": "stack"}
+
+    response = profiler.post("/api/orders/", json=order_payload(menu), headers=headers)
+    assert response.status_code == 201
+    filename = response.headers["X-Profile-File"]
+    assert filename.endswith(".collapsed")
+    lines = (tmp_path / filename).read_text(encoding="utf-8").splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+    # La primera muestra del hilo del loop pasa por el propio middleware
+    assert any("__call__ (app/profiling.py" in line for line in lines)
+
+
+def test_disabled_profiling_skips_profile_call(db, monkeypatch):
+    monkeypatch.setattr(settings, "profiling_enabled", False)
+
+    def unexpected(fn, *args, **kwargs):
+        raise AssertionError("profile_call no debe usarse con el perfilado desactivado")
+    monkeypatch.setattr(request_stats, "profile_call", unexpected)
+    monkeypatch.setattr(app_db, "profile_call", unexpected)
+
+    assert request_stats.timed_endpoint(lambda: "ok")() == "ok"
+    assert asyncio.run(app_db.run_crud(db, lambda session, value: value, 42)) == 42
@@ -0,0 +1,172 @@
+import random
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, insert, text
+
+from app.db import Base
+from app.orders import crud as order_crud
+from app.orders.models import Order, OrderItem, OrderStatus, OrderType
+from app.products import crud as product_crud
+from app.users.models import UserRole
+
+ORDER_COUNT = 5000
+ITEMS_PER_ORDER = 3
+
+# "SCAN orders" sin "USING ... INDEX" es un recorrido completo de la tabla;
+# "SCAN orders USING INDEX ix_..." recorre un índice en orden y es aceptable
+FULL_SCAN = re.compile(r"^SCAN (\S+)$")
+
+
+def scanned_table(name):
+    # Los alias del ORM son "<tabla>_1"; "anon_1" es una subconsulta ya filtrada
+    table = re.sub(r"_\d+$", "", name)
+    return table if table in Base.metadata.tables else None
+
+
+@pytest.fixture()
+def large_dataset(db, users, menu):
+    # Una historia típica: casi todo pagado y unas pocas órdenes activas
+    rng = random.Random(42)
+    statuses = [OrderStatus.PAID] * 90 + [OrderStatus.CANCELLED] * 4 + [
+        OrderStatus.PENDING, OrderStatus.PREPARING, OrderStatus.READY, OrderStatus.DELIVERED
+    ] + [OrderStatus.PENDING, OrderStatus.READY]
+    tables = menu["tables"]
+    products = menu["products"]
+    start = datetime(2024, 1, 1, 12, 0, 0)
+
+    orders = []
+    for i in range(ORDER_COUNT):
+        order_type = OrderType.TABLE if i % 3 else OrderType.DELIVERY
+        orders.append({
+            "id": i + 1,
+            "order_number": f"ORD-SEED-{i:06d}",
+            "order_type": order_type,
+            "status": rng.choice(statuses),
+            "table_id": rng.choice(tables).id if order_type == OrderType.TABLE else None,
+            "customer_name": None if order_type == OrderType.TABLE else f"Cliente {i}",
+            "customer_phone": None if order_type == OrderType.TABLE else "5550000",
+            "customer_address": None if order_type == OrderType.TABLE else f"Calle {i}",
+            "subtotal_cents": 0,
+            "tax_cents": 0,
+            "total_cents": 0,
+            "created_by": users[UserRole.WAITER].id,
+            "created_at": start + timedelta(minutes=i),
+        })
+    items = [
+        {
+            "order_id": order["id"],
+            "product_id": rng.choice(products).id,
+            "quantity": rng.randint(1, 3),
+            "price_cents": 1000,
+        }
+        for order in orders
+        for _ in range(ITEMS_PER_ORDER)
+    ]
+    db.execute(insert(Order), orders)
+    db.execute(insert(OrderItem), items)
+    db.commit()
+    # Estadísticas para que el planificador decida como lo haría en producción
+    db.execute(text("ANALYZE"))
+    db.commit()
+    return {"orders": orders, "products": products, "category": menu["category"]}
+
+
+@contextmanager
+def recorded_queries(engine):
+    queries = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            queries.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield queries
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def full_scans(engine, queries):
+    scans = []
+    with engine.connect() as conn:
+        for statement, parameters in queries:
+            if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+                continue
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            for row in plan:
+                match = FULL_SCAN.match(row[-1])
+                table = scanned_table(match.group(1)) if match else None
+                if table:
+                    scans.append((table, statement))
+    return scans
+
+
+def assert_no_full_scans(engine, queries):
+    assert queries
+    scans = full_scans(engine, queries)
+    assert not scans, "\n\n".join(f"SCAN {table}:\n{statement}" for table, statement in scans)
+
+
+def test_order_crud_queries_use_indexes(engine, db, large_dataset):
+    order_id = large_dataset["orders"][ORDER_COUNT // 2]["id"]
+
+    with recorded_queries(engine) as queries:
+        order_crud.get_order(db, order_id, endpoint="detail")
+        order_crud.get_order(db, order_id, endpoint="mutation")
+        order_crud.get_order_by_number(db, "ORD-SEED-000123")
+        order_crud.get_kitchen_orders(db)
+        order_crud.get_cashier_pending_orders(db)
+        page = order_crud.get_orders(db, limit=20)
+        order_crud.get_orders(db, limit=20, cursor=page.next_cursor)
+        order_crud.get_orders(db, limit=20, status=OrderStatus.PENDING)
+        order_crud.get_orders(db, limit=20, order_type=OrderType.DELIVERY)
+        db.expire_all()
+
+    assert_no_full_scans(engine, queries)
+
+
+def test_order_item_and_product_queries_use_indexes(engine, db, large_dataset):
+    order = next(order for order in large_dataset["orders"] if order["status"] == OrderStatus.PENDING)
+    item_id = db.query(OrderItem.id).filter(OrderItem.order_id == order["id"]).first()[0]
+    product = large_dataset["products"][0]
+
+    with recorded_queries(engine) as queries:
+        order_crud.remove_item_from_order(db, order["id"], item_id)
+        product_crud.get_products(db, category_id=large_dataset["category"].id, limit=5)
+        # Al eliminar un producto el ORM carga sus order_items por product_id
+        product_crud.delete_product(db, product.id)
+
+    assert_no_full_scans(engine, queries)
+
+
+def test_order_endpoints_use_indexes(engine, client, auth_headers, large_dataset):
+    headers = auth_headers(UserRole.ADMIN)
+    order_id = large_dataset["orders"][-1]["id"]
+
+    with recorded_queries(engine) as queries:
+        assert client.get("/api/orders/kitchen", headers=headers).status_code == 200
+        assert client.get("/api/orders/cashier/pending", headers=headers).status_code == 200
+        assert client.get(f"/api/orders/{order_id}", headers=headers).status_code == 200
+        response = client.get("/api/orders/", params={"limit": 50}, headers=headers)
+        assert response.status_code == 200
+        cursor = response.headers["X-Next-Cursor"]
+        response = client.get("/api/orders/", params={"limit": 50, "cursor": cursor}, headers=headers)
+        assert response.status_code == 200
+        response = client.get("/api/orders/", params={"status": "ready", "limit": 50}, headers=headers)
+        assert response.status_code == 200
+
+    assert_no_full_scans(engine, queries)
+
+
+def test_detects_full_scan_without_index(engine, db, large_dataset):
+    # La suite debe fallar si se pierde un índice (p. ej. una migración revertida)
+    db.execute(text("DROP INDEX ix_order_items_order_id"))
+    db.commit()
+
+    with recorded_queries(engine) as queries:
+        order_crud.get_kitchen_orders(db)
+
+    assert "order_items" in {table for table, _ in full_scans(engine, queries)}
@@ -0,0 +1,94 @@
+from datetime import date, timedelta
+from app.orders.models import OrderStatus
+from app.reports.models import HourlySales, ProductSales
+from app.users.models import UserRole
+from tests.test_orders import create_orders, set_status
+
+
+def pay_orders(client, headers, orders):
+    response = client.put(
+        "/api/orders/status",
+        json={"order_ids": [order["id"] for order in orders], "status": "paid"},
+        headers=headers
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_paid_orders_update_sales_aggregates(client, auth_headers, menu, db, users):
+    waiter = auth_headers(UserRole.WAITER)
+    cashier = auth_headers(UserRole.CASHIER)
+    orders = create_orders(client, waiter, menu, 6, items_per_order=3)
+    set_status(db, OrderStatus.READY)
+
+    # Una orden por el endpoint individual y el resto en bloque
+    response = client.put(f"/api/orders/{orders[0]['id']}/status", params={"status": "paid"}, headers=cashier)
+    assert response.status_code == 200
+    pay_orders(client, cashier, orders[1:5])
+
+    paid = orders[:5]
+    expected_total = round(sum(order["total"] for order in paid), 2)
+    expected_quantity = sum(item["quantity"] for order in paid for item in order["items"])
+
+    response = client.get("/api/reports/sales/hourly", headers=cashier)
+    assert response.status_code == 200
+    hours = response.json()
+    assert len(hours) == 1
+    assert hours[0]["order_count"] == 5
+    assert hours[0]["item_count"] == expected_quantity
+    assert hours[0]["total"] == expected_total
+
+    products = client.get("/api/reports/sales/products", headers=cashier).json()
+    assert sum(row["quantity"] for row in products) == expected_quantity
+    assert round(sum(row["revenue"] for row in products), 2) == round(sum(order["subtotal"] for order in paid), 2)
+    assert products == sorted(products, key=lambda row: -row["revenue"])
+
+    categories = client.get("/api/reports/sales/categories", headers=cashier).json()
+    assert [(row["category_name"], row["quantity"]) for row in categories] == [("Platos fuertes", expected_quantity)]
+
+    waiters = client.get("/api/reports/sales/waiters", headers=cashier).json()
+    assert [(row["user_id"], row["order_count"]) for row in waiters] == [(users[UserRole.WAITER].id, 5)]
+
+    tables = client.get("/api/reports/sales/tables", headers=cashier).json()
+    assert sum(row["order_count"] for row in tables) == 5
+    assert round(sum(row["total"] for row in tables), 2) == expected_total
+
+    # Fuera del rango de fechas no hay ventas
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+    response = client.get("/api/reports/sales/products", params={"start_date": tomorrow}, headers=cashier)
+    assert response.json() == []
+
+    assert client.get("/api/reports/sales/hourly", headers=waiter).status_code == 403
+
+
+def test_reports_read_aggregates_only(client, auth_headers, menu, db, query_counter):
+    cashier = auth_headers(UserRole.CASHIER)
+    orders = create_orders(client, auth_headers(UserRole.WAITER), menu, 3, items_per_order=2)
+    set_status(db, OrderStatus.READY)
+    pay_orders(client, cashier, orders)
+
+    query_counter.reset()
+    response = client.get("/api/reports/sales/products", headers=cashier)
+    assert response.status_code == 200
+    statements = [statement for statement in query_counter.statements if "sales_by_product" in statement]
+    assert len(statements) == 1
+    assert "order_items" not in statements[0]
+
+
+def test_rebuild_matches_incremental_aggregates(client, auth_headers, menu, db):
+    orders = create_orders(client, auth_headers(UserRole.WAITER), menu, 4, items_per_order=2)
+    set_status(db, OrderStatus.READY)
+    pay_orders(client, auth_headers(UserRole.CASHIER), orders)
+
+    def snapshot():
+        db.expire_all()
+        return (
+            [(row.hour, row.order_count, row.item_count, row.total_cents) for row in db.query(HourlySales)],
+            sorted((row.day, row.product_id, row.quantity, row.revenue_cents) for row in db.query(ProductSales)),
+        )
+
+    incremental = snapshot()
+    response = client.post("/api/reports/rebuild", headers=auth_headers(UserRole.ADMIN))
+    assert response.status_code == 200
+    assert response.json() == {"orders": 4}
+    assert snapshot() == incremental
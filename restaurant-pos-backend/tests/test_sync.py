@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+from app.products.models import Category, Product
+from app.sync.crud import encode_sync_token
+from app.tables.models import Table
+from app.users.models import UserRole
+from tests.test_orders import create_orders
+
+
+def backdate_menu(db, days=2):
+    # Las filas del fixture se crean "ahora"; se envejecen para que no cuenten
+    # como cambios (updated_at explícito para que no aplique el onupdate)
+    past = datetime.utcnow() - timedelta(days=days)
+    for model in (Table, Category, Product):
+        db.query(model).update({model.created_at: past, model.updated_at: None})
+    db.commit()
+
+
+def test_full_sync_returns_current_state(client, auth_headers, menu):
+    headers = auth_headers(UserRole.WAITER)
+    create_orders(client, headers, menu, 2, items_per_order=1)
+
+    response = client.get("/api/sync", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["full"] is True
+    assert data["token"]
+    assert len(data["tables"]["updated"]) == len(menu["tables"])
+    assert len(data["products"]["updated"]) == len(menu["products"])
+    assert len(data["orders"]["updated"]) == 2
+
+
+def test_delta_sync_returns_only_changes_and_tombstones(client, auth_headers, menu, db):
+    headers = auth_headers(UserRole.WAITER)
+    admin_headers = auth_headers(UserRole.ADMIN)
+    backdate_menu(db)
+    since = encode_sync_token(datetime.utcnow() - timedelta(days=1))
+
+    open_order, closed_order = create_orders(client, headers, menu, 2, items_per_order=1)
+    response = client.put(f"/api/orders/{closed_order['id']}", json={"status": "cancelled"}, headers=headers)
+    assert response.status_code == 200
+
+    products = menu["products"]
+    response = client.put(f"/api/products/{products[5].id}", json={"price": 42.0}, headers=admin_headers)
+    assert response.status_code == 200
+    response = client.delete(f"/api/products/{products[9].id}", headers=admin_headers)
+    assert response.status_code == 200
+
+    response = client.get("/api/sync", params={"since": since}, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["full"] is False
+    # Las mesas de ambas órdenes cambiaron su ocupación; las demás no se envían
+    assert {table["id"] for table in data["tables"]["updated"]} == {
+        open_order["table_id"], closed_order["table_id"]
+    }
+    assert data["categories"] == {"updated": [], "deleted": []}
+    assert [product["id"] for product in data["products"]["updated"]] == [products[5].id]
+    assert data["products"]["deleted"] == [products[9].id]
+    assert [order["id"] for order in data["orders"]["updated"]] == [open_order["id"]]
+    assert data["orders"]["deleted"] == [closed_order["id"]]
+
+
+def test_sync_rejects_invalid_token_and_resets_expired(client, auth_headers, menu):
+    headers = auth_headers(UserRole.WAITER)
+    response = client.get("/api/sync", params={"since": "no-es-un-token"}, headers=headers)
+    assert response.status_code == 400
+
+    # Más antiguo que la retención de tombstones: se envía el estado completo
+    since = encode_sync_token(datetime.utcnow() - timedelta(days=365))
+    response = client.get("/api/sync", params={"since": since}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["full"] is True
+    assert len(response.json()["products"]["updated"]) == len(menu["products"])
@@ -0,0 +1,39 @@
+from datetime import date
+from sqlalchemy import create_engine, func
+from sqlalchemy.pool import StaticPool
+from app.db import Base
+from app.orders.models import Order, OrderItem, OrderSequence
+from app.reports import crud as report_crud
+from scripts.synthetic_data import GeneratorOptions, generate_history
+
+OPTIONS = dict(seed=7, locations=2, days=3, end_date=date(2026, 1, 31), orders_per_day=20,
+               menu_size=12, categories=3, tables_per_location=4, waiters_per_location=2, batch_size=50)
+
+
+def generated_orders(engine):
+    with engine.connect() as conn:
+        orders = conn.execute(Order.__table__.select().order_by(Order.id)).fetchall()
+        items = conn.execute(OrderItem.__table__.select().order_by(OrderItem.id)).fetchall()
+    return orders, items
+
+
+def test_generator_is_deterministic_and_consistent(engine, session_factory):
+    written = generate_history(engine, GeneratorOptions(**OPTIONS), progress=lambda message: None)
+    assert written["orders"] > 0 and written["order_items"] >= written["orders"]
+
+    db = session_factory()
+    # Totales coherentes con los items y números de orden continuando la secuencia
+    mismatched = db.query(Order).join(OrderItem).group_by(Order.id).having(
+        Order.subtotal_cents != func.sum(OrderItem.price_cents * OrderItem.quantity)
+    ).count()
+    assert mismatched == 0
+    assert db.query(func.count(func.distinct(Order.order_number))).scalar() == written["orders"]
+    assert db.query(func.sum(OrderSequence.last_value)).scalar() == written["orders"]
+    assert report_crud.rebuild_sales(db) == db.query(Order).filter(Order.paid_at.isnot(None)).count()
+    db.close()
+
+    other = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=other)
+    generate_history(other, GeneratorOptions(**OPTIONS), progress=lambda message: None)
+    assert generated_orders(other) == generated_orders(engine)
+    other.dispose()
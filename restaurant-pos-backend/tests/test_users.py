@@ -0,0 +1,201 @@
+import threading
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from app.config import settings
+from jose import jwt
+from app.auth.cache import RevokedSessions, UserCache, revoked_sessions, user_cache
+from app.auth import cache as auth_cache, jwt as auth_jwt, utils as auth_utils
+from app.auth.utils import PasswordHasher, pwd_context
+from app.users.models import UserRole
+from tests.conftest import TEST_PASSWORD
+from tests.test_metrics import sample
+
+
+def test_verify_token_uses_user_cache(client, auth_headers, query_counter):
+    headers = auth_headers(UserRole.WAITER)
+    assert client.get("/api/users/me", headers=headers).status_code == 200
+    query_counter.reset()
+    response = client.get("/api/users/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["username"] == UserRole.WAITER.value
+    assert query_counter.count == 0, query_counter.statements
+    assert user_cache.hits >= 1
+
+
+def test_update_user_invalidates_cache(client, auth_headers, users):
+    waiter_headers = auth_headers(UserRole.WAITER)
+    waiter_id = users[UserRole.WAITER].id
+    assert client.get("/api/users/me", headers=waiter_headers).status_code == 200
+
+    response = client.put(
+        f"/api/users/{waiter_id}",
+        json={"is_active": False},
+        headers=auth_headers(UserRole.ADMIN)
+    )
+    assert response.status_code == 200
+    assert client.get("/api/users/me", headers=waiter_headers).status_code == 403
+
+    response = client.delete(f"/api/users/{waiter_id}", headers=auth_headers(UserRole.ADMIN))
+    assert response.status_code == 200
+    assert client.get("/api/users/me", headers=waiter_headers).status_code == 401
+
+
+def test_user_cache_is_bounded_and_expires(users):
+    cache = UserCache(max_size=2, ttl_seconds=60)
+    admin, waiter, kitchen = users[UserRole.ADMIN], users[UserRole.WAITER], users[UserRole.KITCHEN]
+    cache.set(admin)
+    cache.set(waiter)
+    cache.get(admin.id)
+    cache.set(kitchen)
+    # Se descarta el usado menos recientemente
+    assert cache.get(waiter.id) is None
+    assert cache.get(admin.id).role == UserRole.ADMIN
+
+    expired = UserCache(max_size=2, ttl_seconds=-1)
+    expired.set(admin)
+    assert expired.get(admin.id) is None
+
+
+def test_login_returns_token(client, users):
+    response = client.post(
+        "/api/users/login",
+        data={"username": UserRole.CASHIER.value, "password": TEST_PASSWORD}
+    )
+    assert response.status_code == 200
+    assert response.json()["token_type"] == "bearer"
+
+    response = client.post(
+        "/api/users/login",
+        data={"username": UserRole.CASHIER.value, "password": "incorrecta"}
+    )
+    assert response.status_code == 401
+
+
+def test_login_rehashes_when_cost_changes(client, users, db):
+    waiter = users[UserRole.WAITER]
+    waiter.password = CryptContext(schemes=["bcrypt"], bcrypt__rounds=5).hash(TEST_PASSWORD)
+    db.commit()
+
+    response = client.post(
+        "/api/users/login",
+        data={"username": UserRole.WAITER.value, "password": TEST_PASSWORD}
+    )
+    assert response.status_code == 200
+    db.refresh(waiter)
+    assert waiter.password.startswith("$2b$%02d$" % settings.bcrypt_rounds)
+    assert pwd_context.verify(TEST_PASSWORD, waiter.password)
+
+
+def test_password_hasher_rejects_when_queue_is_full():
+    hashed_before = sample("pos_password_hash_seconds_count")
+    waited_before = sample("pos_password_hash_wait_seconds_count")
+    hasher = PasswordHasher(workers=1, queue_size=0)
+    release = threading.Event()
+    running = hasher.submit(release.wait, 5)
+    with pytest.raises(HTTPException) as excinfo:
+        hasher.submit(pwd_context.hash, TEST_PASSWORD)
+    assert excinfo.value.status_code == 503
+    release.set()
+    running.result()
+    assert hasher.submit(pwd_context.hash, TEST_PASSWORD).result()
+    # El rechazado no llega a los histogramas
+    assert sample("pos_password_hash_seconds_count") == hashed_before + 2
+    assert sample("pos_password_hash_wait_seconds_count") == waited_before + 2
+
+
+def test_user_passwords_are_hashed_without_blocking_wrappers(client, auth_headers, users, monkeypatch):
+    # Las peticiones no deben esperar el hash con .result() en el threadpool
+    def blocking_hash(password):
+        raise AssertionError("get_password_hash no se usa en peticiones")
+    monkeypatch.setattr(auth_utils, "get_password_hash", blocking_hash)
+    headers = auth_headers(UserRole.ADMIN)
+
+    payload = {"username": "nuevo", "email": "nuevo@example.com", "full_name": "Nuevo", "password": "clave-1"}
+    response = client.post("/api/users/", json=payload, headers=headers)
+    assert response.status_code == 200, response.text
+    user_id = response.json()["id"]
+    assert client.post("/api/users/login", data={"username": "nuevo", "password": "clave-1"}).status_code == 200
+
+    response = client.put(f"/api/users/{user_id}", json={"password": "clave-2"}, headers=headers)
+    assert response.status_code == 200
+    assert client.post("/api/users/login", data={"username": "nuevo", "password": "clave-2"}).status_code == 200
+
+    # Sin contraseña en el cuerpo la actual se conserva
+    response = client.put(f"/api/users/{user_id}", json={"full_name": "Otro nombre"}, headers=headers)
+    assert response.status_code == 200
+    assert client.post("/api/users/login", data={"username": "nuevo", "password": "clave-2"}).status_code == 200
+
+
+def login(client, role, device_id=None):
+    data = {"username": role.value, "password": TEST_PASSWORD}
+    if device_id:
+        data["client_id"] = device_id
+    response = client.post("/api/users/login", data=data)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_refresh_token_rotation_and_reuse_detection(client, users):
+    tokens = login(client, UserRole.WAITER, device_id="terminal-1")
+    assert tokens["refresh_token"]
+
+    response = client.post("/api/users/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    headers = {"Authorization": f"Bearer {rotated['access_token']}"}
+    assert client.get("/api/users/me", headers=headers).status_code == 200
+
+    # Un refresh token no sirve como access token
+    refresh_headers = {"Authorization": f"Bearer {rotated['refresh_token']}"}
+    assert client.get("/api/users/me", headers=refresh_headers).status_code == 401
+
+    # Reutilizar el token ya rotado revoca la sesión completa
+    response = client.post("/api/users/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+    assert client.get("/api/users/me", headers=headers).status_code == 401
+    response = client.post("/api/users/token/refresh", json={"refresh_token": rotated["refresh_token"]})
+    assert response.status_code == 401
+
+
+def test_device_sessions_are_reused_and_revocable(client, users):
+    first = login(client, UserRole.KITCHEN, device_id="cocina-1")
+    login(client, UserRole.KITCHEN, device_id="cocina-1")
+    second = login(client, UserRole.KITCHEN, device_id="cocina-2")
+    headers = {"Authorization": f"Bearer {second['access_token']}"}
+
+    sessions = client.get("/api/users/me/sessions", headers=headers).json()
+    assert sorted(session["device_id"] for session in sessions) == ["cocina-1", "cocina-2"]
+
+    # Al volver a iniciar sesión en cocina-1 el primer refresh token quedó rotado
+    response = client.post("/api/users/token/refresh", json={"refresh_token": first["refresh_token"]})
+    assert response.status_code == 401
+
+    response = client.post("/api/users/logout", json={"refresh_token": second["refresh_token"]})
+    assert response.status_code == 200
+    assert client.get("/api/users/me", headers=headers).status_code == 401
+
+
+def test_revoked_session_is_rejected_by_other_workers(client, users, monkeypatch):
+    tokens = login(client, UserRole.WAITER, device_id="terminal-2")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    session_id = jwt.get_unverified_claims(tokens["access_token"])["sid"]
+
+    # Otro worker: su propio conjunto de revocadas y su propia caché de usuarios
+    other_revoked = RevokedSessions()
+    other_cache = UserCache(max_size=16, ttl_seconds=60)
+    assert client.post("/api/users/logout", json={"refresh_token": tokens["refresh_token"]}).status_code == 200
+    assert session_id in revoked_sessions and session_id not in other_revoked
+
+    # Por NOTIFY: el listener agrega la sesión al conjunto del otro worker
+    monkeypatch.setattr(auth_cache, "revoked_sessions", other_revoked)
+    auth_cache.handle_notification(f"sid:{session_id}")
+    assert session_id in other_revoked
+
+    # Sin NOTIFY: con la caché vacía se revisa la sesión en la base de datos
+    fresh_revoked = RevokedSessions()
+    monkeypatch.setattr(auth_jwt, "revoked_sessions", fresh_revoked)
+    monkeypatch.setattr(auth_jwt, "user_cache", other_cache)
+    assert client.get("/api/users/me", headers=headers).status_code == 401
+    assert session_id in fresh_revoked